@@ -4,8 +4,8 @@ import csv
 
 # 入出力設定
 result_dir = "generated_cfgs"
-csv_filename = "cacti_results.csv"
-sortcsv_filename = "sorted_result.csv"
+csv_filename = "L2_cacti_result.csv"
+sortcsv_filename = "L2_sorted_result.csv"
 
 results = []
 
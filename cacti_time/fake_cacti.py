@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import math
+import random
+import hashlib
+import argparse
+
+# ===============================================================
+# CACTI の代用実行ファイル (Fake CACTI for orchestrator load testing)
+#
+# cacti_run_all.py と同じく `./cacti -infile CFG` で呼び出され、
+# to_csv.py が解析できる形式のレポートを標準出力に書き出す。
+#
+# `python fake_cacti.py --make-sandbox DIR` で ./cacti と base.cfg を用意した
+# ディレクトリを作成できる。DIR で L1/L2 の cacti_run_all.py を実行すればよい。
+# ===============================================================
+
+# 挙動は環境変数で調整する（fake_gem5.py と同じ考え方）
+SLEEP_SECONDS = float(os.environ.get("FAKE_CACTI_SECONDS", "0.01"))  # 1構成あたりの実行時間
+FAIL_RATE = float(os.environ.get("FAKE_CACTI_FAIL_RATE", "0"))       # 非ゼロ終了する割合
+HANG_RATE = float(os.environ.get("FAKE_CACTI_HANG_RATE", "0"))       # 終了しない割合
+SLOW_RATE = float(os.environ.get("FAKE_CACTI_SLOW_RATE", "0"))       # 遅くなる割合
+SLOW_FACTOR = float(os.environ.get("FAKE_CACTI_SLOW_FACTOR", "10"))  # 遅くなる場合の倍率
+SEED = os.environ.get("FAKE_CACTI_SEED", "0")
+
+BASE_CFG = """# Fake CACTI configuration template
+-size (bytes) 16384
+-block size (bytes) 32
+-associativity 4
+-read-write port 1
+-technology (u) 0.032
+-cache type "cache"
+"""
+
+
+def read_cfg_value(cfg_text, startswith):
+    for line in cfg_text.splitlines():
+        if line.strip().startswith(startswith):
+            return int(line.strip()[len(startswith):].strip())
+    return None
+
+
+def run_fake_cacti(cfg_path):
+    with open(cfg_path, "r") as f:
+        cfg_text = f.read()
+
+    size_bytes = read_cfg_value(cfg_text, "-size (bytes)")
+    block = read_cfg_value(cfg_text, "-block size (bytes)")
+    assoc = read_cfg_value(cfg_text, "-associativity")
+
+    digest = hashlib.sha256(f"{SEED}:{os.path.abspath(cfg_path)}".encode()).hexdigest()
+    rng = random.Random(int(digest[:16], 16))
+
+    duration = SLEEP_SECONDS
+    fault = rng.random()
+    if fault < FAIL_RATE:
+        print(f"ERROR: injected failure for {cfg_path}", file=sys.stderr)
+        return 1
+    if fault < FAIL_RATE + HANG_RATE:
+        while True:
+            time.sleep(3600)
+    if fault < FAIL_RATE + HANG_RATE + SLOW_RATE:
+        duration *= SLOW_FACTOR
+    time.sleep(duration)
+
+    # 既存の L1/L2_sorted_result.csv とおおよそ合う程度の経験式
+    size_kb = size_bytes / 1024
+    access_time = (0.6 + 0.12 * math.log2(size_kb) + 0.1 * math.log2(assoc)) * rng.uniform(0.99, 1.01)
+    read_energy = 0.004 * math.sqrt(size_kb) * math.log2(assoc + 1) * rng.uniform(0.99, 1.01)
+
+    print("Cache size                    : %d" % size_bytes)
+    print("Block size                    : %d" % block)
+    print("Associativity                 : %d" % assoc)
+    print("")
+    print("    Access time (ns): %.5f" % access_time)
+    print("    Cycle time (ns):  %.5f" % (access_time * 0.6))
+    print("    Read Energy (nJ): %.7f" % read_energy)
+    return 0
+
+
+def make_sandbox(sandbox_dir):
+    this_file = os.path.abspath(__file__)
+    os.makedirs(sandbox_dir, exist_ok=True)
+    cacti_path = os.path.join(sandbox_dir, "cacti")
+    with open(cacti_path, "w") as f:
+        f.write("#!/bin/sh\n")
+        f.write(f'exec "{sys.executable}" "{this_file}" "$@"\n')
+    os.chmod(cacti_path, 0o755)
+    with open(os.path.join(sandbox_dir, "base.cfg"), "w") as f:
+        f.write(BASE_CFG)
+    print(f"✅ 疑似CACTIのサンドボックスを作成しました → {sandbox_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-infile", dest="infile")
+    parser.add_argument("--make-sandbox", metavar="DIR")
+    args = parser.parse_args()
+    if args.make_sandbox:
+        make_sandbox(args.make_sandbox)
+    elif args.infile:
+        sys.exit(run_fake_cacti(args.infile))
+    else:
+        parser.error("-infile を指定してください")
@@ -0,0 +1,232 @@
+import os
+import re
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+# ===============================================================
+# 構成の正準キー (Compact canonical configuration key)
+#
+# 1つの構成（コア数・L1/L2 のサイズと連想度・L2 レイテンシ）を 63 ビットの整数 1 つに詰める。
+# 上位のフィールドから順に詰めるので、キーの大小はフィールドを順に比べた大小と一致する。
+# CPU クロックは L1 の構成から決まり、結果ディレクトリ名にも現れないのでキーに含めない。
+#
+# SimConfig はキー・結果ディレクトリ名・gem5 の引数の相互変換を受け持つ。
+# run_all.py は各実行の出力ディレクトリに config.json（構成とキー）を書き、
+# sim_summary.py はディレクトリ名を正規表現で読み直す代わりにそれを読んで
+# simulation_summary.csv に "Config Key" 列を加える。ranking.py などは
+# 7列の groupby の代わりにこの1列で構成を区別する。
+# ===============================================================
+CONFIG_FILE = "config.json"
+CONFIG_KEY_COLUMN = 'Config Key'
+
+# (フィールド名, simulation_summary.csv の列名, ビット数)。上から順に上位ビットに詰める
+FIELDS = [
+    ('core', 'Core Number', 8),
+    ('l1_size', 'L1 Cache Size (KB)', 12),
+    ('l1_assoc', 'L1 Associativity', 8),
+    ('l2_size', 'L2 Cache Size (KB)', 18),
+    ('l2_assoc', 'L2 Associativity', 8),
+    ('l2_latency', 'L2 latency (cycles)', 9),
+]
+FIELD_NAMES = [name for name, _, _ in FIELDS]
+FIELD_COLUMNS = [column for _, column, _ in FIELDS]
+
+SHIFTS = {}
+_shift = sum(bits for _, _, bits in FIELDS)
+for _name, _, _bits in FIELDS:
+    _shift -= _bits
+    SHIFTS[_name] = _shift
+MASKS = {name: (1 << bits) - 1 for name, _, bits in FIELDS}
+
+# 古い実行の "core8.0_..." のような小数表記も読めるようにする
+# ROI だけの実行 (se.py --roi) は末尾に "_ROI-work" のように ROI モードが付く。
+# 名前全体で照合するので、"water_nsquared" のような "_" を含むベンチマーク名も切り詰めない
+DIR_NAME_PATTERN = re.compile(
+    r'core([\d.]+)_L1-([\d.]+)KB-A([\d.]+)_L2-([\d.]+)KB-A([\d.]+)_Lat([\d.]+)_Bench-(\w+?)(?:_ROI-([^\W_]+))?'
+)
+# gem5 の引数名 -> フィールド名（-n はコア数）
+GEM5_OPTIONS = {
+    '--l1d_size': 'l1_size', '--l1d_assoc': 'l1_assoc', '--l2_size': 'l2_size',
+    '--l2_assoc': 'l2_assoc', '--l2_latency': 'l2_latency',
+}
+
+
+class SimConfig:
+    __slots__ = ('core', 'l1_size', 'l1_assoc', 'l2_size', 'l2_assoc', 'l2_latency', 'clock')
+
+    def __init__(self, core, l1_size, l1_assoc, l2_size, l2_assoc, l2_latency, clock=None):
+        self.core = int(core)
+        self.l1_size = int(l1_size)
+        self.l1_assoc = int(l1_assoc)
+        self.l2_size = int(l2_size)
+        self.l2_assoc = int(l2_assoc)
+        self.l2_latency = int(l2_latency)
+        self.clock = None if clock is None else float(clock)
+        for name in FIELD_NAMES:
+            value = getattr(self, name)
+            if not 0 <= value <= MASKS[name]:
+                raise ValueError(f"{name}={value} はキーに収まりません (0〜{MASKS[name]})")
+
+    @property
+    def key(self):
+        key = 0
+        for name in FIELD_NAMES:
+            key |= getattr(self, name) << SHIFTS[name]
+        return key
+
+    @classmethod
+    def from_key(cls, key, clock=None):
+        key = int(key)
+        return cls(*[(key >> SHIFTS[name]) & MASKS[name] for name in FIELD_NAMES], clock=clock)
+
+    @classmethod
+    def from_job(cls, job):
+        # run_all.py の job / CostModel の config (core, l1_size, ... のキーを持つ dict)
+        return cls(*[job[name] for name in FIELD_NAMES], clock=job.get('clock'))
+
+    @classmethod
+    def from_row(cls, row):
+        # data.csv / simulation_summary.csv の1行
+        clock = row.get('CPU clock (GHz)')
+        return cls(*[row[column] for column in FIELD_COLUMNS],
+                   clock=None if clock is None or pd.isna(clock) else clock)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def to_row(self):
+        return {column: getattr(self, name) for name, column in zip(FIELD_NAMES, FIELD_COLUMNS)}
+
+    def __eq__(self, other):
+        return isinstance(other, SimConfig) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"SimConfig({', '.join(f'{name}={getattr(self, name)}' for name in self.__slots__)})"
+
+    # ---- 結果ディレクトリ名 ----
+    def dir_name(self, bench, roi=None):
+        # ROI だけの実行はプログラム全体の実行と別のディレクトリにする
+        return (
+            f"core{self.core}_L1-{self.l1_size}KB-A{self.l1_assoc}_"
+            f"L2-{self.l2_size}KB-A{self.l2_assoc}_Lat{self.l2_latency}_Bench-{bench}"
+            + (f"_ROI-{roi}" if roi else "")
+        )
+
+    @classmethod
+    def parse_dir_name(cls, dir_name):
+        # 戻り値: (SimConfig, ベンチマーク名)。形式が違えば None
+        match = DIR_NAME_PATTERN.fullmatch(dir_name)
+        if not match:
+            return None
+        return cls(*[int(float(g)) for g in match.groups()[:6]]), match.group(7)
+
+    # ---- gem5 の引数 ----
+    def gem5_args(self):
+        args = ["-n", str(self.core)]
+        if self.clock is not None:
+            args.append("--cpu-clock=" + str(self.clock) + "GHz")
+        args += [
+            "--l1d_size=" + str(self.l1_size) + "kB",
+            "--l1d_assoc=" + str(self.l1_assoc),
+            "--l2_size=" + str(self.l2_size) + "kB",
+            "--l2_assoc=" + str(self.l2_assoc),
+            "--l2_latency=" + str(self.l2_latency),
+        ]
+        return args
+
+    @classmethod
+    def from_gem5_args(cls, args):
+        # gem5 のコマンド全体（リスト）から構成の引数だけを読み取る
+        values = {}
+        clock = None
+        for i, arg in enumerate(args):
+            if arg == "-n" and i + 1 < len(args):
+                values['core'] = args[i + 1]
+            elif arg.startswith("--cpu-clock="):
+                clock = arg.split("=", 1)[1].removesuffix("GHz")
+            elif "=" in arg and arg.split("=", 1)[0] in GEM5_OPTIONS:
+                name, value = arg.split("=", 1)
+                values[GEM5_OPTIONS[name]] = value.removesuffix("kB")
+        missing = [name for name in FIELD_NAMES if name not in values]
+        if missing:
+            raise ValueError(f"gem5 の引数に構成の値がありません: {', '.join(missing)}")
+        return cls(*[values[name] for name in FIELD_NAMES], clock=clock)
+
+
+# ===============================================================
+# 実行ごとのメタデータ (config.json)
+# ===============================================================
+def write_sidecar(out_dir, config, bench):
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, CONFIG_FILE), "w") as f:
+        json.dump({'config_key': config.key, 'benchmark': bench, **config.to_dict()}, f)
+
+
+def read_sidecar(out_dir):
+    # 戻り値: (SimConfig, ベンチマーク名)。無ければ None
+    path = os.path.join(out_dir, CONFIG_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        meta = json.load(f)
+    return SimConfig.from_key(meta['config_key'], clock=meta.get('clock')), meta['benchmark']
+
+
+def load_run_config(dir_name, full_dir_path):
+    # config.json を優先し、無ければ（古い実行）ディレクトリ名から読む
+    return read_sidecar(full_dir_path) or SimConfig.parse_dir_name(dir_name)
+
+
+# ===============================================================
+# DataFrame の列からまとめてキーを作る (Vectorized)
+# ===============================================================
+def config_keys(df):
+    # 構成列からキーの int64 配列を作る。値が欠けている・無限大の行は -1
+    keys = np.zeros(len(df), dtype=np.int64)
+    valid = np.ones(len(df), dtype=bool)
+    for name, column, _ in FIELDS:
+        values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+        ok = np.isfinite(values)
+        if (values[ok] < 0).any() or (values[ok] > MASKS[name]).any() or (values[ok] != np.round(values[ok])).any():
+            raise ValueError(f"{column} にキーに収まらない値があります (0〜{MASKS[name]} の整数)")
+        valid &= ok
+        keys |= np.where(ok, values, 0).astype(np.int64) << SHIFTS[name]
+    keys[~valid] = -1
+    return keys
+
+
+def decode_keys(keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    return pd.DataFrame({column: (keys >> SHIFTS[name]) & MASKS[name]
+                         for name, column in zip(FIELD_NAMES, FIELD_COLUMNS)})
+
+
+def add_config_key(df):
+    df = df.copy()
+    df[CONFIG_KEY_COLUMN] = config_keys(df)
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="構成キーとディレクトリ名・gem5 の引数の相互変換")
+    parser.add_argument("value", nargs="+", help="キー（整数）または結果ディレクトリ名")
+    args = parser.parse_args()
+
+    for value in args.value:
+        if value.isdigit():
+            config = SimConfig.from_key(value)
+            print(f"{value}: {config}")
+            print(f"  ディレクトリ名: {config.dir_name('<bench>')}")
+        else:
+            parsed = SimConfig.parse_dir_name(os.path.basename(os.path.normpath(value)))
+            if parsed is None:
+                print(f"❌ 不明なディレクトリ形式です: {value}")
+                continue
+            config, bench = parsed
+            print(f"{value}: {CONFIG_KEY_COLUMN} = {config.key} (Benchmark = {bench})")
+        print(f"  gem5 の引数: {' '.join(config.gem5_args())}")
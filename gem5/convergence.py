@@ -0,0 +1,198 @@
+import os
+import json
+import argparse
+from sim_summary import (
+    parse_stats_blocks, extract_stats_dumps, STATS_END_MARKER, CONVERGENCE_FILE
+)
+
+# ===============================================================
+# 収束による早期停止 (Convergence-based early stop)
+#
+# --stats-period で周期的にダンプされる stats.txt を実行中に読み進め、
+# 区間ごとの指標（IPC や L2 ミス率）が直近 WINDOW 区間で許容誤差内に
+# 収まったら実行を止める。止めた時点までの累積値と直近区間の進み方から
+# 全命令を実行し終えた時点の sim_ticks などを外挿し、convergence.json に
+# 書き出す（sim_summary.py の collect_result_row がこれを読む）。
+#
+# 外挿には「その実行が最終的に実行する命令数」が必要なので、同じ
+# ベンチマーク・コア数の完了済みの結果 (sim_insts) がある場合にだけ止める。
+# ===============================================================
+DEFAULT_METRIC = "ipc"
+DEFAULT_TOLERANCE = 0.02  # 直近区間の (最大 - 最小) / 平均 の上限
+DEFAULT_WINDOW = 5
+MIN_PROGRESS = 0.1  # 参照命令数のこの割合を実行するまでは止めない
+
+# 外挿する累積統計 (gem5 の統計名)
+EXTRAPOLATED_COUNTERS = [
+    'system.l2.overall_accesses::total',
+    'system.l2.overall_misses::total',
+]
+
+
+def _delta(dumps, key, i):
+    # 累積値の区間差分。統計がリセットされていれば（値が減っていれば）その区間の値をそのまま使う
+    current = dumps[i].get(key)
+    if not isinstance(current, (int, float)):
+        return None
+    previous = dumps[i - 1].get(key) if i > 0 else 0
+    if not isinstance(previous, (int, float)) or previous > current:
+        return current
+    return current - previous
+
+
+def _cpu_period_ticks(dump):
+    period = dump.get('system.cpu_clk_domain.clock')
+    return period if isinstance(period, (int, float)) and period > 0 else None
+
+
+def interval_metric(dumps, i, metric):
+    if metric == "ipc":
+        insts = _delta(dumps, 'sim_insts', i)
+        ticks = _delta(dumps, 'sim_ticks', i)
+        period = _cpu_period_ticks(dumps[i])
+        if not insts or not ticks or not period:
+            return None
+        return insts / (ticks / period)
+    if metric == "l2_miss_rate":
+        accesses = _delta(dumps, 'system.l2.overall_accesses::total', i)
+        misses = _delta(dumps, 'system.l2.overall_misses::total', i)
+        if not accesses or misses is None:
+            return None
+        return misses / accesses
+    raise ValueError(f"未対応の指標です: {metric}")
+
+
+def interval_metrics(dumps, metric):
+    return [interval_metric(dumps, i, metric) for i in range(len(dumps))]
+
+
+def is_converged(values, tolerance=DEFAULT_TOLERANCE, window=DEFAULT_WINDOW):
+    recent = values[-window:]
+    if len(recent) < window or any(v is None for v in recent):
+        return False
+    mean = sum(recent) / window
+    if mean == 0:
+        return max(recent) == min(recent)
+    return (max(recent) - min(recent)) / abs(mean) <= tolerance
+
+
+def extrapolate(dumps, reference_insts, window=DEFAULT_WINDOW):
+    # 直近 window 区間の「命令あたり」の進み方で、残りの命令を実行した後の累積値を求める
+    last = dumps[-1]
+    base = dumps[-1 - window] if len(dumps) > window else {}
+    span_insts = last['sim_insts'] - base.get('sim_insts', 0)
+    remaining = max(reference_insts - last['sim_insts'], 0)
+    if span_insts <= 0:
+        return None
+
+    def project(key):
+        if not isinstance(last.get(key), (int, float)):
+            return None
+        per_inst = (last[key] - base.get(key, 0)) / span_insts
+        return last[key] + per_inst * remaining
+
+    sim_ticks = int(round(project('sim_ticks')))
+    result = {
+        'sim_ticks': sim_ticks,
+        'sim_insts': int(reference_insts),
+        'sim_seconds': sim_ticks / last.get('sim_freq', 10 ** 12),
+    }
+    for key in EXTRAPOLATED_COUNTERS:
+        value = project(key)
+        if value is not None:
+            result[key] = int(round(value))
+    accesses = result.get('system.l2.overall_accesses::total')
+    misses = result.get('system.l2.overall_misses::total')
+    if accesses and misses is not None:
+        result['system.l2.demand_miss_rate::total'] = misses / accesses
+    return result
+
+
+class StatsTail:
+    # 書き込み中の stats.txt を前回の続きから読み、閉じたブロックだけを返す
+    def __init__(self, stats_file_path):
+        self.stats_file_path = stats_file_path
+        self.offset = 0
+        self.dumps = []
+
+    def poll(self):
+        try:
+            with open(self.stats_file_path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        end = data.rfind(STATS_END_MARKER.encode())
+        if end < 0:
+            return []
+        end = data.find(b"\n", end)
+        end = len(data) if end < 0 else end + 1
+        new_dumps = parse_stats_blocks(data[:end].decode().splitlines())
+        self.offset += end
+        self.dumps.extend(new_dumps)
+        return new_dumps
+
+
+class ConvergenceMonitor:
+    def __init__(self, out_dir, reference_insts, metric=DEFAULT_METRIC,
+                 tolerance=DEFAULT_TOLERANCE, window=DEFAULT_WINDOW, min_progress=MIN_PROGRESS):
+        self.out_dir = out_dir
+        self.tail = StatsTail(os.path.join(out_dir, "stats.txt"))
+        self.reference_insts = reference_insts
+        self.metric = metric
+        self.tolerance = tolerance
+        self.window = window
+        self.min_progress = min_progress
+        self.values = []
+
+    def poll(self):
+        # 収束したら convergence.json を書いて True を返す
+        new_dumps = self.tail.poll()
+        if not new_dumps:
+            return False
+        dumps = self.tail.dumps
+        for i in range(len(dumps) - len(new_dumps), len(dumps)):
+            self.values.append(interval_metric(dumps, i, self.metric))
+        # 最初の区間はウォームアップを含むので判定に使わない
+        if len(dumps) <= self.window or not is_converged(self.values[1:], self.tolerance, self.window):
+            return False
+        if dumps[-1].get('sim_insts', 0) < self.min_progress * self.reference_insts:
+            return False
+        extrapolated = extrapolate(dumps, self.reference_insts, self.window)
+        if extrapolated is None:
+            return False
+        self.write(extrapolated)
+        return True
+
+    def write(self, extrapolated):
+        last = self.tail.dumps[-1]
+        with open(os.path.join(self.out_dir, CONVERGENCE_FILE), "w") as f:
+            json.dump({
+                'metric': self.metric,
+                'tolerance': self.tolerance,
+                'window': self.window,
+                'intervals': len(self.tail.dumps),
+                'recent_values': self.values[-self.window:],
+                'stopped_at_ticks': last.get('sim_ticks'),
+                'stopped_at_insts': last.get('sim_insts'),
+                'reference_insts': self.reference_insts,
+                'extrapolated': extrapolated,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="stats.txt の区間ごとの指標と収束判定を表示する")
+    parser.add_argument("stats_file")
+    parser.add_argument("--metric", choices=["ipc", "l2_miss_rate"], default=DEFAULT_METRIC)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW)
+    args = parser.parse_args()
+
+    stats_dumps = extract_stats_dumps(args.stats_file)
+    values = interval_metrics(stats_dumps, args.metric)
+    print(f"{'区間':>4} {'sim_ticks':>16} {'sim_insts':>14} {args.metric:>12}  収束")
+    for i, dump in enumerate(stats_dumps):
+        converged = i > args.window and is_converged(values[1:i + 1], args.tolerance, args.window)
+        value = f"{values[i]:.4f}" if values[i] is not None else "-"
+        print(f"{i:>4} {dump.get('sim_ticks', '-'):>16} {dump.get('sim_insts', '-'):>14} {value:>12}  "
+              f"{'✅' if converged else ''}")
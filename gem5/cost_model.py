@@ -0,0 +1,163 @@
+import os
+import math
+import argparse
+import numpy as np
+import pandas as pd
+
+# ===============================================================
+# 実行時間（ホストの wall-clock）の予測モデル (Wall-clock cost model)
+#
+# run_history.csv に記録された各実行の wall_seconds から、
+#   log(wall) = ベンチマークごとの切片
+#             + Σ 係数 × log(コア数, クロック, L1/L2 サイズ・連想度, L2 レイテンシ)
+# を最小二乗で当てはめる（係数はベンチマーク間で共通）。履歴の少ない
+# ベンチマークは、資料17ページの表 (BASE_EXEC_TIMES) を履歴から求めた
+# 「表とこのホストの速さの比」で補正して使い、表にも無ければ予測しない。
+# observe() で完了した実行を追加すると、その場で当てはめ直す。
+# 誤差は K 分割交差検証の相対誤差で報告する。
+# ===============================================================
+RUN_HISTORY_CSV = "./result/run_history.csv"
+
+FEATURE_COLUMNS = [
+    ('core', 'Core Number'),
+    ('clock', 'CPU clock (GHz)'),
+    ('l1_size', 'L1 Cache Size (KB)'),
+    ('l1_assoc', 'L1 Associativity'),
+    ('l2_size', 'L2 Cache Size (KB)'),
+    ('l2_assoc', 'L2 Associativity'),
+    ('l2_latency', 'L2 latency (cycles)'),
+]
+MIN_RUNS_PER_BENCHMARK = 3  # これ未満のベンチマークは表による予測を使う
+RIDGE = 1e-3                # 係数の正則化（同じ値しかない特徴量があっても解けるように）
+CV_FOLDS = 5
+
+
+def _table_seconds(job, base_exec_times, base_cpu_freq_ghz):
+    base_time = base_exec_times.get((job['bench'], job['core']))
+    if base_time is None or not job['clock']:
+        return None
+    return base_time * (base_cpu_freq_ghz / job['clock'])
+
+
+def _features(jobs, benchmarks):
+    # [ベンチマークの one-hot..., log(特徴量)...]
+    rows = []
+    for job in jobs:
+        onehot = [1.0 if job['bench'] == b else 0.0 for b in benchmarks]
+        rows.append(onehot + [math.log(max(float(job[key]), 1e-9)) for key, _ in FEATURE_COLUMNS])
+    return np.array(rows, dtype=float).reshape(len(rows), len(benchmarks) + len(FEATURE_COLUMNS))
+
+
+def _fit(jobs, wall_seconds, benchmarks):
+    X = _features(jobs, benchmarks)
+    y = np.log(np.asarray(wall_seconds, dtype=float))
+    # 切片（one-hot）は正則化しない
+    penalty = np.sqrt(RIDGE) * np.diag([0.0] * len(benchmarks) + [1.0] * len(FEATURE_COLUMNS))
+    coef, *_ = np.linalg.lstsq(np.vstack([X, penalty]), np.concatenate([y, np.zeros(X.shape[1])]), rcond=None)
+    return coef
+
+
+class CostModel:
+    def __init__(self, base_exec_times, base_cpu_freq_ghz, history_csv=RUN_HISTORY_CSV):
+        self.base_exec_times = base_exec_times
+        self.base_cpu_freq_ghz = base_cpu_freq_ghz
+        self.jobs = []
+        self.wall_seconds = []
+        if history_csv and os.path.exists(history_csv):
+            self._load(history_csv)
+        self.refit()
+
+    def _load(self, history_csv):
+        df = pd.read_csv(history_csv)
+        ok = (df['returncode'] == 0) & (df['wall_seconds'] > 0)
+        if 'early_stopped' in df.columns:
+            # 早期停止した実行は全体の時間を表さないので使わない
+            ok &= df['early_stopped'].fillna(0) == 0
+        df = df[ok].dropna(subset=[column for _, column in FEATURE_COLUMNS])
+        for record in df.to_dict('records'):
+            job = {key: record[column] for key, column in FEATURE_COLUMNS}
+            job['bench'] = record['Benchmark']
+            self.jobs.append(job)
+            self.wall_seconds.append(float(record['wall_seconds']))
+
+    def observe(self, job, wall_seconds):
+        # 完了した実行を追加して当てはめ直す
+        config = {key: job[key] for key, _ in FEATURE_COLUMNS}
+        config['bench'] = job['bench']
+        self.jobs.append(config)
+        self.wall_seconds.append(float(wall_seconds))
+        self.refit()
+
+    def refit(self):
+        counts = pd.Series([job['bench'] for job in self.jobs], dtype=object).value_counts()
+        self.benchmarks = sorted(counts[counts >= MIN_RUNS_PER_BENCHMARK].index)
+        self.coef = None
+        if self.benchmarks:
+            fit_index = [i for i, job in enumerate(self.jobs) if job['bench'] in self.benchmarks]
+            self.coef = _fit([self.jobs[i] for i in fit_index],
+                             [self.wall_seconds[i] for i in fit_index], self.benchmarks)
+        # 表の値とこのホストでの実測の比（中央値）
+        ratios = []
+        for job, wall in zip(self.jobs, self.wall_seconds):
+            table = _table_seconds(job, self.base_exec_times, self.base_cpu_freq_ghz)
+            if table:
+                ratios.append(wall / table)
+        self.table_scale = float(np.median(ratios)) if ratios else 1.0
+
+    def predict(self, job):
+        # (予測秒数, 予測の出どころ "model" / "table") 。予測できなければ (None, None)
+        if self.coef is not None and job['bench'] in self.benchmarks:
+            return float(np.exp(_features([job], self.benchmarks) @ self.coef)[0]), "model"
+        table = _table_seconds(job, self.base_exec_times, self.base_cpu_freq_ghz)
+        if table is not None:
+            return table * self.table_scale, "table"
+        return None, None
+
+    def cross_validate(self, folds=CV_FOLDS, seed=0):
+        # K 分割交差検証の相対誤差 |予測 - 実測| / 実測 （ベンチマークごとのモデル対象の実行のみ）
+        index = [i for i, job in enumerate(self.jobs) if job['bench'] in self.benchmarks]
+        if len(index) < folds * 2:
+            return None
+        rng = np.random.default_rng(seed)
+        fold_of = rng.permutation(len(index)) % folds
+        errors = []
+        for fold in range(folds):
+            train = [index[i] for i in range(len(index)) if fold_of[i] != fold]
+            test = [index[i] for i in range(len(index)) if fold_of[i] == fold]
+            train_benchmarks = sorted({self.jobs[i]['bench'] for i in train})
+            coef = _fit([self.jobs[i] for i in train], [self.wall_seconds[i] for i in train], train_benchmarks)
+            for i in test:
+                if self.jobs[i]['bench'] not in train_benchmarks:
+                    continue
+                predicted = float(np.exp(_features([self.jobs[i]], train_benchmarks) @ coef)[0])
+                errors.append(abs(predicted - self.wall_seconds[i]) / self.wall_seconds[i])
+        if not errors:
+            return None
+        errors = np.array(errors)
+        return {'n': len(errors), 'median': float(np.median(errors)),
+                'p90': float(np.quantile(errors, 0.9)), 'mean': float(errors.mean())}
+
+    def report(self):
+        lines = [f"実行時間モデル: 履歴 {len(self.jobs)} 件, "
+                 f"モデル対象のベンチマーク: {', '.join(self.benchmarks) or 'なし'}, "
+                 f"表の補正倍率: {self.table_scale:.3g}"]
+        cv = self.cross_validate()
+        if cv:
+            lines.append(f"  交差検証の相対誤差 ({cv['n']} 件): 中央値 {cv['median'] * 100:.1f}%, "
+                         f"90%点 {cv['p90'] * 100:.1f}%, 平均 {cv['mean'] * 100:.1f}%")
+        else:
+            lines.append("  交差検証には履歴が足りません")
+        if self.coef is not None:
+            slopes = self.coef[len(self.benchmarks):]
+            lines.append("  係数 (log-log): " + ", ".join(
+                f"{key}={slope:+.2f}" for (key, _), slope in zip(FEATURE_COLUMNS, slopes)))
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from run_all import BASE_EXEC_TIMES, BASE_CPU_FREQ_GHZ
+
+    parser = argparse.ArgumentParser(description="実行履歴から実行時間モデルを当てはめ、誤差を表示する")
+    parser.add_argument("history_csv", nargs="?", default=RUN_HISTORY_CSV)
+    args = parser.parse_args()
+    print(CostModel(BASE_EXEC_TIMES, BASE_CPU_FREQ_GHZ, args.history_csv).report())
@@ -0,0 +1,154 @@
+import os
+import re
+import shlex
+import shutil
+import argparse
+import pandas as pd
+
+# ===============================================================
+# 等価な構成の重複排除 (Detect and collapse equivalent configurations)
+#
+# run_all.py の各実行を「gem5 が実際に受け取るパラメータ」に正規化し、
+# 同じパラメータになる実行は1回だけシミュレーションして結果を複製する。
+#   - 出力ディレクトリ (-d) は比較に含めない
+#   - CPUクロックは gem5 内部と同じく 1ps 単位の周期に丸めて比較する
+#     (例: 0.8GHz と 0.8000001GHz はどちらも 1250ps)
+#   - 数値の表記揺れ (8 と 8.0) は同じ値として扱う
+#
+# また、集計済みの結果から「1つのパラメータだけが違うのに sim_ticks が
+# 完全に一致する」グループを探し、観測された等価性として報告する。
+#
+# make_data.py が作る現在の設計空間 (432 実行) では、gem5 に渡るパラメータが
+# 一致する実行は無く、省ける実行は 0 件。効果があるのは、表記揺れのある
+# 入力CSVや、範囲の重なる別のスイープを組み合わせた場合だけ。
+# ===============================================================
+SIM_FREQ_TICKS_PER_SECOND = 10 ** 12  # gem5 の既定の tick (1ps)
+
+SUMMARY_CSV = "./result/simulation_summary.csv"
+EQUIVALENCE_REPORT_CSV = "./result/observed_equivalences.csv"
+DEDUP_SOURCE_FILE = "dedup_source.txt"
+
+CONFIG_COLUMNS = [
+    'Core Number', 'L1 Cache Size (KB)', 'L1 Associativity',
+    'L2 Cache Size (KB)', 'L2 Associativity', 'L2 latency (cycles)'
+]
+
+
+def clock_period_ticks(clock_ghz):
+    return int(round(SIM_FREQ_TICKS_PER_SECOND / (float(clock_ghz) * 1e9)))
+
+
+def _canonical_value(value):
+    # "8.0" -> "8", "16kB" -> "16kB", "0.8GHz" -> "1250ps"
+    match = re.fullmatch(r'([0-9.]+)GHz', value)
+    if match:
+        return f"{clock_period_ticks(match.group(1))}ps"
+    match = re.fullmatch(r'([0-9.]+)(kB|MB|)', value)
+    if match:
+        number = float(match.group(1))
+        return f"{int(number) if number == int(number) else number}{match.group(2)}"
+    return value
+
+
+def canonical_args(command):
+    # gem5 のコマンドから出力先を除き、各値を正規化したタプルを返す
+    args = shlex.split(command) if isinstance(command, str) else list(command)
+    canonical = []
+    skip_next = False
+    for arg in args:
+        if skip_next:
+            skip_next = False
+            continue
+        if arg == "-d":
+            skip_next = True
+            continue
+        if arg.startswith("--outdir="):
+            continue
+        if arg.startswith("--") and "=" in arg:
+            name, value = arg.split("=", 1)
+            canonical.append(f"{name}={_canonical_value(value)}")
+        else:
+            canonical.append(_canonical_value(arg))
+    return tuple(canonical)
+
+
+def dedup_jobs(jobs):
+    # 戻り値: (実際に実行する jobs, {代表の名前: [同じ結果を使う jobs]})
+    unique = []
+    duplicates = {}
+    representative_of = {}
+    for job in jobs:
+        key = canonical_args(job['command'])
+        if key in representative_of:
+            duplicates[representative_of[key]['name']].append(job)
+        else:
+            representative_of[key] = job
+            duplicates[job['name']] = []
+            unique.append(job)
+    return unique, duplicates
+
+
+def fan_out(representative, duplicate):
+    # 代表の出力ディレクトリの内容を重複側にコピーし、コピー元を記録する
+    # 出力先が同じ（ディレクトリ名に現れないクロックだけが違う）場合は何もしない
+    if os.path.abspath(representative['out_dir']) == os.path.abspath(duplicate['out_dir']):
+        return False
+    os.makedirs(duplicate['out_dir'], exist_ok=True)
+    for name in os.listdir(representative['out_dir']):
+        src = os.path.join(representative['out_dir'], name)
+        if os.path.isfile(src):
+            shutil.copy2(src, os.path.join(duplicate['out_dir'], name))
+    with open(os.path.join(duplicate['out_dir'], DEDUP_SOURCE_FILE), "w") as f:
+        f.write(representative['out_dir'] + "\n")
+    return True
+
+
+# ===============================================================
+# 観測された等価性の報告 (Observed sim_ticks-identical groups)
+# ===============================================================
+def find_observed_equivalences(df, config_cols=CONFIG_COLUMNS):
+    # パラメータを1つずつ取り出し、それ以外が同じ行の中で sim_ticks（あれば sim_insts も）が
+    # 完全に一致するグループを探す
+    result_cols = [c for c in ('sim_ticks', 'sim_insts') if c in df.columns]
+    rows = []
+    for varying in config_cols:
+        fixed = ['Benchmark'] + [c for c in config_cols if c != varying]
+        for keys, group in df.groupby(fixed + result_cols, sort=True):
+            values = sorted(group[varying].unique())
+            if len(values) < 2:
+                continue
+            row = dict(zip(fixed + result_cols, keys))
+            row['Varying Parameter'] = varying
+            row['Equivalent Values'] = "/".join(str(v) for v in values)
+            row['Rows'] = len(group)
+            rows.append(row)
+    columns = ['Benchmark', 'Varying Parameter', 'Equivalent Values', 'Rows'] + \
+        list(config_cols) + result_cols
+    return pd.DataFrame(rows).reindex(columns=columns)
+
+
+def summarize_equivalences(df, equivalences, config_cols=CONFIG_COLUMNS):
+    # パラメータごとに、変えても sim_ticks が変わらなかった組の数を数える
+    lines = []
+    for varying in config_cols:
+        fixed = ['Benchmark'] + [c for c in config_cols if c != varying]
+        n_groups = int((df.groupby(fixed)[varying].nunique() > 1).sum())
+        hits = equivalences[equivalences['Varying Parameter'] == varying]
+        lines.append((varying, len(hits), n_groups, int(hits['Rows'].sum() - len(hits)) if len(hits) else 0))
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="sim_ticks が一致する構成グループの報告")
+    parser.add_argument("input_csv", nargs="?", default=SUMMARY_CSV)
+    parser.add_argument("--output", default=EQUIVALENCE_REPORT_CSV)
+    args = parser.parse_args()
+
+    summary = pd.read_csv(args.input_csv)
+    report = find_observed_equivalences(summary)
+    report.to_csv(args.output, index=False)
+
+    print("📊 1つのパラメータだけを変えても sim_ticks が一致した組:")
+    for varying, n_hits, n_groups, n_redundant in summarize_equivalences(summary, report):
+        print(f"  {varying:<22}: {n_hits:>5} / {n_groups:>5} 組 (省略できた実行 {n_redundant} 件)")
+    print(f"✅ 詳細を出力しました → {args.output}")
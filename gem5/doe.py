@@ -0,0 +1,234 @@
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+import sweep_trace
+from make_data import generate_rows, DATA_COLUMNS, CPU_CORES, L1_csv, L2_csv
+
+# ===============================================================
+# 実験計画による構成の選択 (Design of experiments)
+#
+# make_data.py と同じ BCE 制約を満たす構成（実行可能集合）の中から、
+# 全組み合わせではなく少数のバランスの取れた部分集合を選び、
+# data.csv と同じ列の CSV を書き出す（run_all.py の入力にそのまま使える）。
+#   ff   : 2水準の一部実施要因計画 (2^(5-p))。各点は実行可能集合の最も近い構成に置き換える
+#   lhs  : ラテン超方格。各因子の範囲を n 等分した層から1点ずつ取り、最も近い構成に置き換える
+#   dopt : 主効果モデルの D 最適計画（Fedorov の交換法）
+# analyze は、選んだ構成の集計結果から各因子の主効果（log(sim_ticks) への回帰係数）を推定する。
+#
+# 因子はいずれも2の累乗で変わるので、log2 を取って実行可能集合の最小〜最大を [-1, 1] に写す。
+# クロックと L2 レイテンシは CACTI の結果から決まるので因子にしない。
+# ===============================================================
+FACTORS = [
+    ('core', 'Core Number'),
+    ('l1_size', 'L1 Cache Size (KB)'),
+    ('l1_assoc', 'L1 Associativity'),
+    ('l2_size', 'L2 Cache Size (KB)'),
+    ('l2_assoc', 'L2 Associativity'),
+]
+
+# 5因子の一部実施要因計画の生成子 (p -> 追加する因子の定義)
+#   p=1: 2^(5-1) 16点, E=ABCD (分解能 V)
+#   p=2: 2^(5-2)  8点, D=AB, E=AC (分解能 III)
+FRACTION_GENERATORS = {
+    0: [],
+    1: [(0, 1, 2, 3)],
+    2: [(0, 1), (0, 2)],
+}
+
+DESIGN_OUTPUT_CSV = "./doe_data.csv"
+SUMMARY_CSV = "./result/simulation_summary.csv"
+MAIN_EFFECTS_CSV = "./result/main_effects.csv"
+
+
+def feasible_set(from_csv=None, filter_expr=None):
+    if from_csv:
+        return pd.read_csv(from_csv)
+    rows = generate_rows(pd.read_csv(L1_csv), pd.read_csv(L2_csv), CPU_CORES, filter_expr)
+    return pd.DataFrame(rows, columns=DATA_COLUMNS)
+
+
+def coded_factors(df, reference=None):
+    # log2(値) を reference（既定は df 自身）の最小〜最大で [-1, 1] に写す
+    reference = df if reference is None else reference
+    coded = np.empty((len(df), len(FACTORS)))
+    for j, (_, column) in enumerate(FACTORS):
+        lo = np.log2(reference[column].min())
+        hi = np.log2(reference[column].max())
+        values = np.log2(df[column].to_numpy(dtype=float))
+        coded[:, j] = 0.0 if hi == lo else 2 * (values - lo) / (hi - lo) - 1
+    return coded
+
+
+def match_nearest(targets, coded):
+    # 各目標点に、まだ選ばれていない最も近い構成を割り当てる（遠い点から順に）
+    distances = np.linalg.norm(targets[:, None, :] - coded[None, :, :], axis=2)
+    chosen = []
+    used = np.zeros(len(coded), dtype=bool)
+    order = np.argsort(-distances.min(axis=1), kind='stable')
+    moved = np.full(len(targets), np.nan)
+    for t in order:
+        d = np.where(used, np.inf, distances[t])
+        best = int(np.argmin(d))
+        if not np.isfinite(d[best]):
+            break
+        used[best] = True
+        chosen.append(best)
+        moved[t] = d[best]
+    return chosen, moved
+
+
+def fractional_factorial(feasible, fraction=1):
+    n_base = len(FACTORS) - fraction
+    generators = FRACTION_GENERATORS[fraction]
+    points = []
+    for base in itertools.product((-1.0, 1.0), repeat=n_base):
+        point = list(base)
+        for generator in generators:
+            point.append(float(np.prod([base[i] for i in generator])))
+        points.append(point)
+    targets = np.array(points)
+    chosen, moved = match_nearest(targets, coded_factors(feasible))
+    return feasible.iloc[chosen].reset_index(drop=True), moved
+
+
+def latin_hypercube(feasible, n_points, seed=0):
+    rng = np.random.default_rng(seed)
+    k = len(FACTORS)
+    # 各因子を n 等分した層のどこか1点を、層の順番を因子ごとにランダムに並べ替えて組み合わせる
+    strata = np.array([rng.permutation(n_points) for _ in range(k)]).T
+    unit = (strata + rng.random((n_points, k))) / n_points
+    targets = 2 * unit - 1
+    chosen, moved = match_nearest(targets, coded_factors(feasible))
+    return feasible.iloc[chosen].reset_index(drop=True), moved
+
+
+def varying_factors(df):
+    # df の中で2水準以上をとる因子の番号（定数の因子は主効果を推定できない）
+    return [j for j, (_, column) in enumerate(FACTORS) if df[column].nunique() >= 2]
+
+
+def model_matrix(coded):
+    # 主効果モデル: [1, x1, ..., xk]
+    return np.hstack([np.ones((len(coded), 1)), coded])
+
+
+def d_optimal(feasible, n_points, seed=0, max_passes=50):
+    X = model_matrix(coded_factors(feasible))
+    m, p = X.shape
+    if n_points < p:
+        raise ValueError(f"D最適計画には {p} 点以上が必要です")
+    rng = np.random.default_rng(seed)
+    design = list(rng.choice(m, size=n_points, replace=False))
+    for _ in range(max_passes):
+        improved = False
+        for pos in range(n_points):
+            M_inv = np.linalg.pinv(X[design].T @ X[design])
+            i = design[pos]
+            # 行 i を候補 j に入れ替えたときの det の変化率 (Fedorov の Δ)
+            d_i = X[i] @ M_inv @ X[i]
+            d_j = np.einsum('ij,jk,ik->i', X, M_inv, X)
+            d_ij = X @ M_inv @ X[i]
+            delta = d_j - d_i - d_i * d_j + d_ij ** 2
+            delta[design] = -np.inf
+            j = int(np.argmax(delta))
+            if delta[j] > 1e-9:
+                design[pos] = j
+                improved = True
+        if not improved:
+            break
+    info = X[design].T @ X[design]
+    sign, logdet = np.linalg.slogdet(info)
+    d_efficiency = np.exp(logdet / p) / n_points if sign > 0 else 0.0
+    return feasible.iloc[design].reset_index(drop=True), d_efficiency
+
+
+# ===============================================================
+# 主効果の推定 (Main-effects analysis)
+# ===============================================================
+def main_effects(summary, reference=None):
+    # ベンチマークごとに log(sim_ticks) を符号化した因子に回帰する。
+    # 効果 = 因子を最小から最大に変えたときの sim_ticks の変化率（係数 × 2 を指数に戻したもの）
+    # そのベンチマークの実行で変えていない因子は、モデルにも出力にも含めない
+    reference = summary if reference is None else reference
+    rows = []
+    for bench, group in summary.groupby('Benchmark'):
+        varying = varying_factors(group)
+        X = model_matrix(coded_factors(group, reference)[:, varying])
+        y = np.log(group['sim_ticks'].to_numpy(dtype=float))
+        coef, *_ = np.linalg.lstsq(X, y, rcond=None)
+        dof = len(y) - np.linalg.matrix_rank(X)
+        residual = y - X @ coef
+        sigma2 = residual @ residual / dof if dof > 0 else np.nan
+        std_err = np.sqrt(np.diag(np.linalg.pinv(X.T @ X)) * sigma2)
+        for k, j in enumerate(varying):
+            name, column = FACTORS[j]
+            rows.append({
+                'Benchmark': bench,
+                'Factor': name,
+                'Low': reference[column].min(),
+                'High': reference[column].max(),
+                'Effect (log)': 2 * coef[k + 1],
+                'Std Error (log)': 2 * std_err[k + 1],
+                't': coef[k + 1] / std_err[k + 1] if std_err[k + 1] > 0 else np.nan,
+                'sim_ticks change (%)': (np.exp(2 * coef[k + 1]) - 1) * 100,
+                'Runs': len(y),
+            })
+    effects = pd.DataFrame(rows)
+    if len(effects):
+        effects['|t|'] = effects['t'].abs()
+        effects = effects.sort_values(['Benchmark', '|t|'], ascending=[True, False]).drop(columns='|t|')
+    return effects.reset_index(drop=True)
+
+
+def print_balance(design):
+    # 各因子の水準ごとの点数（偏りの確認用）
+    for name, column in FACTORS:
+        counts = design[column].value_counts().sort_index()
+        print(f"  {name:<9}: " + ", ".join(f"{value}={count}" for value, count in counts.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="実験計画による構成の選択と主効果の推定")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in [("ff", "一部実施要因計画"), ("lhs", "ラテン超方格"), ("dopt", "D最適計画")]:
+        design_parser = sub.add_parser(name, help=help_text)
+        design_parser.add_argument("--from-csv", help="生成せずに既存の data.csv を実行可能集合として使う")
+        design_parser.add_argument("--filter", dest="filter_expr", help="make_data.py --filter と同じ条件式")
+        design_parser.add_argument("--output", default=DESIGN_OUTPUT_CSV)
+        design_parser.add_argument("--seed", type=int, default=0)
+        if name == "ff":
+            design_parser.add_argument("--fraction", type=int, choices=sorted(FRACTION_GENERATORS), default=1,
+                                       help="2^(5-p) の p")
+        else:
+            design_parser.add_argument("-n", "--points", type=int, default=16)
+    analyze_parser = sub.add_parser("analyze", help="集計結果から主効果を推定する")
+    analyze_parser.add_argument("--summary", default=SUMMARY_CSV)
+    analyze_parser.add_argument("--design", help="符号化の範囲に使う計画のCSV（省略時は集計結果の範囲）")
+    analyze_parser.add_argument("--output", default=MAIN_EFFECTS_CSV)
+    args = parser.parse_args()
+
+    with sweep_trace.stage(f"doe_{args.command}"):
+        if args.command == "analyze":
+            summary_df = pd.read_csv(args.summary)
+            effects_df = main_effects(summary_df, pd.read_csv(args.design) if args.design else None)
+            effects_df.to_csv(args.output, index=False)
+            print(effects_df.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+            print(f"\n✅ 主効果を出力しました → {args.output}")
+        else:
+            feasible_df = feasible_set(args.from_csv, args.filter_expr)
+            if args.command == "ff":
+                design_df, moved = fractional_factorial(feasible_df, args.fraction)
+                print(f"一部実施要因計画 2^(5-{args.fraction}): 目標点から最も近い構成までの距離 "
+                      f"平均 {np.nanmean(moved):.2f}, 最大 {np.nanmax(moved):.2f}（符号化した空間）")
+            elif args.command == "lhs":
+                design_df, moved = latin_hypercube(feasible_df, args.points, args.seed)
+                print(f"ラテン超方格 {args.points} 点: 目標点から最も近い構成までの距離 "
+                      f"平均 {np.nanmean(moved):.2f}, 最大 {np.nanmax(moved):.2f}（符号化した空間）")
+            else:
+                design_df, efficiency = d_optimal(feasible_df, args.points, args.seed)
+                print(f"D最適計画 {args.points} 点: D効率 {efficiency:.3f}")
+            design_df.to_csv(args.output, index=False)
+            print(f"実行可能な {len(feasible_df)} 構成から {len(design_df)} 構成を選びました。")
+            print_balance(design_df)
+            print(f"[完了] {len(design_df)}件を {args.output} に書き込みました。")
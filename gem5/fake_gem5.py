@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import json
+import math
+import random
+import hashlib
+import argparse
+
+# ===============================================================
+# gem5 の代用実行ファイル (Fake gem5 for orchestrator load testing)
+#
+# run_all.py が組み立てるのと同じ引数列を受け取り、モデルから求めた時間だけ
+# sleep してから、それらしい stats.txt を出力ディレクトリに書き出す。
+#   ./build/ALPHA/gem5.opt -d OUT ./configs/example/se.py -n 8 --cpu-clock=1.0GHz ... -c CMD -o OPTS
+#
+# --stats-period を指定すると、gem5 の periodicStatDump と同じように
+# 累積値のブロックを実行中に stats.txt へ追記していく（最初の10%は
+# ウォームアップとして IPC が低く、L2 ミスが多い）。
+#
+# --roi を指定すると se.py の ROI モードと同じように、ROI の前 (AtomicSimpleCPU で早送り)
+# と ROI の2つのブロックを書き、roi_info.json を出力する。ROI の後の終了処理は
+# シミュレーションしないので、その分だけ実行時間も短くなる。
+#
+# `python fake_gem5.py --make-sandbox DIR` で run_all.py の相対パス
+# (GEM5_PATH, GEM5_CONFIG_SCRIPT, splash2 実行ファイル, filtered_data.csv) を
+# すべて満たすディレクトリを作成できる。DIR で run_all.py を実行すればよい。
+# ===============================================================
+
+# 挙動は環境変数で調整する（run_all.py からは引数を変えずに使えるように）
+TIME_SCALE = float(os.environ.get("FAKE_GEM5_TIME_SCALE", "0.001"))  # 予測実行時間に掛ける倍率
+FAIL_RATE = float(os.environ.get("FAKE_GEM5_FAIL_RATE", "0"))        # 非ゼロ終了する割合
+HANG_RATE = float(os.environ.get("FAKE_GEM5_HANG_RATE", "0"))        # 終了しない割合
+SLOW_RATE = float(os.environ.get("FAKE_GEM5_SLOW_RATE", "0"))        # 遅くなる割合
+SLOW_FACTOR = float(os.environ.get("FAKE_GEM5_SLOW_FACTOR", "10"))   # 遅くなる場合の倍率
+SEED = os.environ.get("FAKE_GEM5_SEED", "0")
+
+# 各ベンチマークの仮想的な命令数 (1コアあたりではなく全体)
+BENCH_INSTS = {
+    "fmm": 1.5e9, "ocean": 9.0e8, "raytrace": 2.4e9, "cholesky": 2.0e9,
+    "fft": 3.0e7, "lu": 2.6e9, "radix": 5.5e8,
+}
+
+# 命令数のうち ROI (並列区間) の割合。残りは入力の準備 (ROI の前) と終了処理 (ROI の後)
+BENCH_ROI_FRACTION = {
+    "fmm": 0.90, "ocean": 0.85, "raytrace": 0.92, "cholesky": 0.80,
+    "fft": 0.60, "lu": 0.95, "radix": 0.75,
+}
+ROI_SETUP_SHARE = 0.8    # ROI 以外の命令のうち ROI の前にある割合
+ATOMIC_SPEEDUP = 20.0    # 早送り (AtomicSimpleCPU) が詳細CPUより速い倍率
+ROI_INFO_FILE = "roi_info.json"
+
+# make-sandbox で作成するベンチマーク実行ファイル (run_all.py の BENCHMARKS と同じパス)
+SANDBOX_BENCH_PATHS = [
+    "./splash2/fmm/FMM",
+    "./splash2/ocean/contiguous_partitions/OCEAN",
+    "./splash2/raytrace/RAYTRACE",
+    "./splash2/cholesky/CHOLESKY",
+    "./splash2/fft/FFT",
+    "./splash2/lu/contiguous_blocks/LU",
+    "./splash2/radix/RADIX",
+]
+
+
+def parse_gem5_args(argv):
+    # gem5本体のオプション (-d) と se.py のオプションを分けずにまとめて解釈する
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("-d", "--outdir", default="m5out")
+    parser.add_argument("-n", "--num-cpus", type=int, default=1)
+    parser.add_argument("--cpu-type", default="atomic")
+    parser.add_argument("--cpu-clock", default="2GHz")
+    parser.add_argument("--l1d_size", default="64kB")
+    parser.add_argument("--l1d_assoc", type=int, default=2)
+    parser.add_argument("--l2_size", default="2MB")
+    parser.add_argument("--l2_assoc", type=int, default=8)
+    parser.add_argument("--l2_latency", type=int, default=20)
+    parser.add_argument("-c", "--cmd", default="")
+    parser.add_argument("-o", "--options", default="")
+    parser.add_argument("--stats-period", type=float, default=None)
+    parser.add_argument("--roi", choices=["work", "insts"], default=None)
+    parser.add_argument("--roi-start-insts", type=int, default=None)
+    parser.add_argument("--roi-end-insts", type=int, default=None)
+    # "-o -p8" のように値が '-' で始まる場合があるため、値を '=' でつないでおく
+    joined = []
+    i = 0
+    while i < len(argv):
+        if argv[i] in ("-o", "--options", "-c", "--cmd") and i + 1 < len(argv):
+            long_name = "--options" if argv[i] in ("-o", "--options") else "--cmd"
+            joined.append(f"{long_name}={argv[i + 1]}")
+            i += 2
+        else:
+            joined.append(argv[i])
+            i += 1
+    args, _ = parser.parse_known_args(joined)
+    return args
+
+
+def parse_size_kb(size_str):
+    size_str = size_str.strip()
+    if size_str.endswith("kB"):
+        return float(size_str[:-2])
+    if size_str.endswith("MB"):
+        return float(size_str[:-2]) * 1024
+    return float(size_str) / 1024
+
+
+def benchmark_name(cmd):
+    return os.path.basename(cmd).lower() if cmd else "unknown"
+
+
+def predict_wall_seconds(bench, core, clock_ghz):
+    # run_all.py と同じ「資料17ページ」の表から実行時間を予測する
+    from run_all import BASE_EXEC_TIMES, BASE_CPU_FREQ_GHZ
+    base_time = BASE_EXEC_TIMES.get((bench, core))
+    if base_time is None:
+        base_time = 300.0
+    return base_time * (BASE_CPU_FREQ_GHZ / clock_ghz)
+
+
+def make_stats(bench, core, clock_ghz, l1_kb, l1_assoc, l2_kb, l2_assoc, l2_latency, host_seconds, rng,
+               insts=None):
+    if insts is None:
+        insts = BENCH_INSTS.get(bench, 1.0e9)
+    # キャッシュが大きいほど、連想度が高いほど少しだけ速くなるような適当なモデル
+    cpi = 1.2 + 8.0 / math.sqrt(l1_kb) / math.log2(l1_assoc + 1) + 0.02 * l2_latency
+    cpi *= 1.0 + 0.05 * math.log2(max(core, 1)) + 0.2 * 1024 / l2_kb / math.log2(l2_assoc + 1)
+    cpi *= rng.uniform(0.98, 1.02)
+    cycles = insts / max(core, 1) * cpi
+    sim_seconds = cycles / (clock_ghz * 1e9)
+    sim_ticks = int(sim_seconds * 1e12)
+    l2_accesses = int(insts * 0.3 * 8.0 / l1_kb)
+    l2_miss_rate = min(1.0, 0.05 * 1024 / l2_kb * rng.uniform(0.9, 1.1))
+    return [
+        ("sim_seconds", f"{sim_seconds:.6f}", "Number of seconds simulated"),
+        ("sim_ticks", f"{sim_ticks}", "Number of ticks simulated"),
+        ("final_tick", f"{sim_ticks}", "Number of ticks from beginning of simulation (restored from checkpoints and never reset)"),
+        ("sim_freq", "1000000000000", "Frequency of simulated ticks"),
+        ("host_inst_rate", f"{int(insts / host_seconds)}", "Simulator instruction rate (inst/s)"),
+        ("host_op_rate", f"{int(insts * 1.1 / host_seconds)}", "Simulator op (including micro ops) rate (op/s)"),
+        ("host_tick_rate", f"{int(sim_ticks / host_seconds)}", "Simulator tick rate (ticks/s)"),
+        ("host_mem_usage", f"{int(300000 + core * 40000 + l2_kb * 20)}", "Number of bytes of host memory used"),
+        ("host_seconds", f"{host_seconds:.2f}", "Real time elapsed on the host"),
+        ("sim_insts", f"{int(insts)}", "Number of instructions simulated"),
+        ("sim_ops", f"{int(insts * 1.1)}", "Number of ops (including micro ops) simulated"),
+        ("system.clk_domain.clock", "1000", "Clock period in ticks"),
+        ("system.cpu_clk_domain.clock", f"{int(round(1000 / clock_ghz))}", "Clock period in ticks"),
+        ("system.l2.overall_accesses::total", f"{l2_accesses}", "number of overall (read+write) accesses"),
+        ("system.l2.overall_misses::total", f"{int(l2_accesses * l2_miss_rate)}", "number of overall misses"),
+        ("system.l2.demand_miss_rate::total", f"{l2_miss_rate:.6f}", "miss rate for demand accesses"),
+    ]
+
+
+def write_stats(path, stats, mode="w"):
+    with open(path, mode) as f:
+        f.write("\n---------- Begin Simulation Statistics ----------\n")
+        for key, value, desc in stats:
+            f.write(f"{key:<50} {value:>20}                       # {desc}\n")
+        f.write("\n---------- End Simulation Statistics   ----------\n")
+
+
+WARMUP_FRACTION = 0.1  # ウォームアップの区間 (sim_ticks の割合)
+
+
+def make_interval_stats(final_stats, tick_fraction, host_seconds, rng):
+    # 実行の途中 (sim_ticks の割合 tick_fraction) までの累積値を final_stats から作る
+    values = {key: value for key, value, _ in final_stats}
+    w = WARMUP_FRACTION
+    # ウォームアップ中は IPC が半分になるように命令数の進み方を曲げる
+    steady_rate = 1.0 / (1.0 - w / 2)
+    if tick_fraction < w:
+        inst_fraction = steady_rate * tick_fraction / 2
+    else:
+        inst_fraction = steady_rate * (w / 2 + tick_fraction - w)
+    inst_fraction = min(inst_fraction * rng.uniform(0.9995, 1.0005), 1.0)
+    # コールドミスの分だけウォームアップ中のミスを増やす（最後に最終値と一致する）
+    miss_fraction = (inst_fraction + min(tick_fraction, w)) / (1 + w)
+
+    sim_ticks = int(int(values["sim_ticks"]) * tick_fraction)
+    insts = int(float(values["sim_insts"]) * inst_fraction)
+    accesses = int(int(values["system.l2.overall_accesses::total"]) * inst_fraction)
+    misses = int(int(values["system.l2.overall_misses::total"]) * miss_fraction)
+    values.update({
+        "sim_seconds": f"{sim_ticks / 1e12:.6f}",
+        "sim_ticks": f"{sim_ticks}",
+        "final_tick": f"{sim_ticks}",
+        "host_inst_rate": f"{int(insts / host_seconds)}",
+        "host_op_rate": f"{int(insts * 1.1 / host_seconds)}",
+        "host_tick_rate": f"{int(sim_ticks / host_seconds)}",
+        "host_seconds": f"{host_seconds:.2f}",
+        "sim_insts": f"{insts}",
+        "sim_ops": f"{int(insts * 1.1)}",
+        "system.l2.overall_accesses::total": f"{accesses}",
+        "system.l2.overall_misses::total": f"{misses}",
+        "system.l2.demand_miss_rate::total": f"{misses / accesses if accesses else 0:.6f}",
+    })
+    return [(key, values[key], desc) for key, _, desc in final_stats]
+
+
+def roi_insts(args, bench):
+    # 戻り値: (ROI の前の命令数, ROI の命令数)
+    total = BENCH_INSTS.get(bench, 1.0e9)
+    if args.roi == "insts":
+        return float(args.roi_start_insts), float(args.roi_end_insts - args.roi_start_insts)
+    roi = total * BENCH_ROI_FRACTION.get(bench, 0.9)
+    return (total - roi) * ROI_SETUP_SHARE, roi
+
+
+def write_roi_stats(args, bench, clock_ghz, l1_kb, l2_kb, host_seconds, rng):
+    # ROI の前は1コアで早送りした区間、ROI は詳細CPUの区間として2つのブロックを書く
+    setup_insts, insts = roi_insts(args, bench)
+    setup_seconds = host_seconds * (setup_insts / ATOMIC_SPEEDUP) / (setup_insts / ATOMIC_SPEEDUP + insts)
+    setup = make_stats(bench, 1, clock_ghz, l1_kb, args.l1d_assoc, l2_kb, args.l2_assoc, args.l2_latency,
+                       max(setup_seconds, 1e-3), rng, insts=setup_insts)
+    roi = make_stats(bench, args.num_cpus, clock_ghz, l1_kb, args.l1d_assoc, l2_kb, args.l2_assoc,
+                     args.l2_latency, max(host_seconds - setup_seconds, 1e-3), rng, insts=insts)
+    begin_tick = int(setup[1][1])
+    end_tick = begin_tick + int(roi[1][1])
+    # final_tick はリセットされない
+    roi = [(key, f"{end_tick}" if key == "final_tick" else value, desc) for key, value, desc in roi]
+    stats_path = os.path.join(args.outdir, "stats.txt")
+    write_stats(stats_path, setup)
+    write_stats(stats_path, roi, "a")
+    info = {'mode': args.roi, 'stats_dump': 1, 'roi_begin_tick': begin_tick, 'roi_end_tick': end_tick,
+            'complete': True, 'end_cause': "work items exit count reached"}
+    if args.roi == "insts":
+        info.update({'roi_start_insts': args.roi_start_insts, 'roi_end_insts': args.roi_end_insts,
+                     'end_cause': "roi end instruction count reached"})
+    with open(os.path.join(args.outdir, ROI_INFO_FILE), "w") as f:
+        json.dump(info, f)
+    return info
+
+
+def run_fake_gem5(argv):
+    args = parse_gem5_args(argv)
+    bench = benchmark_name(args.cmd)
+    clock_ghz = float(args.cpu_clock.replace("GHz", ""))
+    l1_kb = parse_size_kb(args.l1d_size)
+    l2_kb = parse_size_kb(args.l2_size)
+
+    # 同じ出力ディレクトリなら同じ結果になるように、シードと出力先から乱数を作る
+    digest = hashlib.sha256(f"{SEED}:{os.path.abspath(args.outdir)}".encode()).hexdigest()
+    rng = random.Random(int(digest[:16], 16))
+
+    os.makedirs(args.outdir, exist_ok=True)
+    print("gem5 Simulator System.  http://gem5.org (fake)")
+    print(f"command line: {' '.join(sys.argv)}")
+    if args.roi and args.stats_period:
+        print("fatal: --roi cannot be combined with --stats-period", file=sys.stderr)
+        return 1
+    if args.roi == "insts" and not (args.roi_start_insts and args.roi_end_insts
+                                    and 0 < args.roi_start_insts < args.roi_end_insts):
+        print("fatal: --roi=insts needs 0 < --roi-start-insts < --roi-end-insts", file=sys.stderr)
+        return 1
+
+    duration = predict_wall_seconds(bench, args.num_cpus, clock_ghz) * TIME_SCALE
+    if args.roi:
+        # 早送りは速く、ROI の後はシミュレーションしない
+        setup_insts, insts = roi_insts(args, bench)
+        duration *= (setup_insts / ATOMIC_SPEEDUP + insts) / BENCH_INSTS.get(bench, 1.0e9)
+    fault = rng.random()
+    if fault < FAIL_RATE:
+        time.sleep(duration * rng.random())
+        print(f"fatal: injected failure for {args.outdir}", file=sys.stderr)
+        return 1
+    if fault < FAIL_RATE + HANG_RATE:
+        print(f"warn: injected hang for {args.outdir}", file=sys.stderr)
+        while True:
+            time.sleep(3600)
+    if fault < FAIL_RATE + HANG_RATE + SLOW_RATE:
+        duration *= SLOW_FACTOR
+
+    stats_path = os.path.join(args.outdir, "stats.txt")
+    start = time.time()
+    if args.stats_period:
+        # 最終結果と同じ乱数で全体を先に求め、途中の累積値をダンプしながら進める
+        rng_state = rng.getstate()
+        preview = make_stats(bench, args.num_cpus, clock_ghz, l1_kb, args.l1d_assoc,
+                             l2_kb, args.l2_assoc, args.l2_latency, max(duration, 1e-3), rng)
+        rng.setstate(rng_state)
+        interval_rng = random.Random(int(digest[16:32], 16))
+        total_seconds = float(preview[0][1])
+        n_dumps = int(total_seconds / args.stats_period)
+        open(stats_path, "w").close()
+        for k in range(1, n_dumps + 1):
+            tick_fraction = k * args.stats_period / total_seconds
+            time.sleep(max(start + duration * tick_fraction - time.time(), 0))
+            host_elapsed = max(time.time() - start, 1e-3)
+            write_stats(stats_path, make_interval_stats(preview, tick_fraction, host_elapsed, interval_rng), "a")
+    time.sleep(max(start + duration - time.time(), 0))
+    host_seconds = max(time.time() - start, 1e-3)
+
+    if args.roi:
+        info = write_roi_stats(args, bench, clock_ghz, l1_kb, l2_kb, host_seconds, rng)
+        print("Exiting @ tick %s because %s" % (info['roi_end_tick'], info['end_cause']))
+        return 0
+    stats = make_stats(bench, args.num_cpus, clock_ghz, l1_kb, args.l1d_assoc,
+                       l2_kb, args.l2_assoc, args.l2_latency, host_seconds, rng)
+    write_stats(stats_path, stats, "a" if args.stats_period else "w")
+    print("Exiting @ tick %s because target called exit()" % stats[1][1])
+    return 0
+
+
+def make_sandbox(sandbox_dir, params_csv):
+    # run_all.py をそのまま実行できるディレクトリを作る
+    this_file = os.path.abspath(__file__)
+    gem5_path = os.path.join(sandbox_dir, "build", "ALPHA", "gem5.opt")
+    os.makedirs(os.path.dirname(gem5_path), exist_ok=True)
+    with open(gem5_path, "w") as f:
+        f.write("#!/bin/sh\n")
+        f.write(f'exec "{sys.executable}" "{this_file}" "$@"\n')
+    os.chmod(gem5_path, 0o755)
+
+    config_path = os.path.join(sandbox_dir, "configs", "example", "se.py")
+    os.makedirs(os.path.dirname(config_path), exist_ok=True)
+    open(config_path, "w").close()
+
+    for bench_path in SANDBOX_BENCH_PATHS:
+        full_path = os.path.join(sandbox_dir, bench_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        open(full_path, "w").close()
+
+    if params_csv:
+        with open(params_csv, "r") as src, open(os.path.join(sandbox_dir, "filtered_data.csv"), "w") as dst:
+            dst.write(src.read())
+
+    print(f"✅ 疑似gem5のサンドボックスを作成しました → {sandbox_dir}")
+    print(f"   cd {sandbox_dir} && python {os.path.join(os.path.dirname(this_file), 'run_all.py')}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--make-sandbox":
+        sandbox_parser = argparse.ArgumentParser()
+        sandbox_parser.add_argument("--make-sandbox", required=True, metavar="DIR")
+        sandbox_parser.add_argument("--params-csv", default="./filtered_data.csv")
+        sandbox_args = sandbox_parser.parse_args()
+        make_sandbox(sandbox_args.make_sandbox, sandbox_args.params_csv)
+    else:
+        sys.exit(run_fake_gem5(sys.argv[1:]))
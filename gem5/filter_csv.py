@@ -1,23 +1,21 @@
-import pandas as pd
+import sweep_trace
+from make_data import filter_csv_file
 
 # 入力ファイルと出力ファイルのパス
 input_csv = './data.csv'
 output_csv = './filtered_data.csv' # フィルタリングされたデータが保存される新しいファイル
 
-try:
-    # data.csv を読み込む
-    df = pd.read_csv(input_csv)
-
-    # フィルタリング条件を設定
-    # 'Core Number' が 8 または 16
-    # かつ 'L1 Cache Size (KB)' が 8 または 16
-    filtered_df = df[
-        (df['Core Number'].isin([8, 16])) &
-        (df['L1 Cache Size (KB)'].isin([8, 16]))
-    ]
+# フィルタリング条件を設定（make_data.py --filter と同じ式）
+# 'Core Number' が 8 または 16
+# かつ 'L1 Cache Size (KB)' が 8 または 16
+# data.csv を経由せずに直接生成する場合:
+#   python make_data.py --filter "core in (8, 16) and l1_size in (8, 16)" --output ./filtered_data.csv
+FILTER_EXPR = "core in (8, 16) and l1_size in (8, 16)"
 
-    # フィルタリングされたデータを新しいCSVファイルに保存
-    filtered_df.to_csv(output_csv, index=False)
+try:
+    # data.csv を読み込んでフィルタを適用する
+    with sweep_trace.stage("filter_csv", filter=FILTER_EXPR):
+        filtered_df = filter_csv_file(input_csv, output_csv, FILTER_EXPR)
 
     print(f"フィルタリングされたデータを '{output_csv}' に保存しました。")
     print(f"抽出された行数: {len(filtered_df)}")
@@ -25,4 +23,4 @@ try:
 except FileNotFoundError:
     print(f"エラー: '{input_csv}' が見つかりません。ファイルパスを確認してください。")
 except Exception as e:
-    print(f"データの処理中にエラーが発生しました: {e}")
\ No newline at end of file
+    print(f"データの処理中にエラーが発生しました: {e}")
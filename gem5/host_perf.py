@@ -0,0 +1,162 @@
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+import sweep_trace
+
+# ===============================================================
+# シミュレータの実行速度の集計と劣化の検出 (Host throughput report)
+#
+# simulation_summary.csv の host_seconds / host_inst_rate / host_mem_usage
+# （sim_summary.py が stats.txt から集める）を、ベンチマーク・コア数・
+# キャッシュサイズ・ホストごとに集計する。
+#
+# compare では2つのキャンペーン（gem5 の再ビルド前後、ホストの変更前後など）の
+# host_inst_rate を比べる。両方にある同じ構成・ベンチマークの実行は対にして
+# log(後 / 前) を、対が少ないグループは両者の log(host_inst_rate) の平均の差を取り、
+# ブートストラップの信頼区間の上限が 1 を下回り（有意に遅く）、かつ低下が
+# MIN_DROP 以上のグループを劣化として報告する（劣化があれば終了コード 1）。
+# ===============================================================
+SUMMARY_CSV = "./result/simulation_summary.csv"
+HOST_PERF_SUMMARY_CSV = "./result/host_perf_summary.csv"
+HOST_PERF_COMPARE_CSV = "./result/host_perf_compare.csv"
+
+GROUP_COLUMNS = ['Benchmark', 'Core Number', 'L1 Cache Size (KB)', 'L2 Cache Size (KB)', 'Host']
+PAIR_COLUMNS = [
+    'Benchmark', 'Core Number', 'L1 Cache Size (KB)', 'L1 Associativity',
+    'L2 Cache Size (KB)', 'L2 Associativity', 'L2 latency (cycles)'
+]
+COMPARE_BY = ['Benchmark', 'Core Number']
+
+N_BOOTSTRAP = 2000
+CONFIDENCE = 0.95
+MIN_DROP = 0.05   # これ未満の低下は有意でも報告しない
+MIN_PAIRS = 5     # これ未満しか対が無いグループは対にせずに比べる
+
+
+def host_runs(summary):
+    # ホスト統計のある実行だけ（複製した結果や古い集計結果の行は除く）
+    if 'host_inst_rate' not in summary.columns:
+        return summary.iloc[0:0]
+    runs = summary[summary['host_inst_rate'] > 0].copy()
+    if 'Host' not in runs.columns:
+        runs['Host'] = None
+    runs['Host'] = runs['Host'].fillna("(不明)")
+    return runs
+
+
+def summarize(runs, group_columns=GROUP_COLUMNS):
+    # 列ごとに集計した表を縦に並べる（"Group By" 列が集計に使った列）
+    tables = []
+    for column in group_columns:
+        if column not in runs.columns:
+            continue
+        grouped = runs.groupby(column)
+        table = pd.DataFrame({
+            'Runs': grouped.size(),
+            'host_inst_rate (median)': grouped['host_inst_rate'].median(),
+            'host_inst_rate (p10)': grouped['host_inst_rate'].quantile(0.1),
+            'host_inst_rate (p90)': grouped['host_inst_rate'].quantile(0.9),
+            'host_seconds (total)': grouped['host_seconds'].sum(),
+            'host_seconds (median)': grouped['host_seconds'].median(),
+            'host_mem_usage (median)': grouped['host_mem_usage'].median(),
+        })
+        table.index = table.index.astype(str)
+        table.index.name = 'Value'
+        table.insert(0, 'Group By', column)
+        tables.append(table.reset_index())
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+
+def bootstrap_mean(values, n_boot=N_BOOTSTRAP, seed=0):
+    rng = np.random.default_rng(seed)
+    values = np.asarray(values, dtype=float)
+    means = values[rng.integers(0, len(values), size=(n_boot, len(values)))].mean(axis=1)
+    return means
+
+
+def _compare_group(before, after, n_boot, seed):
+    # 戻り値: (方法, 件数, log 比の推定値, ブートストラップ標本)
+    pairs = before.merge(after, on=PAIR_COLUMNS, suffixes=(' before', ' after'))
+    if len(pairs) >= MIN_PAIRS:
+        log_ratio = np.log(pairs['host_inst_rate after'] / pairs['host_inst_rate before'])
+        return "paired", len(pairs), log_ratio.mean(), bootstrap_mean(log_ratio, n_boot, seed)
+    log_before = np.log(before['host_inst_rate'].to_numpy(dtype=float))
+    log_after = np.log(after['host_inst_rate'].to_numpy(dtype=float))
+    boot = bootstrap_mean(log_after, n_boot, seed) - bootstrap_mean(log_before, n_boot, seed + 1)
+    return "unpaired", min(len(before), len(after)), log_after.mean() - log_before.mean(), boot
+
+
+def compare_campaigns(before, after, by=COMPARE_BY, n_boot=N_BOOTSTRAP, confidence=CONFIDENCE,
+                      min_drop=MIN_DROP, seed=0):
+    alpha = (1 - confidence) / 2
+    groups = [("(全体)", before, after)]
+    for key, before_group in before.groupby(by):
+        key = key if isinstance(key, tuple) else (key,)
+        mask = np.ones(len(after), dtype=bool)
+        for column, value in zip(by, key):
+            mask &= (after[column] == value).to_numpy()
+        if mask.any():
+            groups.append((" / ".join(str(k) for k in key), before_group, after[mask]))
+
+    rows = []
+    for label, before_group, after_group in groups:
+        method, n, estimate, boot = _compare_group(before_group, after_group, n_boot, seed)
+        ratio = float(np.exp(estimate))
+        lower = float(np.exp(np.quantile(boot, alpha)))
+        upper = float(np.exp(np.quantile(boot, 1 - alpha)))
+        rows.append({
+            'Group': label,
+            'Method': method,
+            'Runs': n,
+            'host_inst_rate ratio': ratio,
+            f'{int(confidence * 100)}%CI下限': lower,
+            f'{int(confidence * 100)}%CI上限': upper,
+            'Regression': bool(upper < 1 and ratio <= 1 - min_drop),
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="シミュレータの実行速度の集計と、2つのキャンペーンの比較")
+    sub = parser.add_subparsers(dest="command")
+    summary_parser = sub.add_parser("summary", help="ベンチマーク・コア数・キャッシュサイズ・ホストごとに集計する")
+    summary_parser.add_argument("summary_csv", nargs="?", default=SUMMARY_CSV)
+    summary_parser.add_argument("--output", default=HOST_PERF_SUMMARY_CSV)
+    compare_parser = sub.add_parser("compare", help="2つのキャンペーンの host_inst_rate を比べる")
+    compare_parser.add_argument("before_csv")
+    compare_parser.add_argument("after_csv")
+    compare_parser.add_argument("--min-drop", type=float, default=MIN_DROP)
+    compare_parser.add_argument("--n-boot", type=int, default=N_BOOTSTRAP)
+    compare_parser.add_argument("--output", default=HOST_PERF_COMPARE_CSV)
+    args = parser.parse_args()
+    if args.command is None:
+        args = parser.parse_args(["summary"])
+
+    with sweep_trace.stage(f"host_perf_{args.command}"):
+        if args.command == "summary":
+            runs_df = host_runs(pd.read_csv(args.summary_csv))
+            if runs_df.empty:
+                print("❌ host_inst_rate のある行がありません（sim_summary.py で集計し直してください）。")
+                sys.exit(1)
+            summary_df = summarize(runs_df)
+            summary_df.to_csv(args.output, index=False)
+            for column, table in summary_df.groupby('Group By', sort=False):
+                print(f"\n📊 {column} ごとのシミュレータの実行速度:")
+                print(table.drop(columns='Group By').to_string(index=False))
+            print(f"\n✅ 集計を出力しました → {args.output}")
+        else:
+            before_df = host_runs(pd.read_csv(args.before_csv))
+            after_df = host_runs(pd.read_csv(args.after_csv))
+            if before_df.empty or after_df.empty:
+                print("❌ どちらかのキャンペーンに host_inst_rate のある行がありません。")
+                sys.exit(1)
+            compare_df = compare_campaigns(before_df, after_df, n_boot=args.n_boot, min_drop=args.min_drop)
+            compare_df.to_csv(args.output, index=False)
+            print(compare_df.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+            regressions = compare_df[compare_df['Regression']]
+            print(f"\n✅ 比較結果を出力しました → {args.output}")
+            if len(regressions):
+                print(f"🚨 host_inst_rate が有意に低下したグループ: {', '.join(regressions['Group'])}")
+                sys.exit(1)
+            print("劣化は検出されませんでした。")
@@ -1,5 +1,9 @@
 import pandas as pd
 import math
+import ast
+import argparse
+import sweep_trace
+from config_key import add_config_key
 
 # 対象のCore数リスト
 CPU_CORES = (2, 4, 8, 16, 32)
@@ -9,6 +13,11 @@ L1_csv = '../cacti_time/L1/L1_sorted_result.csv'
 L2_csv = '../cacti_time/L2/L2_sorted_result.csv'
 data_csv = './data.csv'
 
+DATA_COLUMNS = [
+    'Core Number', 'CPU clock (GHz)', 'L1 Cache Size (KB)', 'L1 Associativity',
+    'L2 Cache Size (KB)', 'L2 Associativity', 'L2 latency (cycles)', 'Total BCE Cost'
+]
+
 # L2サイズの計算式を修正し、可能なL2サイズのリストを返すように変更
 def get_possible_L2_sizes(L1_size, Core_num):
     # BCEコストの計算
@@ -45,88 +54,201 @@ def get_possible_L2_sizes(L1_size, Core_num):
 
     return possible_l2_sizes
 
-# CSV読み込み
-L1_df = pd.read_csv(L1_csv)
-L2_df = pd.read_csv(L2_csv)
-
-# 出力データの初期化（毎回新しいDataFrameを作成）
-data = pd.DataFrame(columns=[
-    'Core Number', 'CPU clock (GHz)', 'L1 Cache Size (KB)', 'L1 Associativity',
-    'L2 Cache Size (KB)', 'L2 Associativity', 'L2 latency (cycles)', 'Total BCE Cost'
-])
-
-rows = []
-
-# 各Core数とL1構成に対してループ
-for core in CPU_CORES:
-    for _, l1_row in L1_df.iterrows():
-        L1_size = l1_row['Cache Size (KB)']
-        L1_assoc = l1_row['Associativity']
-        L1_access_time_ns = l1_row['Access Time (ns)']
-
-        # CPU周波数 (GHz) の計算
-        # L1データキャッシュのアクセス時間の逆数、小数点第二位以下は切り捨て
-        if L1_access_time_ns <= 0:
-            cpu_frequency_ghz = 0.0
-            print(f"[警告] L1アクセス時間が0以下です: Core={core}, L1_size={L1_size}, L1_assoc={L1_assoc}. CPU周波数を0に設定します。")
-        else:
-            cpu_frequency_hz = 1 / (L1_access_time_ns * 1e-9)
-            cpu_frequency_ghz = math.floor(cpu_frequency_hz / 1e9 * 10) / 10
-
-        # CPUクロックサイクル時間 (ns) の計算
-        # CPU周波数が0の場合、クロックサイクル時間は無限大となる
-        if cpu_frequency_ghz <= 0:
-            cpu_clock_cycle_time_ns = float('inf')
-            print(f"[警告] 計算されたCPU周波数が0です: Core={core}, L1_size={L1_size}, L1_assoc={L1_assoc}. クロックサイクル時間を無限大に設定します。")
-        else:
-            cpu_clock_cycle_time_ns = 1 / cpu_frequency_ghz # 1GHz = 1nsサイクル時間
-
-        # L2サイズの候補リストを取得
-        possible_L2_sizes = get_possible_L2_sizes(L1_size, core)
-        if not possible_L2_sizes:
-            print(f"[警告] L2サイズの候補がありません: Core={core}, L1_size={L1_size}. このL1構成はスキップします。")
+# ===============================================================
+# 生成時フィルタ (Predicate pushdown)
+#
+# "core in (8, 16) and l1_size in (8, 16)" のような式を受け取り、
+# and で区切られた各条件を、その条件の変数がすべて決まるループの段で評価する。
+# 例えば core だけの条件は Core数のループで評価されるため、
+# 除外されたCore数の L1/L2 構成は最初から生成されない。
+# ===============================================================
+# 式で使える変数名と data.csv の列名の対応
+FILTER_VARIABLES = {
+    'core': 'Core Number',
+    'clock': 'CPU clock (GHz)',
+    'l1_size': 'L1 Cache Size (KB)',
+    'l1_assoc': 'L1 Associativity',
+    'l2_size': 'L2 Cache Size (KB)',
+    'l2_assoc': 'L2 Associativity',
+    'l2_latency': 'L2 latency (cycles)',
+    'bce': 'Total BCE Cost',
+}
+
+# ループの段ごとに、その段までに値が決まる変数
+FILTER_LEVELS = [
+    ('core', {'core'}),
+    ('l1', {'core', 'clock', 'l1_size', 'l1_assoc'}),
+    ('l2_size', {'core', 'clock', 'l1_size', 'l1_assoc', 'l2_size', 'bce'}),
+    ('l2_row', set(FILTER_VARIABLES)),
+]
+
+ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+    ast.Name, ast.Load, ast.Constant, ast.Tuple, ast.List, ast.Set,
+)
+
+
+def compile_filter(expr):
+    # 式を and で条件に分解し、段ごとの評価関数のリストを返す
+    levels = {name: [] for name, _ in FILTER_LEVELS}
+    if not expr:
+        return levels
+
+    tree = ast.parse(expr, mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"フィルタ式に使えない構文です: {ast.dump(node)}")
+        if isinstance(node, ast.Name) and node.id not in FILTER_VARIABLES:
+            raise ValueError(f"フィルタ式の変数名が不明です: {node.id} (使用可能: {', '.join(FILTER_VARIABLES)})")
+
+    body = tree.body
+    clauses = body.values if isinstance(body, ast.BoolOp) and isinstance(body.op, ast.And) else [body]
+    for clause in clauses:
+        names = {n.id for n in ast.walk(clause) if isinstance(n, ast.Name)}
+        code = compile(ast.Expression(clause), '<filter>', 'eval')
+        for level_name, bound in FILTER_LEVELS:
+            if names <= bound:
+                levels[level_name].append(code)
+                break
+    return levels
+
+
+def passes(level_codes, values):
+    return all(eval(code, {'__builtins__': {}}, values) for code in level_codes)
+
+
+def generate_rows(L1_df, L2_df, cores=CPU_CORES, filter_expr=None):
+    filters = compile_filter(filter_expr)
+    rows = []
+
+    # 各Core数とL1構成に対してループ
+    for core in cores:
+        if not passes(filters['core'], {'core': core}):
             continue
-
-        # 各L2サイズ候補に対してループ
-        for L2_size in possible_L2_sizes:
-            # L2_df から対応するサイズのエントリを抽出
-            match = L2_df[L2_df['Cache Size (KB)'] == L2_size]
-            if match.empty:
-                # このL2サイズがL2_dfに存在しない場合はスキップ
+        for _, l1_row in L1_df.iterrows():
+            L1_size = l1_row['Cache Size (KB)']
+            L1_assoc = l1_row['Associativity']
+            L1_access_time_ns = l1_row['Access Time (ns)']
+
+            # CPU周波数 (GHz) の計算
+            # L1データキャッシュのアクセス時間の逆数、小数点第二位以下は切り捨て
+            if L1_access_time_ns <= 0:
+                cpu_frequency_ghz = 0.0
+                print(f"[警告] L1アクセス時間が0以下です: Core={core}, L1_size={L1_size}, L1_assoc={L1_assoc}. CPU周波数を0に設定します。")
+            else:
+                cpu_frequency_hz = 1 / (L1_access_time_ns * 1e-9)
+                cpu_frequency_ghz = math.floor(cpu_frequency_hz / 1e9 * 10) / 10
+
+            # CPUクロックサイクル時間 (ns) の計算
+            # CPU周波数が0の場合、クロックサイクル時間は無限大となる
+            if cpu_frequency_ghz <= 0:
+                cpu_clock_cycle_time_ns = float('inf')
+                print(f"[警告] 計算されたCPU周波数が0です: Core={core}, L1_size={L1_size}, L1_assoc={L1_assoc}. クロックサイクル時間を無限大に設定します。")
+            else:
+                cpu_clock_cycle_time_ns = 1 / cpu_frequency_ghz # 1GHz = 1nsサイクル時間
+
+            values = {'core': core, 'clock': cpu_frequency_ghz, 'l1_size': L1_size, 'l1_assoc': L1_assoc}
+            if not passes(filters['l1'], values):
                 continue
 
-            # 複数候補がある場合は全て書き込む（連想度が異なるため）
-            for _, l2_row in match.iterrows():
-                L2_assoc = l2_row['Associativity']
-                L2_access_time_ns = l2_row['Access Time (ns)']
-
-                # L2レイテンシの計算
-                # L2レイテンシ = Ceil (L2共有キャッシュ・アクセス時間 / CPUクロックサイクル時間)
-                if cpu_clock_cycle_time_ns == float('inf') or cpu_clock_cycle_time_ns <= 0:
-                    l2_latency_cycles = float('inf')
-                    print(f"[警告] CPUクロックサイクル時間が不正なためL2レイテンシを計算できません。Core={core}, L1_size={L1_size}, L1_assoc={L1_assoc}, L2_size={L2_size}, L2_assoc={L2_assoc}")
-                else:
-                    l2_latency_cycles = math.ceil(L2_access_time_ns / cpu_clock_cycle_time_ns)
+            # L2サイズの候補リストを取得
+            possible_L2_sizes = get_possible_L2_sizes(L1_size, core)
+            if not possible_L2_sizes:
+                print(f"[警告] L2サイズの候補がありません: Core={core}, L1_size={L1_size}. このL1構成はスキップします。")
+                continue
 
+            # 各L2サイズ候補に対してループ
+            for L2_size in possible_L2_sizes:
                 # 総BCEコストの計算
                 total_bce_cost = core + (core * L1_size / 2) + (L2_size / 32) # コア数 + L1_BCE + L2_BCE
 
-                new_row = {
-                    'Core Number': int(core), # intにキャスト
-                    'CPU clock (GHz)': cpu_frequency_ghz, # floatのまま
-                    'L1 Cache Size (KB)': int(L1_size), # intにキャスト
-                    'L1 Associativity': int(L1_assoc), # intにキャスト
-                    'L2 Cache Size (KB)': int(L2_size), # intにキャスト
-                    'L2 Associativity': int(L2_assoc), # intにキャスト
-                    'L2 latency (cycles)': int(l2_latency_cycles) if l2_latency_cycles != float('inf') else l2_latency_cycles, # 無限大以外はintにキャスト
-                    'Total BCE Cost': int(total_bce_cost), # intにキャスト
-                }
-
-                rows.append(new_row)
-
-# データフレームにまとめて追加
-if rows:
-    data = pd.concat([data, pd.DataFrame(rows)], ignore_index=True)
-data.to_csv(data_csv, index=False)
-
-print(f"[完了] {len(rows)}件を {data_csv} に書き込みました。")
\ No newline at end of file
+                values.update({'l2_size': L2_size, 'bce': int(total_bce_cost)})
+                if not passes(filters['l2_size'], values):
+                    continue
+
+                # L2_df から対応するサイズのエントリを抽出
+                match = L2_df[L2_df['Cache Size (KB)'] == L2_size]
+                if match.empty:
+                    # このL2サイズがL2_dfに存在しない場合はスキップ
+                    continue
+
+                # 複数候補がある場合は全て書き込む（連想度が異なるため）
+                for _, l2_row in match.iterrows():
+                    L2_assoc = l2_row['Associativity']
+                    L2_access_time_ns = l2_row['Access Time (ns)']
+
+                    # L2レイテンシの計算
+                    # L2レイテンシ = Ceil (L2共有キャッシュ・アクセス時間 / CPUクロックサイクル時間)
+                    if cpu_clock_cycle_time_ns == float('inf') or cpu_clock_cycle_time_ns <= 0:
+                        l2_latency_cycles = float('inf')
+                        print(f"[警告] CPUクロックサイクル時間が不正なためL2レイテンシを計算できません。Core={core}, L1_size={L1_size}, L1_assoc={L1_assoc}, L2_size={L2_size}, L2_assoc={L2_assoc}")
+                    else:
+                        l2_latency_cycles = math.ceil(L2_access_time_ns / cpu_clock_cycle_time_ns)
+
+                    values.update({'l2_assoc': L2_assoc, 'l2_latency': l2_latency_cycles})
+                    if not passes(filters['l2_row'], values):
+                        continue
+
+                    new_row = {
+                        'Core Number': int(core), # intにキャスト
+                        'CPU clock (GHz)': cpu_frequency_ghz, # floatのまま
+                        'L1 Cache Size (KB)': int(L1_size), # intにキャスト
+                        'L1 Associativity': int(L1_assoc), # intにキャスト
+                        'L2 Cache Size (KB)': int(L2_size), # intにキャスト
+                        'L2 Associativity': int(L2_assoc), # intにキャスト
+                        'L2 latency (cycles)': int(l2_latency_cycles) if l2_latency_cycles != float('inf') else l2_latency_cycles, # 無限大以外はintにキャスト
+                        'Total BCE Cost': int(total_bce_cost), # intにキャスト
+                    }
+
+                    rows.append(new_row)
+
+    return rows
+
+
+def filter_csv_file(input_csv, output_csv, filter_expr):
+    # 既に生成された data.csv にフィルタを適用する (filter_csv.py の処理)
+    df = pd.read_csv(input_csv)
+    filters = compile_filter(filter_expr)
+    codes = [code for level_name, _ in FILTER_LEVELS for code in filters[level_name]]
+    columns = {var: df[col].to_numpy() for var, col in FILTER_VARIABLES.items() if col in df.columns}
+    keep = [
+        passes(codes, {var: values[i] for var, values in columns.items()})
+        for i in range(len(df))
+    ]
+    filtered_df = df[keep]
+    filtered_df.to_csv(output_csv, index=False)
+    return filtered_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="シミュレーション条件 (data.csv) の生成")
+    parser.add_argument("--filter", dest="filter_expr",
+                        help='生成時に適用する条件式 例: "core in (8, 16) and l1_size in (8, 16)"')
+    parser.add_argument("--from-csv", help="生成せずに既存のCSVにフィルタだけを適用する")
+    parser.add_argument("--output", default=data_csv)
+    args = parser.parse_args()
+
+    if args.from_csv:
+        filtered_df = filter_csv_file(args.from_csv, args.output, args.filter_expr)
+        print(f"[完了] {len(filtered_df)}件を {args.output} に書き込みました。")
+        return
+
+    # CSV読み込み
+    L1_df = pd.read_csv(L1_csv)
+    L2_df = pd.read_csv(L2_csv)
+
+    rows = generate_rows(L1_df, L2_df, filter_expr=args.filter_expr)
+
+    # 出力データの作成（毎回新しいDataFrameを作成）
+    data = pd.DataFrame(rows, columns=DATA_COLUMNS)
+    # 構成キー (config_key.py)。L2レイテンシが無限大の行は -1
+    data = add_config_key(data)
+    data.to_csv(args.output, index=False)
+
+    print(f"[完了] {len(rows)}件を {args.output} に書き込みました。")
+
+
+if __name__ == "__main__":
+    with sweep_trace.stage("make_data"):
+        main()
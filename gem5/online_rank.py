@@ -0,0 +1,310 @@
+import argparse
+import numpy as np
+import pandas as pd
+import sweep_trace
+from ranking import CONFIG_COLS, BCE_LIMIT, rank_configs
+from config_key import add_config_key
+
+# ===============================================================
+# 実行中のランキングと上位 k 構成の確定 (Online ranking with early termination)
+#
+# run_all.py の各実行が終わるたびに結果を取り込み、ベンチマークごとの最小値・
+# 正規化スコア・上位 k 構成を更新する（ranking.py と同じく、全ベンチマークの
+# 結果が揃った構成だけを順位付けする）。
+#
+# まだ結果の無い (構成, ベンチマーク) の sim_ticks には下限を置く:
+#   同じコア数で、クロック・L1/L2 のサイズと連想度がすべて同じか大きく、
+#   L2 レイテンシが同じか小さい構成（= 資源で上回る構成）の結果 × LOWER_BOUND_SLACK
+# 資源を増やしても sim_ticks は増えない、という仮定に基づく。
+#
+# 上位 k の外の構成が、どの結果が出ても上位 k のどの構成にも勝てないことが
+# 示せたら、その構成の残りの実行は不要になる（run_all.py はスキップする）。
+#   geo  : 幾何平均の大小は正規化に使う最小値に依存しないので、Σ log の比較で厳密に判定する
+#   arith: 最終的な最小値 m_b は [全構成の下限の最小, 現在の最小] のどこかなので、
+#          差 Σ (x_b - y_b) / m_b が最も小さくなる m_b を選んでも 0 以上であることを確かめる
+# ===============================================================
+DEFAULT_EXCLUDE = ("fft", "lu")  # result.py と同じ除外ベンチマーク
+TOP_K = 5
+LOWER_BOUND_SLACK = 0.98  # 資源の単調性がシミュレーションの揺らぎで少し崩れる分の余裕
+ONLINE_RANKING_CSV = "./result/online_ranking.csv"
+PARAMETERS_CSV = "./data.csv"  # 集計結果にはCPUクロックが残らないので、再生時はここから補う
+
+KEY_COLUMNS = [c for c in CONFIG_COLS if c != 'BCE']
+JOB_KEYS = ['core', 'l1_size', 'l1_assoc', 'l2_size', 'l2_assoc', 'l2_latency']
+
+# 資源の向き (+1: 大きいほど速い, -1: 小さいほど速い, 0: 一致が必要)
+RESOURCE_DIRECTIONS = {
+    'core': 0, 'clock': +1, 'l1_size': +1, 'l1_assoc': +1,
+    'l2_size': +1, 'l2_assoc': +1, 'l2_latency': -1,
+}
+
+PENDING, DONE, DROPPED = 0, 1, 2
+
+
+def config_bce(core, l1_size, l2_size):
+    # sim_summary.py と同じ式: コア数 + L1_BCE + L2_BCE
+    return int(core + core * l1_size / 2 + l2_size / 32)
+
+
+class OnlineRanking:
+    def __init__(self, benchmarks, top_k=TOP_K, mean_type='arith', bce_limit=BCE_LIMIT,
+                 lower_bound_slack=LOWER_BOUND_SLACK):
+        self.benchmarks = list(benchmarks)
+        self.bench_index = {b: j for j, b in enumerate(self.benchmarks)}
+        self.top_k = top_k
+        self.mean_type = mean_type
+        self.bce_limit = bce_limit
+        self.slack = lower_bound_slack
+        self.config_index = {}
+        self.keys = []
+        self.resources = np.empty((0, len(RESOURCE_DIRECTIONS)))
+        n_benchs = len(self.benchmarks)
+        self.state = np.empty((0, n_benchs), dtype=int)
+        self.tick_sum = np.empty((0, n_benchs))
+        self.tick_count = np.empty((0, n_benchs))
+        self.lower = np.empty((0, n_benchs))
+        self._prunable = None  # prunable() の結果（取り込むたびに作り直す）
+
+    # ---- 登録と取り込み ----
+    def _index(self, job):
+        key = tuple(job[k] for k in JOB_KEYS)
+        return self.config_index.get(key), key
+
+    def add_pending(self, jobs):
+        # これから実行する jobs を登録する（順位付けの対象外のものは無視する）
+        self._prunable = None
+        new_keys, new_resources = [], []
+        for job in jobs:
+            if job['bench'] not in self.bench_index:
+                continue
+            if self.bce_limit is not None and config_bce(job['core'], job['l1_size'], job['l2_size']) >= self.bce_limit:
+                continue
+            index, key = self._index(job)
+            if index is None and key not in new_keys:
+                new_keys.append(key)
+                new_resources.append([job.get(k, np.nan) for k in RESOURCE_DIRECTIONS])
+        if new_keys:
+            start = len(self.keys)
+            for i, key in enumerate(new_keys):
+                self.config_index[key] = start + i
+            self.keys.extend(new_keys)
+            n_new, n_benchs = len(new_keys), len(self.benchmarks)
+            self.resources = np.vstack([self.resources, np.array(new_resources, dtype=float)])
+            # 登録されなかったベンチマークは実行されないものとして扱う
+            self.state = np.vstack([self.state, np.full((n_new, n_benchs), DROPPED)])
+            self.tick_sum = np.vstack([self.tick_sum, np.zeros((n_new, n_benchs))])
+            self.tick_count = np.vstack([self.tick_count, np.zeros((n_new, n_benchs))])
+            self.lower = np.vstack([self.lower, np.zeros((n_new, n_benchs))])
+        for job in jobs:
+            index, _ = self._index(job)
+            if index is not None and job['bench'] in self.bench_index:
+                j = self.bench_index[job['bench']]
+                if self.state[index, j] == DROPPED and self.tick_count[index, j] == 0:
+                    self.state[index, j] = PENDING
+
+    def _dominated_by(self, i):
+        # 構成 i が資源で上回る（= i の結果が下限になる）構成のマスク
+        mask = np.ones(len(self.keys), dtype=bool)
+        for col, direction in enumerate(RESOURCE_DIRECTIONS.values()):
+            value = self.resources[i, col]
+            if np.isnan(value):
+                continue
+            column = self.resources[:, col]
+            if direction == 0:
+                mask &= column == value
+            elif direction > 0:
+                mask &= ~(column > value)
+            else:
+                mask &= ~(column < value)
+        return mask
+
+    def observe(self, job, sim_ticks):
+        index, _ = self._index(job)
+        if index is None or job['bench'] not in self.bench_index:
+            return
+        j = self.bench_index[job['bench']]
+        self._prunable = None
+        self.state[index, j] = DONE
+        self.tick_sum[index, j] += sim_ticks
+        self.tick_count[index, j] += 1
+        self.lower[index, j] = self.tick_sum[index, j] / self.tick_count[index, j]
+        dominated = self._dominated_by(index)
+        dominated[index] = False
+        self.lower[dominated, j] = np.maximum(self.lower[dominated, j], sim_ticks * self.slack)
+
+    def drop(self, job):
+        # 失敗した実行: その構成は全ベンチマークが揃わないので順位付けの対象から外れる
+        index, _ = self._index(job)
+        if index is not None and job['bench'] in self.bench_index:
+            j = self.bench_index[job['bench']]
+            if self.state[index, j] == PENDING:
+                self.state[index, j] = DROPPED
+                self._prunable = None
+
+    # ---- 順位付け ----
+    def _ticks(self):
+        with np.errstate(invalid='ignore'):
+            return np.where(self.tick_count > 0, self.tick_sum / np.maximum(self.tick_count, 1), np.nan)
+
+    def _current_min(self):
+        ticks = self._ticks()
+        done = ~np.isnan(ticks)
+        return np.where(done.any(axis=0), np.nanmin(np.where(done, ticks, np.inf), axis=0), np.inf)
+
+    def _scores(self, ticks, bench_min):
+        normalized = ticks / bench_min
+        if self.mean_type == 'geo':
+            return np.exp(np.mean(np.log(normalized), axis=1))
+        return np.mean(normalized, axis=1)
+
+    def ranking(self):
+        # 全ベンチマークが揃った構成の現在の順位 (DataFrame)
+        ticks = self._ticks()
+        complete = np.where((self.state == DONE).all(axis=1))[0] if len(self.keys) else np.array([], dtype=int)
+        score_col = '平均(正規化)' if self.mean_type == 'arith' else '幾何平均(正規化)'
+        if len(complete) == 0:
+            return pd.DataFrame(columns=KEY_COLUMNS + [score_col])
+        scores = self._scores(ticks[complete], self._current_min())
+        order = np.argsort(scores, kind='stable')
+        result = pd.DataFrame([self.keys[i] for i in complete[order]], columns=KEY_COLUMNS)
+        result[score_col] = scores[order]
+        return result
+
+    def _top(self):
+        ticks = self._ticks()
+        complete = np.where((self.state == DONE).all(axis=1))[0]
+        if len(complete) < self.top_k or np.isinf(self._current_min()).any():
+            return None
+        scores = self._scores(ticks[complete], self._current_min())
+        return complete[np.argsort(scores, kind='stable')[:self.top_k]]
+
+    def _challenger_bounds(self):
+        # 各構成の sim_ticks の下限ベクトル（結果があれば実測値）。揃う見込みの無い構成は対象外
+        alive = ~(self.state == DROPPED).any(axis=1)
+        return alive, np.where(self.state == DONE, self._ticks(), self.lower)
+
+    def _cannot_beat(self, challengers, incumbent):
+        # challengers (n x B) のどれも incumbent (B) より良いスコアになり得ないか
+        if self.mean_type == 'geo':
+            with np.errstate(divide='ignore'):
+                return (np.log(challengers) - np.log(incumbent)).sum(axis=1) >= 0
+        current_min = self._current_min()
+        _, lower = self._challenger_bounds()
+        undecided = self.state != DROPPED
+        # 最終的な最小値の下限: 現在の最小値と、結果の出ていない組の下限の小さい方
+        floor = np.minimum(current_min, np.where(undecided & (self.state != DONE), lower, np.inf).min(axis=0))
+        diff = challengers - incumbent
+        with np.errstate(divide='ignore', invalid='ignore'):
+            worst = np.where(diff >= 0, diff / current_min, np.where(floor > 0, diff / floor, -np.inf))
+        return worst.sum(axis=1) >= 0
+
+    def prunable(self):
+        # 上位 k に入り得ないことが示せた構成のマスク（上位 k が決まらなければ None）
+        if self._prunable is None:
+            self._prunable = (self._compute_prunable(),)
+        return self._prunable[0]
+
+    def _compute_prunable(self):
+        top = self._top()
+        if top is None:
+            return None
+        alive, bounds = self._challenger_bounds()
+        outside = alive.copy()
+        outside[top] = False
+        candidates = np.where(outside)[0]
+        beaten = np.ones(len(candidates), dtype=bool)
+        for i in top:
+            beaten &= self._cannot_beat(bounds[candidates], self._ticks()[i])
+        mask = np.zeros(len(self.keys), dtype=bool)
+        mask[candidates[beaten]] = True
+        # 揃う見込みの無い構成も上位 k には入らない
+        mask |= ~alive
+        return mask
+
+    def is_stable(self):
+        # 上位 k の外のすべての構成が上位 k に入り得ないことが示せたか
+        mask = self.prunable()
+        if mask is None:
+            return False
+        top = set(self._top())
+        return all(mask[i] for i in range(len(self.keys)) if i not in top)
+
+    def should_prune(self, job):
+        # この job の構成が上位 k に入り得ないことが示せたら True（残りの実行は不要）
+        index, _ = self._index(job)
+        if index is None:
+            return False
+        mask = self.prunable()
+        return bool(mask is not None and mask[index] and (self.state[index] != DONE).any())
+
+
+def _job_from_row(row):
+    return {
+        'bench': row['Benchmark'], 'core': row['Core Number'], 'clock': row.get('CPU clock (GHz)', np.nan),
+        'l1_size': row['L1 Cache Size (KB)'], 'l1_assoc': row['L1 Associativity'],
+        'l2_size': row['L2 Cache Size (KB)'], 'l2_assoc': row['L2 Associativity'],
+        'l2_latency': row['L2 latency (cycles)'],
+    }
+
+
+def attach_clock(summary, params):
+    # simulation_summary.csv の 'CPU clock (GHz)' は gem5 のシステムクロックなので、
+    # 構成の CPU クロックを実行条件の CSV から付け直す（構成キー1列で結合する）
+    if 'Config Key' not in summary.columns:
+        summary = add_config_key(summary)
+    clocks = add_config_key(params)[['Config Key', 'CPU clock (GHz)']].drop_duplicates('Config Key')
+    return summary.drop(columns=['CPU clock (GHz)'], errors='ignore').merge(clocks, on='Config Key', how='left')
+
+
+def replay(summary, benchmarks, top_k=TOP_K, mean_type='arith', bce_limit=BCE_LIMIT, seed=0):
+    # 集計済みの結果をランダムな完了順で取り込み、どこで上位 k が確定し、
+    # 何件の実行を省けたかを調べる（省いた実行は取り込まない）
+    rows = summary.sample(frac=1.0, random_state=seed).to_dict('records')
+    jobs = [_job_from_row(row) for row in rows]
+    online = OnlineRanking(benchmarks, top_k, mean_type, bce_limit)
+    online.add_pending(jobs)
+    n_run = n_skipped = 0
+    stable_at = None
+    for job, row in zip(jobs, rows):
+        if online.should_prune(job):
+            n_skipped += 1
+            continue
+        n_run += 1
+        online.observe(job, row['sim_ticks'])
+        if stable_at is None and online.is_stable():
+            stable_at = n_run
+    return online, n_run, n_skipped, stable_at
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="集計済みの結果を1件ずつ取り込み、上位 k の確定と省ける実行を調べる")
+    parser.add_argument("input_csv", nargs="?", default="./result/simulation_summary.csv")
+    parser.add_argument("--exclude", default=",".join(DEFAULT_EXCLUDE), help="除外するベンチマーク (カンマ区切り)")
+    parser.add_argument("--mean", choices=["arith", "geo"], default="arith")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--bce-limit", type=float, default=BCE_LIMIT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--params", default=PARAMETERS_CSV, help="CPUクロックを補う実行条件のCSV (data.csv)")
+    args = parser.parse_args()
+
+    with sweep_trace.stage("online_rank"):
+        summary_df = attach_clock(pd.read_csv(args.input_csv).dropna(subset=['sim_ticks']), pd.read_csv(args.params))
+        excluded = [b.lower() for b in args.exclude.split(",") if b]
+        bench_names = sorted(b for b in summary_df['Benchmark'].unique() if b.lower() not in excluded)
+        online_rank, n_run, n_skipped, stable_at = replay(
+            summary_df, bench_names, args.top_k, args.mean, args.bce_limit, args.seed)
+
+        print(f"取り込んだ実行: {n_run} 件, 省けた実行: {n_skipped} 件 / 全 {len(summary_df)} 件")
+        if stable_at is not None:
+            print(f"✅ {stable_at} 件目の取り込みで上位 {args.top_k} が確定しました。")
+        else:
+            print(f"⚠️ 全件を取り込んでも上位 {args.top_k} は確定しませんでした。")
+        online_top = online_rank.ranking().head(args.top_k)
+        print(online_top)
+
+        # 全件から求めた ranking.py の結果と上位 k の集合を比べる
+        offline = rank_configs(summary_df, exclude=excluded, mean_type=args.mean,
+                               bce_limit=args.bce_limit, n_boot=0)
+        offline_keys = set(map(tuple, offline[KEY_COLUMNS].head(args.top_k).to_numpy().tolist()))
+        online_keys = set(map(tuple, online_top[KEY_COLUMNS].to_numpy().tolist()))
+        print(f"ranking.py（全件）の上位 {args.top_k} と{'一致' if offline_keys == online_keys else '不一致'}")
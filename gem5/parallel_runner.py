@@ -0,0 +1,399 @@
+import os
+import csv
+import glob
+import time
+import shutil
+import signal
+import socket
+import subprocess
+import sweep_trace
+from sim_summary import extract_stats
+
+# ===============================================================
+# gem5 の並列実行 (Parallel runner with memory-aware admission control)
+#
+# 各実行のピークRSSを過去の実行履歴から (ベンチマーク, コア数, L1/L2サイズ) ごとに
+# 予測し、実行中の予測合計がメモリ予算を超えない範囲でだけ新しい実行を開始する。
+# 待ち行列は予測メモリの大きい順に並べ、空いたメモリに収まる最初の実行を
+# 詰めていくので、大きな実行の隙間を小さな実行で埋められる。
+#
+# CpuAllocator を渡すと、各gem5を専用の物理コアに固定し（SMTの兄弟スレッドは
+# 使わない）、numactl があればそのコアのNUMAノードにメモリを割り当てる。
+#
+# monitor_factory を渡すと、実行中の各gem5に監視オブジェクト（poll() が True を
+# 返したら止める。convergence.ConvergenceMonitor など）を付ける。監視によって
+# 止めた実行は正常終了として扱う。
+#
+# 各実行はワーカースロット (1, 2, ...) に割り当て、sweep_trace の区間として記録する。
+# ===============================================================
+RUN_HISTORY_COLUMNS = [
+    'Benchmark', 'Core Number', 'CPU clock (GHz)', 'L1 Cache Size (KB)', 'L1 Associativity',
+    'L2 Cache Size (KB)', 'L2 Associativity', 'L2 latency (cycles)',
+    'wall_seconds', 'peak_rss_mb', 'returncode', 'early_stopped', 'host', 'cpu', 'out_dir', 'finished_at'
+]
+
+# 履歴がない場合の保守的な見積もり (MB)
+DEFAULT_BASE_MB = 1024
+DEFAULT_MB_PER_CORE = 256
+DEFAULT_MB_PER_L2_MB = 64
+# 履歴から予測する場合の余裕
+SAFETY_MARGIN = 1.2
+
+POLL_INTERVAL_SECONDS = 0.2
+
+
+def available_memory_mb():
+    # /proc/meminfo の MemAvailable (Linux)。取得できなければ物理メモリ全体
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / (1024 * 1024)
+
+
+class MemoryModel:
+    def __init__(self, history_csv):
+        self.history_csv = history_csv
+        self.exact = {}     # (bench, core, l1_size, l2_size) -> 最大ピークRSS
+        self.by_core = {}   # (bench, core) -> 最大ピークRSS
+        if os.path.exists(history_csv):
+            with open(history_csv, "r", newline="") as f:
+                for row in csv.DictReader(f):
+                    if row.get('peak_rss_mb'):
+                        self._learn(row['Benchmark'], int(row['Core Number']),
+                                    int(row['L1 Cache Size (KB)']), int(row['L2 Cache Size (KB)']),
+                                    float(row['peak_rss_mb']))
+
+    def _learn(self, bench, core, l1_size, l2_size, peak_rss_mb):
+        key = (bench, core, l1_size, l2_size)
+        self.exact[key] = max(self.exact.get(key, 0.0), peak_rss_mb)
+        self.by_core[(bench, core)] = max(self.by_core.get((bench, core), 0.0), peak_rss_mb)
+
+    def predict(self, job):
+        key = (job['bench'], job['core'], job['l1_size'], job['l2_size'])
+        if key in self.exact:
+            return self.exact[key] * SAFETY_MARGIN
+        if key[:2] in self.by_core:
+            return self.by_core[key[:2]] * SAFETY_MARGIN
+        return DEFAULT_BASE_MB + DEFAULT_MB_PER_CORE * job['core'] + DEFAULT_MB_PER_L2_MB * job['l2_size'] / 1024
+
+    def record(self, job, wall_seconds, peak_rss_mb, returncode):
+        if returncode == 0:
+            self._learn(job['bench'], job['core'], job['l1_size'], job['l2_size'], peak_rss_mb)
+        write_header = not os.path.exists(self.history_csv)
+        fieldnames = RUN_HISTORY_COLUMNS
+        if write_header:
+            if os.path.dirname(self.history_csv):
+                os.makedirs(os.path.dirname(self.history_csv), exist_ok=True)
+        else:
+            with open(self.history_csv, "r", newline="") as f:
+                fieldnames = next(csv.reader(f), RUN_HISTORY_COLUMNS)
+            if not set(RUN_HISTORY_COLUMNS) <= set(fieldnames):
+                self._upgrade_history(fieldnames)
+                fieldnames = RUN_HISTORY_COLUMNS + [c for c in fieldnames if c not in RUN_HISTORY_COLUMNS]
+        with open(self.history_csv, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+            if write_header:
+                writer.writeheader()
+            writer.writerow({
+                'Benchmark': job['bench'], 'Core Number': job['core'], 'CPU clock (GHz)': job['clock'],
+                'L1 Cache Size (KB)': job['l1_size'], 'L1 Associativity': job['l1_assoc'],
+                'L2 Cache Size (KB)': job['l2_size'], 'L2 Associativity': job['l2_assoc'],
+                'L2 latency (cycles)': job['l2_latency'],
+                'wall_seconds': round(wall_seconds, 3), 'peak_rss_mb': round(peak_rss_mb, 1),
+                'returncode': returncode, 'early_stopped': int(bool(job.get('early_stopped'))),
+                'host': socket.gethostname(), 'cpu': job.get('cpu', ''),
+                'out_dir': job['out_dir'],
+                'finished_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+            })
+
+    def _upgrade_history(self, old_fieldnames):
+        # 古い履歴ファイルを現在の列で書き直す（無かった列は空欄。early_stopped の空欄は早期停止なし）
+        with open(self.history_csv, "r", newline="") as f:
+            rows = list(csv.DictReader(f))
+        fieldnames = RUN_HISTORY_COLUMNS + [c for c in old_fieldnames if c not in RUN_HISTORY_COLUMNS]
+        tmp_path = self.history_csv + ".tmp"
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, restval='')
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, self.history_csv)
+        print(f"🔧 {self.history_csv} を現在の列に書き直しました（追加: "
+              f"{', '.join(c for c in RUN_HISTORY_COLUMNS if c not in old_fieldnames)}）")
+
+
+def parse_cpu_list(text):
+    # "0-3,8,10-11" -> [0, 1, 2, 3, 8, 10, 11]
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-")
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def read_cpu_topology():
+    # このプロセスが使えるCPUごとに (物理パッケージ, コアID, NUMAノード, SMTの兄弟) を読む
+    allowed = os.sched_getaffinity(0)
+    node_of = {}
+    for node_path in glob.glob("/sys/devices/system/node/node[0-9]*"):
+        node = int(os.path.basename(node_path)[4:])
+        with open(os.path.join(node_path, "cpulist"), "r") as f:
+            for cpu in parse_cpu_list(f.read()):
+                node_of[cpu] = node
+
+    topology = []
+    for cpu in sorted(allowed):
+        topo_dir = f"/sys/devices/system/cpu/cpu{cpu}/topology"
+        try:
+            with open(os.path.join(topo_dir, "physical_package_id")) as f:
+                package = int(f.read())
+            with open(os.path.join(topo_dir, "core_id")) as f:
+                core_id = int(f.read())
+            with open(os.path.join(topo_dir, "thread_siblings_list")) as f:
+                siblings = parse_cpu_list(f.read())
+        except OSError:
+            package, core_id, siblings = 0, cpu, [cpu]
+        topology.append({'cpu': cpu, 'package': package, 'core_id': core_id,
+                         'node': node_of.get(cpu, 0), 'siblings': siblings})
+    return topology
+
+
+class CpuAllocator:
+    def __init__(self, avoid_smt=True, numa_local_memory=True):
+        topology = read_cpu_topology()
+        if avoid_smt:
+            # 物理コアごとに最初のスレッドだけを使う
+            seen = set()
+            slots = []
+            for info in topology:
+                key = (info['package'], info['core_id'])
+                if key not in seen:
+                    seen.add(key)
+                    slots.append(info)
+        else:
+            slots = topology
+        # ソケットに偏らないように、NUMAノードを交互に並べる
+        by_node = {}
+        for info in slots:
+            by_node.setdefault(info['node'], []).append(info)
+        self.order = []
+        while any(by_node.values()):
+            for node in sorted(by_node):
+                if by_node[node]:
+                    self.order.append(by_node[node].pop(0)['cpu'])
+        self.free = set(self.order)
+        self.node_of = {info['cpu']: info['node'] for info in topology}
+        self.capacity = len(self.order)
+        self.numactl = shutil.which("numactl") if numa_local_memory else None
+
+    def acquire(self):
+        for cpu in self.order:
+            if cpu in self.free:
+                self.free.remove(cpu)
+                return cpu
+        return None
+
+    def release(self, cpu):
+        self.free.add(cpu)
+
+    def wrap_command(self, command, shell, cpu):
+        # numactl があれば、メモリもそのコアのNUMAノードから確保させる
+        if not self.numactl:
+            return command
+        prefix = [self.numactl, f"--membind={self.node_of.get(cpu, 0)}", f"--physcpubind={cpu}"]
+        if shell:
+            return " ".join(prefix) + " " + command
+        return prefix + list(command)
+
+
+class ParallelRunner:
+    def __init__(self, memory_model, max_parallel=None, memory_budget_mb=None, timeout_seconds=None,
+                 cpu_allocator=None, monitor_factory=None):
+        self.memory_model = memory_model
+        self.max_parallel = max_parallel or os.cpu_count() or 1
+        self.memory_budget_mb = memory_budget_mb or available_memory_mb() * 0.8
+        self.timeout_seconds = timeout_seconds
+        self.cpu_allocator = cpu_allocator
+        if cpu_allocator is not None:
+            # 専用コアの数より多くは同時に実行しない
+            self.max_parallel = min(self.max_parallel, cpu_allocator.capacity)
+        self.host_rates = {}  # cpu -> host_inst_rate のリスト
+        self.monitor_factory = monitor_factory
+        self.monitors = {}  # pid -> 監視オブジェクト
+
+    def _start(self, job):
+        # 出力は結果ディレクトリのファイルに書き出す（パイプが詰まらないように）
+        os.makedirs(job['out_dir'], exist_ok=True)
+        stdout = open(os.path.join(job['out_dir'], "runner_stdout.txt"), "w")
+        stderr = open(os.path.join(job['out_dir'], "runner_stderr.txt"), "w")
+        command = job['command']
+        preexec_fn = None
+        if self.cpu_allocator is not None:
+            cpu = job['cpu']
+            command = self.cpu_allocator.wrap_command(command, job.get('shell', False), cpu)
+            # シェル経由の場合も子プロセスに引き継がれるよう、exec前に固定する
+            preexec_fn = lambda: os.sched_setaffinity(0, {cpu})
+        proc = subprocess.Popen(
+            command,
+            shell=job.get('shell', False),
+            executable='/bin/bash' if job.get('shell') else None,
+            stdout=stdout,
+            stderr=stderr,
+            start_new_session=True,  # タイムアウト時にシェルごとプロセスグループを止める
+            preexec_fn=preexec_fn,
+        )
+        stdout.close()
+        stderr.close()
+        return proc
+
+    def _pick_next(self, pending, used_mb, n_running):
+        # 残りのメモリ予算に収まる最初（priority が無ければ予測メモリが最大）の実行を選ぶ
+        for i, (job, predicted_mb) in enumerate(pending):
+            if used_mb + predicted_mb <= self.memory_budget_mb:
+                return i
+        # 何も実行していないのに収まらない場合は、予算を超えても1つだけ実行する
+        if n_running == 0 and pending:
+            print(f"⚠️ 予測メモリ {pending[0][1]:.0f}MB が予算 {self.memory_budget_mb:.0f}MB を超えますが、単独で実行します: {pending[0][0]['name']}")
+            return 0
+        return None
+
+    def run(self, jobs, on_start=None, on_finish=None, should_skip=None, priority=None):
+        # priority: job -> 小さいほど先に実行する値（実行中に変わってもよい）。同じ値の中は予測メモリの大きい順
+        # 予測メモリは実行が終わるたびに、学習したピークRSSで見積もり直す
+        pending = [(job, self.memory_model.predict(job)) for job in jobs]
+        pending.sort(key=lambda item: item[1], reverse=True)
+        running = {}  # pid -> (job, proc, predicted_mb, start_time)
+        used_mb = 0.0
+        free_slots = set(range(1, self.max_parallel + 1))
+        sweep_trace.name_process("run_all")
+        for slot in sorted(free_slots):
+            sweep_trace.name_thread(slot, f"slot {slot}")
+
+        print(f"並列実行: 最大 {self.max_parallel} 件, メモリ予算 {self.memory_budget_mb:.0f}MB, 待ち {len(pending)} 件")
+
+        while pending or running:
+            if priority is not None:
+                pending.sort(key=lambda item: priority(item[0]))
+            while pending and len(running) < self.max_parallel:
+                index = self._pick_next(pending, used_mb, len(running))
+                if index is None:
+                    break
+                job, predicted_mb = pending.pop(index)
+                # 開始直前に最新の情報で実行するかを判断し直す
+                if should_skip and should_skip(job):
+                    continue
+                job['slot'] = min(free_slots)
+                free_slots.remove(job['slot'])
+                if self.cpu_allocator is not None:
+                    job['cpu'] = self.cpu_allocator.acquire()
+                if on_start:
+                    on_start(job, predicted_mb)
+                proc = self._start(job)
+                running[proc.pid] = (job, proc, predicted_mb, time.time())
+                used_mb += predicted_mb
+                monitor = self.monitor_factory(job) if self.monitor_factory else None
+                if monitor is not None:
+                    self.monitors[proc.pid] = monitor
+
+            # タイムアウトした実行を止める
+            if self.timeout_seconds:
+                now = time.time()
+                for job, proc, _, start_time in running.values():
+                    if now - start_time > self.timeout_seconds and not job.get('timed_out'):
+                        job['timed_out'] = True
+                        print(f"⏱️ タイムアウトのため停止します ({self.timeout_seconds}秒): {job['name']}")
+                        try:
+                            os.killpg(proc.pid, signal.SIGKILL)
+                        except ProcessLookupError:
+                            pass
+
+            # 監視対象が収束した実行を止める
+            for pid, monitor in list(self.monitors.items()):
+                job, proc = running[pid][0], running[pid][1]
+                if job.get('early_stopped') or not monitor.poll():
+                    continue
+                job['early_stopped'] = True
+                print(f"🛑 指標が収束したため早期停止します: {job['name']}")
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+            # should_skip が残りをすべて省いた場合は、回収する子プロセスが無い
+            if not running:
+                continue
+            # 終了した子プロセスを回収し、ピークRSSを取得する
+            pid, status, rusage = os.wait4(-1, os.WNOHANG)
+            if pid == 0 or pid not in running:
+                time.sleep(POLL_INTERVAL_SECONDS)
+                continue
+            job, proc, predicted_mb, start_time = running.pop(pid)
+            used_mb -= predicted_mb
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            self.monitors.pop(pid, None)
+            if job.get('early_stopped'):
+                proc.returncode = 0
+            end_time = time.time()
+            wall_seconds = end_time - start_time
+            peak_rss_mb = rusage.ru_maxrss / 1024  # Linux の ru_maxrss は KB
+            free_slots.add(job['slot'])
+            sweep_trace.complete_event(job['name'], "gem5", start_time, end_time, tid=job['slot'], args={
+                'bench': job['bench'], 'core': job['core'], 'clock': job['clock'],
+                'l1_size': job['l1_size'], 'l1_assoc': job['l1_assoc'],
+                'l2_size': job['l2_size'], 'l2_assoc': job['l2_assoc'], 'l2_latency': job['l2_latency'],
+                'returncode': proc.returncode, 'peak_rss_mb': round(peak_rss_mb, 1),
+                'predicted_mb': round(predicted_mb, 1), 'cpu': job.get('cpu'),
+                'early_stopped': bool(job.get('early_stopped')), 'timed_out': bool(job.get('timed_out')),
+            })
+            self.memory_model.record(job, wall_seconds, peak_rss_mb, proc.returncode)
+            # 学習したピークRSSで、待ち行列の予測メモリを見積もり直す
+            pending = [(queued, self.memory_model.predict(queued)) for queued, _ in pending]
+            pending.sort(key=lambda item: item[1], reverse=True)
+            if self.cpu_allocator is not None:
+                self.cpu_allocator.release(job['cpu'])
+                self._record_host_rate(job, proc.returncode)
+            if on_finish:
+                # 結果の読み込みやDB登録は直列なので、その時間も区間として残す
+                with sweep_trace.span(f"collect {job['name']}", "collect"):
+                    on_finish(job, proc.returncode, wall_seconds, peak_rss_mb)
+
+    def _record_host_rate(self, job, returncode):
+        if returncode != 0:
+            return
+        stats = extract_stats(os.path.join(job['out_dir'], "stats.txt"))
+        if isinstance(stats.get('host_inst_rate'), (int, float)):
+            self.host_rates.setdefault(job['cpu'], []).append(stats['host_inst_rate'])
+
+    def write_host_rate_report(self, report_csv):
+        # コアごとの host_inst_rate（シミュレータの実行速度）を出力する
+        if not self.host_rates:
+            return
+        rows = []
+        for cpu in sorted(self.host_rates):
+            rates = sorted(self.host_rates[cpu])
+            rows.append({
+                'cpu': cpu,
+                'numa_node': self.cpu_allocator.node_of.get(cpu, 0),
+                'runs': len(rates),
+                'mean_host_inst_rate': round(sum(rates) / len(rates)),
+                'median_host_inst_rate': rates[len(rates) // 2],
+            })
+        if os.path.dirname(report_csv):
+            os.makedirs(os.path.dirname(report_csv), exist_ok=True)
+        with open(report_csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print("\n📊 コアごとの host_inst_rate:")
+        for row in rows:
+            print(f"  CPU {row['cpu']:>3} (node {row['numa_node']}): {row['runs']:>4} 件, "
+                  f"平均 {row['mean_host_inst_rate']:,} inst/s, 中央値 {row['median_host_inst_rate']:,} inst/s")
+        print(f"📄 {report_csv} に保存しました。")
@@ -0,0 +1,260 @@
+import bisect
+import argparse
+import numpy as np
+import pandas as pd
+import sweep_trace
+from make_data import L1_csv
+from config_key import add_config_key, FIELD_COLUMNS
+
+# ===============================================================
+# 性能・BCEコスト・エネルギーのパレート最適な構成 (Pareto frontier engine)
+#
+# simulation_summary.csv に CACTI の L1 読み出しエネルギー (Read Energy (nJ)) を結合し、
+#   L1 Energy (mJ) = Read Energy (nJ) x sim_insts x L1_ACCESSES_PER_INST
+#   EDP (mJ*s)     = L1 Energy (mJ) x sim_seconds (s)
+# を求めて、どの目的でも他に劣らない構成（スカイライン）を取り出す。すべて小さいほどよい。
+# CACTI の L2 の結果にはエネルギーが無いので L1 の動的エネルギーだけを数える
+# （L1_ACCESSES_PER_INST は全構成に共通の倍率なのでパレート集合には影響しない）。
+#
+# スカイラインは総当たりの比較ではなく、並べ替えてから1回走査して求める。
+#   2次元: 1つ目の目的で並べ、2つ目の目的のそれまでの最小値より小さい点だけが残る
+#   3次元: 1つ目の目的で並べ、残りの2目的の階段 (staircase) を bisect で保ちながら走査
+#   4次元以上: 目的の和で並べる SFS (Sort-Filter-Skyline)。後の点が前の点を支配することはない
+#
+# 集計CSVに sim_insts（EDP は sim_seconds (s) も）が無い古い結果ではエネルギーを求められないので、
+# 求められる目的のスカイライン（sim_ticks と BCE）だけを出力する。
+#
+# ベンチマークごとと、全ベンチマークの結果が揃った構成の全体（sim_ticks とエネルギーを
+# ベンチマークごとの最小値で正規化した平均）の両方で求める。
+# ===============================================================
+SUMMARY_CSV = "./result/simulation_summary.csv"
+PARETO_OUTPUT_CSV = "./result/pareto_frontier.csv"
+
+L1_ACCESSES_PER_INST = 0.3  # 命令あたりの L1D アクセス数（ロード・ストアの割合の目安）
+EXCLUDE_BENCHMARKS = ("fft", "lu")  # 全体のスカイラインから除くベンチマーク (result.py と同じ)
+SFS_BLOCK = 4096         # 4次元以上で一度に窓と比べる点の数
+SFS_WINDOW_CHUNK = 64    # 一度に比べる窓の点の数
+
+ENERGY_COLUMN = 'L1 Energy (mJ)'
+EDP_COLUMN = 'EDP (mJ*s)'
+# (フラグ列の名前, 目的の列)。全体では sim_ticks / エネルギーの代わりに正規化した平均を使う
+FRONTIERS = [
+    ('Pareto (time, BCE, energy)', ['sim_ticks', 'BCE', ENERGY_COLUMN]),
+    ('Pareto (time, BCE)', ['sim_ticks', 'BCE']),
+    ('Pareto (EDP, BCE)', [EDP_COLUMN, 'BCE']),
+]
+REQUIRED_COLUMNS = ['Benchmark', 'sim_ticks', 'BCE'] + FIELD_COLUMNS
+OUTPUT_COLUMNS = ['Scope'] + FIELD_COLUMNS + [
+    'Config Key', 'BCE', 'sim_ticks', 'sim_seconds (s)', 'sim_insts', 'Read Energy (nJ)', ENERGY_COLUMN, EDP_COLUMN,
+]
+OVERALL_COLUMNS = {
+    'sim_ticks': '平均(正規化 sim_ticks)',
+    ENERGY_COLUMN: '平均(正規化 L1 Energy)',
+    EDP_COLUMN: '平均(正規化 EDP)',
+}
+
+
+# ===============================================================
+# スカイライン (Sort-based skyline, all objectives minimized)
+# ===============================================================
+def _skyline_2d(points):
+    # points: 辞書順に並んだ重複のない点
+    y = points[:, 1]
+    prev_min = np.concatenate(([np.inf], np.minimum.accumulate(y)[:-1]))
+    return y < prev_min
+
+
+def _skyline_3d(points):
+    # points: 辞書順に並んだ重複のない点
+    keep = np.zeros(len(points), dtype=bool)
+    # 階段: y の昇順に並び、z は狭義に減少する（それまでの点の (y, z) の非劣集合）
+    stair_y = []
+    stair_z = []
+    for i, (y, z) in enumerate(zip(points[:, 1].tolist(), points[:, 2].tolist())):
+        pos = bisect.bisect_right(stair_y, y)
+        if pos > 0 and stair_z[pos - 1] <= z:
+            continue
+        keep[i] = True
+        # 新しい点に支配される階段の点を除く
+        end = pos
+        while end < len(stair_y) and stair_z[end] >= z:
+            end += 1
+        stair_y[pos:end] = [y]
+        stair_z[pos:end] = [z]
+    return keep
+
+
+def _dominated_by(window, block, chunk=SFS_WINDOW_CHUNK):
+    # block の各点が window のどれかの点に支配される（すべて以下で、どれかが小さい）か。
+    # 窓は良い点から順に並んでいるので、少しずつ比べて支配された点を比較から外していく
+    dominated = np.zeros(len(block), dtype=bool)
+    alive = np.arange(len(block))
+    for start in range(0, len(window), chunk):
+        if len(alive) == 0:
+            break
+        part = window[None, start:start + chunk, :]
+        points = block[alive][:, None, :]
+        hit = (np.all(part <= points, axis=2) & np.any(part < points, axis=2)).any(axis=1)
+        dominated[alive[hit]] = True
+        alive = alive[~hit]
+    return dominated
+
+
+def _skyline_sfs(points):
+    # 正規化した目的の和で並べると、後の点が前の点を支配することはない。
+    # SFS_BLOCK 点ずつ、それまでのスカイライン（窓）との比較をまとめて行う
+    span = points.max(axis=0) - points.min(axis=0)
+    span[span == 0] = 1
+    order = np.argsort(((points - points.min(axis=0)) / span).sum(axis=1), kind='stable')
+    keep = np.zeros(len(points), dtype=bool)
+    window = np.empty((0, points.shape[1]))
+    for start in range(0, len(order), SFS_BLOCK):
+        index = order[start:start + SFS_BLOCK]
+        block = points[index]
+        index = index[~_dominated_by(window, block)]
+        # ブロック内の生き残り同士。支配は推移的なので、生き残りのどれかに支配される点を除けばよい
+        index = index[~_dominated_by(points[index], points[index])]
+        keep[index] = True
+        window = np.vstack([window, points[index]])
+    return keep
+
+
+def _unique_rows(values):
+    # np.unique(axis=0) と同じ（辞書順の重複のない行と、元の行からの対応）で、より速い
+    order = np.lexsort(values.T[::-1])
+    ordered = values[order]
+    is_new = np.ones(len(values), dtype=bool)
+    is_new[1:] = np.any(ordered[1:] != ordered[:-1], axis=1)
+    inverse = np.empty(len(values), dtype=np.int64)
+    inverse[order] = np.cumsum(is_new) - 1
+    return ordered[is_new], inverse
+
+
+def skyline(values):
+    # values: (点の数, 目的の数) の配列。どの目的でも他の点に劣らない点に True
+    # 全目的が同じ値の点は互いに支配しないので、重複をまとめてから求めて戻す
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return np.zeros(0, dtype=bool)
+    if values.ndim != 2 or np.isnan(values).any():
+        raise ValueError("目的の値は欠損の無い (点の数, 目的の数) の配列にしてください")
+    unique, inverse = _unique_rows(values)
+    n_objectives = unique.shape[1]
+    if n_objectives == 1:
+        keep = unique[:, 0] == unique[0, 0]
+    elif n_objectives == 2:
+        keep = _skyline_2d(unique)
+    elif n_objectives == 3:
+        keep = _skyline_3d(unique)
+    else:
+        keep = _skyline_sfs(unique)
+    return keep[inverse]
+
+
+# ===============================================================
+# 結果と CACTI の結合 (Join results with energy and cost)
+# ===============================================================
+def attach_costs(summary, l1_energy, accesses_per_inst=L1_ACCESSES_PER_INST):
+    energy = l1_energy[['Cache Size (KB)', 'Associativity', 'Read Energy (nJ)']].rename(
+        columns={'Cache Size (KB)': 'L1 Cache Size (KB)', 'Associativity': 'L1 Associativity'})
+    df = summary.merge(energy.drop_duplicates(['L1 Cache Size (KB)', 'L1 Associativity']),
+                       on=['L1 Cache Size (KB)', 'L1 Associativity'], how='left')
+    if 'Config Key' not in df.columns:
+        df = add_config_key(df)
+    # 命令数・実行時間が無い結果はエネルギー・EDP を NaN にする
+    insts = df['sim_insts'] if 'sim_insts' in df.columns else np.nan
+    seconds = df['sim_seconds (s)'] if 'sim_seconds (s)' in df.columns else np.nan
+    df[ENERGY_COLUMN] = df['Read Energy (nJ)'] * insts * accesses_per_inst * 1e-6
+    df[EDP_COLUMN] = df[ENERGY_COLUMN] * seconds
+    return df
+
+
+def available_frontiers(df, frontiers=FRONTIERS):
+    # 目的の列に値が1つも無いスカイラインは求めない
+    return [(flag, objectives) for flag, objectives in frontiers if df[objectives].notna().any().all()]
+
+
+def overall_scores(df, exclude=EXCLUDE_BENCHMARKS):
+    # 構成ごとに、ベンチマークごとの最小値で正規化した値の平均（全ベンチマークが揃う構成のみ）
+    names = df['Benchmark'].str.lower()
+    df = df[~names.isin([b.lower() for b in exclude or ()])]
+    n_benchs = df['Benchmark'].nunique()
+    configs = df.drop_duplicates('Config Key').set_index('Config Key')[FIELD_COLUMNS + ['BCE']]
+    scores = pd.DataFrame(index=configs.index)
+    n_results = None
+    for column, score_column in OVERALL_COLUMNS.items():
+        normalized = df[column] / df.groupby('Benchmark')[column].transform('min')
+        table = normalized.groupby([df['Config Key'], df['Benchmark']]).mean().unstack()
+        scores[score_column] = table.mean(axis=1)
+        if n_results is None:
+            n_results = table.count(axis=1).reindex(scores.index)
+    scores = scores[n_results == n_benchs]
+    return configs.loc[scores.index].join(scores).reset_index()
+
+
+def pareto_frontiers(df, scope, frontiers=FRONTIERS, rename=None):
+    # frontiers の各スカイラインのフラグ列を付け、どれかに入る行だけを返す
+    df = df.reset_index(drop=True)
+    on_any = np.zeros(len(df), dtype=bool)
+    for flag, objectives in frontiers:
+        columns = [rename.get(c, c) for c in objectives] if rename else objectives
+        complete = df[columns].notna().all(axis=1).to_numpy()
+        flags = np.zeros(len(df), dtype=bool)
+        flags[complete] = skyline(df.loc[complete, columns].to_numpy(dtype=float))
+        df[flag] = flags
+        on_any |= flags
+    df.insert(0, 'Scope', scope)
+    return df[on_any]
+
+
+def analyze(summary, l1_energy, exclude=EXCLUDE_BENCHMARKS):
+    missing = [c for c in REQUIRED_COLUMNS if c not in summary.columns]
+    if missing:
+        raise ValueError(f"集計CSVに必要な列がありません: {', '.join(missing)}")
+    df = attach_costs(summary, l1_energy)
+    df = df[df['sim_ticks'].notna()]
+    frontiers = available_frontiers(df)
+    frames = []
+    for bench, group in df.groupby('Benchmark', sort=True):
+        frames.append(pareto_frontiers(group.drop(columns='Benchmark'), bench, frontiers))
+    overall = overall_scores(df, exclude)
+    if len(overall):
+        frames.append(pareto_frontiers(overall, "(全体)", frontiers, rename=OVERALL_COLUMNS))
+    if not frames:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+    result = pd.concat(frames, ignore_index=True)
+    columns = OUTPUT_COLUMNS + list(OVERALL_COLUMNS.values()) + [flag for flag, _ in frontiers]
+    return result[[c for c in columns if c in result.columns]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="性能・BCEコスト・エネルギーのパレート最適な構成を求める")
+    parser.add_argument("summary_csv", nargs="?", default=SUMMARY_CSV)
+    parser.add_argument("--l1-csv", default=L1_csv, help="CACTI の L1 の結果 (Read Energy (nJ) 列)")
+    parser.add_argument("--exclude", default=",".join(EXCLUDE_BENCHMARKS),
+                        help="全体のスカイラインから除くベンチマーク (カンマ区切り)")
+    parser.add_argument("--output", default=PARETO_OUTPUT_CSV)
+    args = parser.parse_args()
+
+    with sweep_trace.stage("pareto"):
+        summary_df = pd.read_csv(args.summary_csv)
+        try:
+            frontier_df = analyze(summary_df, pd.read_csv(args.l1_csv),
+                                  exclude=args.exclude.split(",") if args.exclude else None)
+        except ValueError as e:
+            print(f"❌ {e}")
+            raise SystemExit(1)
+        frontier_df.to_csv(args.output, index=False)
+
+        flag_columns = [flag for flag, _ in FRONTIERS if flag in frontier_df.columns]
+        if 'sim_insts' not in summary_df.columns:
+            print("⚠️ 集計CSVに sim_insts が無いため、エネルギー・EDP を含むスカイラインは求めません。")
+        print(f"📈 {len(summary_df)} 件の結果からパレート最適な構成を求めました:")
+        print(frontier_df.groupby('Scope', sort=False)[flag_columns].sum().to_string())
+        overall_df = frontier_df[frontier_df['Scope'] == "(全体)"]
+        if len(overall_df):
+            print(f"\n🏅 全体で {flag_columns[0].removeprefix('Pareto ')} がパレート最適な構成:")
+            shown = overall_df[overall_df[flag_columns[0]]]
+            print(shown[FIELD_COLUMNS + ['BCE'] + [c for c in OVERALL_COLUMNS.values() if shown[c].notna().any()]]
+                  .sort_values('BCE').to_string(index=False))
+        print(f"\n✅ パレート最適な構成を出力しました → {args.output}")
@@ -0,0 +1,210 @@
+import os
+import math
+import heapq
+import argparse
+import numpy as np
+import pandas as pd
+import result_db
+import sweep_trace
+from doe import coded_factors, model_matrix, varying_factors, FACTORS
+from ranking import prefer_roi
+
+# ===============================================================
+# 予算内で実行する (構成, ベンチマーク) を選ぶ計画 (Budgeted campaign planner)
+#
+# 「48コアで3日」のようなコア時間の予算と、各実行の予測コスト（cost_model.py の
+# 予測実行時間 = 1実行が占有するホストのコア秒）と価値から、実行する組と順番を決める。
+# 価値は2つの和:
+#   coverage     : 同じベンチマークの完了済み・選択済みの構成から、設計空間
+#                  （doe.py と同じ log2 で [-1, 1] に写した因子）でどれだけ離れているか
+#   near_optimal : 完了済みの結果に当てはめた log(sim_ticks) の主効果モデルで、
+#                  ベンチマークの最良値の (1 + NEAR_OPTIMAL_MARGIN) 倍以内に入る確率
+# coverage は選ぶたびに減る（劣モジュラ）ので、価値 / コストの貪欲法を
+# 遅延評価 (CELF) で解く。選んだ順が実行順になる（予算が途中で尽きても価値の高いものが先に終わる）。
+#
+# run_all.py --plan plan.csv はこの順に実行し、実行が終わるたびに実測の所要時間で
+# コストモデルを当てはめ直して、残りの予算で未開始の実行を選び直す。
+# ===============================================================
+PLAN_CSV = "./plan.csv"
+SUMMARY_CSV = "./result/simulation_summary.csv"
+
+VALUE_WEIGHTS = {'coverage': 0.5, 'near_optimal': 0.5}
+NEAR_OPTIMAL_MARGIN = 0.05
+NEAR_OPTIMAL_PRIOR = 0.5  # 当てはめに使える結果が足りないベンチマークの確率
+MAX_DISTANCE = 2 * math.sqrt(len(FACTORS))  # 符号化した空間の対角線の長さ
+
+CONFIG_COLUMNS = {
+    'core': 'Core Number', 'clock': 'CPU clock (GHz)', 'l1_size': 'L1 Cache Size (KB)',
+    'l1_assoc': 'L1 Associativity', 'l2_size': 'L2 Cache Size (KB)', 'l2_assoc': 'L2 Associativity',
+    'l2_latency': 'L2 latency (cycles)',
+}
+# plan.csv の列（予算に収まる実行が無くてもヘッダは書く）
+PLAN_COLUMNS = (['Order', 'Run Name', 'Benchmark'] + list(CONFIG_COLUMNS.values()) +
+                ['Predicted Seconds', 'Prediction Source', 'Value', 'Coverage', 'P(near-optimal)',
+                 'Cumulative Core Hours'])
+
+
+def jobs_frame(jobs):
+    return pd.DataFrame([{column: job[key] for key, column in CONFIG_COLUMNS.items()} for job in jobs])
+
+
+def load_results():
+    # 完了済みの結果 (結果DB、無ければ集計CSV)。ROI の結果があるベンチマークは ROI の行だけ
+    if os.path.exists(result_db.DB_PATH):
+        conn = result_db.connect(result_db.DB_PATH)
+        try:
+            return prefer_roi(result_db.query(conn, order_by=None))
+        finally:
+            conn.close()
+    if os.path.exists(SUMMARY_CSV):
+        return prefer_roi(pd.read_csv(SUMMARY_CSV))
+    return pd.DataFrame(columns=[c for _, c in FACTORS] + ['Benchmark', 'sim_ticks'])
+
+
+def _normal_cdf(z):
+    return 0.5 * (1 + np.vectorize(math.erf)(z / math.sqrt(2)))
+
+
+def near_optimal_probability(candidates, results, reference):
+    # candidates: (構成の DataFrame, ベンチマーク名の配列)
+    frame, benches = candidates
+    probability = np.full(len(frame), NEAR_OPTIMAL_PRIOR)
+    for bench in np.unique(benches):
+        done = results[(results['Benchmark'] == bench) & (results['sim_ticks'] > 0)]
+        if not len(done):
+            continue
+        # 完了済みの実行で変えていない因子はモデルに入れない（その方向は外挿になる）
+        varying = varying_factors(done)
+        X = model_matrix(coded_factors(done, reference)[:, varying])
+        if len(done) < X.shape[1] + 2:
+            continue
+        y = np.log(done['sim_ticks'].to_numpy(dtype=float))
+        coef, *_ = np.linalg.lstsq(X, y, rcond=None)
+        sigma = max(float(np.std(y - X @ coef, ddof=X.shape[1])), 1e-6)
+        target = math.log(done['sim_ticks'].min() * (1 + NEAR_OPTIMAL_MARGIN))
+        rows = np.where(benches == bench)[0]
+        candidate = frame.iloc[rows]
+        predicted = model_matrix(coded_factors(candidate, reference)[:, varying]) @ coef
+        # 定数の因子が完了済みの水準と異なる候補は、事前確率のままにする
+        observed = np.ones(len(rows), dtype=bool)
+        for j, (_, column) in enumerate(FACTORS):
+            if j not in varying:
+                observed &= (candidate[column] == done[column].iloc[0]).to_numpy()
+        probability[rows[observed]] = _normal_cdf((target - predicted[observed]) / sigma)
+    return probability
+
+
+def plan(jobs, cost_model, budget_core_seconds, results=None, weights=VALUE_WEIGHTS):
+    # 戻り値: 選んだ順の (job, 予測秒, 価値の内訳) のリスト
+    if not jobs:
+        return []
+    results = load_results() if results is None else results
+    frame = jobs_frame(jobs)
+    benches = np.array([job['bench'] for job in jobs])
+    reference = pd.concat([frame, results.reindex(columns=frame.columns)], ignore_index=True).dropna()
+    coded = coded_factors(frame, reference)
+
+    predictions = [cost_model.predict(job)[0] for job in jobs]
+    known = [p for p in predictions if p]
+    fallback = float(np.median(known)) if known else 1.0
+    costs = np.array([p if p else fallback for p in predictions], dtype=float)
+
+    near_optimal = near_optimal_probability((frame, benches), results, reference)
+
+    # ベンチマークごとの「最も近い完了済み・選択済みの構成までの距離」
+    nearest = np.full(len(jobs), MAX_DISTANCE)
+    for bench in np.unique(benches):
+        done = results[results['Benchmark'] == bench]
+        if len(done):
+            done_coded = coded_factors(done, reference)
+            rows = np.where(benches == bench)[0]
+            distances = np.linalg.norm(coded[rows, None, :] - done_coded[None, :, :], axis=2)
+            nearest[rows] = np.minimum(nearest[rows], distances.min(axis=1))
+
+    def value(i):
+        coverage = nearest[i] / MAX_DISTANCE
+        return float(weights['coverage'] * coverage + weights['near_optimal'] * near_optimal[i]), float(coverage)
+
+    # CELF: 上限値の大きい順に取り出し、値を計算し直しても先頭なら選ぶ
+    heap = [(-value(i)[0] / costs[i], i) for i in range(len(jobs))]
+    heapq.heapify(heap)
+    selected = []
+    spent = 0.0
+    while heap:
+        _, i = heapq.heappop(heap)
+        if spent + costs[i] > budget_core_seconds:
+            continue
+        total, coverage = value(i)
+        ratio = total / costs[i]
+        if heap and ratio < -heap[0][0]:
+            heapq.heappush(heap, (-ratio, i))
+            continue
+        selected.append((jobs[i], float(costs[i]), {'Value': total, 'Coverage': coverage,
+                                                     'P(near-optimal)': float(near_optimal[i])}))
+        spent += costs[i]
+        rows = np.where(benches == benches[i])[0]
+        nearest[rows] = np.minimum(nearest[rows], np.linalg.norm(coded[rows] - coded[i], axis=1))
+    return selected
+
+
+def plan_frame(selected, cost_model):
+    rows = []
+    cumulative = 0.0
+    for order, (job, cost, values) in enumerate(selected, start=1):
+        cumulative += cost
+        row = {'Order': order, 'Run Name': job['name'], 'Benchmark': job['bench']}
+        row.update({column: job[key] for key, column in CONFIG_COLUMNS.items()})
+        row.update({
+            'Predicted Seconds': cost,
+            'Prediction Source': cost_model.predict(job)[1] or "median",
+            **values,
+            'Cumulative Core Hours': cumulative / 3600,
+        })
+        rows.append(row)
+    return pd.DataFrame(rows, columns=PLAN_COLUMNS)
+
+
+def completed_run_names(history_csv):
+    # 正常に終わった実行の名前（計画の候補から除く）
+    if not os.path.exists(history_csv):
+        return set()
+    history = pd.read_csv(history_csv)
+    ok = history[history['returncode'] == 0]
+    return {os.path.basename(os.path.normpath(p)) for p in ok['out_dir'].dropna()}
+
+
+if __name__ == "__main__":
+    from run_all import (build_jobs, BASE_EXEC_TIMES, BASE_CPU_FREQ_GHZ, INPUT_PARAMETERS_CSV,
+                         RUN_HISTORY_CSV, STATS_PERIOD_SECONDS)
+    from cost_model import CostModel
+
+    parser = argparse.ArgumentParser(description="コア時間の予算内で実行する (構成, ベンチマーク) と順番を決める")
+    budget = parser.add_mutually_exclusive_group(required=True)
+    budget.add_argument("--budget-core-hours", type=float)
+    budget.add_argument("--days", type=float, help="--cores と合わせて予算を指定する（日数 x コア数）")
+    parser.add_argument("--cores", type=int, default=os.cpu_count())
+    parser.add_argument("--params", default=INPUT_PARAMETERS_CSV)
+    parser.add_argument("--output", default=PLAN_CSV)
+    parser.add_argument("--include-completed", action="store_true", help="完了済みの実行も候補に含める")
+    args = parser.parse_args()
+
+    budget_core_hours = args.budget_core_hours if args.budget_core_hours else args.days * 24 * args.cores
+    with sweep_trace.stage("planner"):
+        model = CostModel(BASE_EXEC_TIMES, BASE_CPU_FREQ_GHZ, RUN_HISTORY_CSV)
+        print(model.report())
+        candidate_jobs = build_jobs(pd.read_csv(args.params), STATS_PERIOD_SECONDS, model)
+        if not args.include_completed:
+            done_names = completed_run_names(RUN_HISTORY_CSV)
+            candidate_jobs = [job for job in candidate_jobs if job['name'] not in done_names]
+        chosen = plan(candidate_jobs, model, budget_core_hours * 3600)
+        plan_df = plan_frame(chosen, model)
+        plan_df.to_csv(args.output, index=False)
+
+        used = plan_df['Cumulative Core Hours'].iloc[-1] if len(plan_df) else 0.0
+        print(f"\n📋 候補 {len(candidate_jobs)} 件から {len(plan_df)} 件を選びました "
+              f"(予測 {used:.1f} / 予算 {budget_core_hours:.1f} コア時間)。")
+        if len(plan_df):
+            print(plan_df.groupby('Benchmark').agg(
+                runs=('Order', 'size'), core_hours=('Predicted Seconds', lambda s: s.sum() / 3600)))
+        print(f"✅ 計画を出力しました → {args.output}")
+        print(f"   python run_all.py --plan {args.output} --budget-core-hours {budget_core_hours:g}")
@@ -0,0 +1,175 @@
+import argparse
+import numpy as np
+import pandas as pd
+from result_db import ROI_NONE
+
+# ===============================================================
+# 正規化スコアによる構成ランキング (Vectorized ranking engine)
+#
+# sim_ticks をベンチマークごとの最小値で正規化し、構成ごとに
+# ベンチマーク間の平均（算術 / 幾何）を取ってランキングする。
+# ブートストラップ（ベンチマークの再標本化）で信頼区間を求め、
+# 最良構成と統計的に区別できない構成に印を付ける。
+# この区間は「別のベンチマークの組を選んでいたらスコアがどれだけ動くか」を表し、
+# 1回のシミュレーション内のばらつきは含まない。ベンチマークが n 個だと異なる
+# 再標本は C(2n-1, n) 通りしか無い（3個なら10通りで、区間はほぼ最小値〜最大値になる）ので、
+# MIN_BOOT_BENCHMARKS 個未満のときは信頼区間と「最良と同等」を出さない (NaN)。
+# ===============================================================
+CONFIG_COLS = [
+    'Core Number', 'L1 Cache Size (KB)', 'L1 Associativity',
+    'L2 Cache Size (KB)', 'L2 Associativity', 'L2 latency (cycles)', 'BCE'
+]
+BCE_LIMIT = 128
+MIN_BOOT_BENCHMARKS = 6
+
+
+def select_benchmarks(df, benchmarks=None, exclude=None):
+    # ベンチマーク名は大小文字を無視して比較する
+    names = df['Benchmark'].str.lower()
+    mask = np.ones(len(df), dtype=bool)
+    if benchmarks:
+        mask &= names.isin([b.lower() for b in benchmarks]).to_numpy()
+    if exclude:
+        mask &= ~names.isin([b.lower() for b in exclude]).to_numpy()
+    return df[mask]
+
+
+def prefer_roi(df):
+    # ROI だけの結果とプログラム全体の結果は sim_ticks を比べられないので、
+    # ROI の結果があるベンチマークは ROI の行だけを使う
+    if 'ROI' not in df.columns:
+        return df
+    roi = (df['ROI'].astype(object).fillna(ROI_NONE) != ROI_NONE).to_numpy()
+    has_roi = pd.Series(roi, index=df.index).groupby(df['Benchmark']).transform('any').to_numpy()
+    return df[roi | ~has_roi]
+
+
+def filter_bce(df, bce_limit=BCE_LIMIT):
+    if bce_limit is None:
+        return df
+    return df[df['BCE'] < bce_limit]
+
+
+def build_score_matrix(df, config_cols=CONFIG_COLS):
+    # 構成 x ベンチマークの正規化 sim_ticks 行列を作る（欠損は NaN）
+    # 構成キー列があれば7列の groupby の代わりにそれで構成を区別する（番号の振り方は同じ出現順）
+    if 'Config Key' in df.columns and (df['Config Key'] >= 0).all():
+        config_ids = pd.factorize(df['Config Key'])[0]
+    else:
+        config_ids = df.groupby(config_cols, sort=False).ngroup().to_numpy()
+    bench_ids, bench_names = pd.factorize(df['Benchmark'])
+    ticks = df['sim_ticks'].to_numpy(dtype=float)
+
+    n_configs = config_ids.max() + 1 if len(config_ids) else 0
+    n_benchs = len(bench_names)
+
+    # ベンチマークごとの最小値で正規化
+    bench_min = np.full(n_benchs, np.inf)
+    np.minimum.at(bench_min, bench_ids, ticks)
+    normalized = ticks / bench_min[bench_ids]
+
+    # 同じ構成・ベンチマークが複数行ある場合は平均を取る
+    flat = config_ids * n_benchs + bench_ids
+    sums = np.bincount(flat, weights=normalized, minlength=n_configs * n_benchs)
+    counts = np.bincount(flat, minlength=n_configs * n_benchs)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        matrix = (sums / counts).reshape(n_configs, n_benchs)
+
+    # 構成ごとの代表行（設定値）を取り出す
+    first_rows = np.zeros(n_configs, dtype=int)
+    first_rows[config_ids[::-1]] = np.arange(len(config_ids))[::-1]
+    configs = df[config_cols].iloc[first_rows].reset_index(drop=True)
+
+    return configs, matrix, list(bench_names)
+
+
+def mean_scores(matrix, mean_type='arith'):
+    if mean_type == 'arith':
+        return np.nanmean(matrix, axis=1)
+    if mean_type == 'geo':
+        return np.exp(np.nanmean(np.log(matrix), axis=1))
+    raise ValueError(f"未対応の平均の種類です: {mean_type}")
+
+
+def bootstrap_scores(matrix, mean_type='arith', n_boot=1000, seed=0):
+    # ベンチマーク列を復元抽出した重み (n_boot x ベンチマーク数) で全構成を一度に計算する
+    n_benchs = matrix.shape[1]
+    rng = np.random.default_rng(seed)
+    weights = rng.multinomial(n_benchs, np.full(n_benchs, 1.0 / n_benchs), size=n_boot) / n_benchs
+    if mean_type == 'arith':
+        return matrix @ weights.T
+    if mean_type == 'geo':
+        return np.exp(np.log(matrix) @ weights.T)
+    raise ValueError(f"未対応の平均の種類です: {mean_type}")
+
+
+def rank_configs(df, benchmarks=None, exclude=None, mean_type='arith', bce_limit=BCE_LIMIT,
+                 require_all=True, n_boot=1000, ci=0.95, boot_top=1000, seed=0,
+                 config_cols=CONFIG_COLS):
+    df = filter_bce(prefer_roi(select_benchmarks(df, benchmarks, exclude)), bce_limit)
+    configs, matrix, bench_names = build_score_matrix(df, config_cols)
+
+    # 全ベンチマークの結果が揃っている構成だけを対象にする
+    n_results = (~np.isnan(matrix)).sum(axis=1)
+    keep = n_results == len(bench_names) if require_all else n_results > 0
+    configs = configs[keep].reset_index(drop=True)
+    matrix = matrix[keep]
+
+    scores = mean_scores(matrix, mean_type)
+    order = np.argsort(scores, kind='stable')
+    configs = configs.iloc[order].reset_index(drop=True)
+    matrix = matrix[order]
+    scores = scores[order]
+
+    score_col = '平均(正規化)' if mean_type == 'arith' else '幾何平均(正規化)'
+    result = configs.copy()
+    result['試行数'] = n_results[keep][order]
+    result[score_col] = scores
+
+    # 上位 boot_top 構成についてだけブートストラップする（欠損のない行列が必要）
+    n_top = min(boot_top, len(result)) if n_boot and require_all and len(bench_names) >= MIN_BOOT_BENCHMARKS else 0
+    lo_col = f'{int(ci * 100)}%CI下限'
+    hi_col = f'{int(ci * 100)}%CI上限'
+    result[lo_col] = np.nan
+    result[hi_col] = np.nan
+    result['最良と同等'] = np.nan
+    if n_top > 0:
+        boot = bootstrap_scores(matrix[:n_top], mean_type, n_boot, seed)
+        alpha = (1.0 - ci) / 2
+        result.loc[:n_top - 1, lo_col] = np.quantile(boot, alpha, axis=1)
+        result.loc[:n_top - 1, hi_col] = np.quantile(boot, 1 - alpha, axis=1)
+        # 最良構成との差を同じ再標本で比較し、差の信頼区間が0を含めば同順位とみなす
+        diff = boot - boot[0]
+        result['最良と同等'] = result['最良と同等'].astype(object)
+        result.loc[:n_top - 1, '最良と同等'] = np.quantile(diff, alpha, axis=1) <= 0
+    elif n_boot and require_all:
+        print(f"⚠️ ベンチマークが {len(bench_names)} 個しかないため、信頼区間と「最良と同等」は出力しません "
+              f"({MIN_BOOT_BENCHMARKS} 個以上で計算)。")
+
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="正規化 sim_ticks による構成ランキング")
+    parser.add_argument("input_csv", nargs="?", default="./result/simulation_summary.csv")
+    parser.add_argument("--benchmarks", help="対象ベンチマーク (カンマ区切り)")
+    parser.add_argument("--exclude", default="fft,lu", help="除外するベンチマーク (カンマ区切り)")
+    parser.add_argument("--mean", choices=["arith", "geo"], default="arith")
+    parser.add_argument("--bce-limit", type=float, default=BCE_LIMIT)
+    parser.add_argument("--n-boot", type=int, default=1000)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    ranked = rank_configs(
+        pd.read_csv(args.input_csv),
+        benchmarks=args.benchmarks.split(",") if args.benchmarks else None,
+        exclude=args.exclude.split(",") if args.exclude else None,
+        mean_type=args.mean,
+        bce_limit=args.bce_limit,
+        n_boot=args.n_boot,
+    )
+    if args.output:
+        ranked.to_csv(args.output, index=False)
+        print(f"✅ ランキングを出力しました → {args.output}")
+    print(ranked.head(args.top))
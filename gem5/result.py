@@ -1,9 +1,18 @@
 import pandas as pd
 import os
+import sweep_trace
+from result_db import ROI_NONE
+from ranking import rank_configs, prefer_roi
 
 INPUT_CSV_PATH = "./result/simulation_summary.csv"
 BEST_CONFIG_OUTPUT = "./result/best_general_config_normalized3_filtered_no_count.csv"
 
+TARGET_BENCHMARKS = None              # None の場合は全ベンチマーク
+EXCLUDE_BENCHMARKS = ("fft", "lu")    # ランキングから除外するベンチマーク
+MEAN_TYPE = "arith"                   # "arith"（算術平均）または "geo"（幾何平均）
+BCE_LIMIT = 128
+N_BOOTSTRAP = 1000                    # ブートストラップの反復回数（0で信頼区間を計算しない）
+
 def find_best_general_config_normalized():
     if not os.path.exists(INPUT_CSV_PATH):
         print(f"❌ 入力ファイルが見つかりません: {INPUT_CSV_PATH}")
@@ -20,31 +29,33 @@ def find_best_general_config_normalized():
         if col not in df.columns:
             print(f"❌ 欠損列: {col}")
             return
-
-    df = df[(df['BCE'] < 128) & (~df['Benchmark'].str.lower().str.contains("fft|lu"))]
-
-    df['normalized'] = df.groupby('Benchmark')['sim_ticks'].transform(lambda x: x / x.min())
-
-    result = (
-        df.groupby(config_cols)['normalized']
-        .agg(['count', 'mean'])
-        .reset_index()
-        .rename(columns={
-            'count': '試行数',
-            'mean': '平均(正規化)'
-        })
+    # ROI の結果があるベンチマークは ROI の行だけで比べる (ranking.prefer_roi)
+    n_whole_program = len(df) - len(prefer_roi(df))
+    if n_whole_program:
+        print(f"⚠️ ROI の結果があるベンチマークのプログラム全体の結果 {n_whole_program} 行を除外します。")
+    # 構成キー列があれば出力にも残す（他の表との結合用）
+    if 'Config Key' in df.columns:
+        config_cols = config_cols + ['Config Key']
+
+    result = rank_configs(
+        df,
+        benchmarks=TARGET_BENCHMARKS,
+        exclude=EXCLUDE_BENCHMARKS,
+        mean_type=MEAN_TYPE,
+        bce_limit=BCE_LIMIT,
+        n_boot=N_BOOTSTRAP,
+        config_cols=config_cols,
     )
 
-    result = result[result['試行数'] == 3]
-
     result = result.drop(columns=['試行数'])
 
-    result = result.sort_values(by='平均(正規化)').reset_index(drop=True)
-
     result.to_csv(BEST_CONFIG_OUTPUT, index=False)
-    print(f"✅ 試行数3で平均(正規化)に基づく最良構成を出力しました → {BEST_CONFIG_OUTPUT}")
-    print("\n🏅 上位5構成（平均(正規化)が低い）:")
+    print(f"✅ 全ベンチマークの結果が揃った構成について正規化スコアに基づく最良構成を出力しました → {BEST_CONFIG_OUTPUT}")
+    if 'ROI' in df.columns and (df['ROI'].astype(object).fillna(ROI_NONE) != ROI_NONE).any():
+        print("   (ROI の結果があるベンチマークは ROI だけの sim_ticks で比較しています)")
+    print("\n🏅 上位5構成（正規化スコアが低い）:")
     print(result.head(5))
 
 if __name__ == "__main__":
-    find_best_general_config_normalized()
+    with sweep_trace.stage("result"):
+        find_best_general_config_normalized()
@@ -0,0 +1,224 @@
+import os
+import sqlite3
+import argparse
+import pandas as pd
+from config_key import add_config_key
+
+# ===============================================================
+# シミュレーション結果の SQLite データベース (Indexed results database)
+#
+# simulation_summary.csv と同じ列を SQLite に格納し、構成列とベンチマークに
+# インデックスを張る。sim_summary.py の集計や run_all.py の各実行完了時に
+# 1行ずつ追加でき、query() で条件に合う行だけを DataFrame として取り出せる。
+# ===============================================================
+DB_PATH = "./result/results.db"
+
+# (DataFrameの列名, SQLiteの列名, 型)
+COLUMNS = [
+    ('Core Number', 'core_num', 'INTEGER'),
+    ('CPU clock (GHz)', 'cpu_clock_ghz', 'REAL'),
+    ('L1 Cache Size (KB)', 'l1_size_kb', 'INTEGER'),
+    ('L1 Associativity', 'l1_assoc', 'INTEGER'),
+    ('L2 Cache Size (KB)', 'l2_size_kb', 'INTEGER'),
+    ('L2 Associativity', 'l2_assoc', 'INTEGER'),
+    ('L2 latency (cycles)', 'l2_latency', 'INTEGER'),
+    ('Benchmark', 'benchmark', 'TEXT'),
+    ('sim_ticks', 'sim_ticks', 'INTEGER'),
+    ('sim_seconds (s)', 'sim_seconds', 'REAL'),
+    ('sim_insts', 'sim_insts', 'INTEGER'),
+    ('L2_overall_accesses', 'l2_overall_accesses', 'INTEGER'),
+    ('L2_overall_misses', 'l2_overall_misses', 'INTEGER'),
+    ('L2_demand_miss_rate', 'l2_demand_miss_rate', 'REAL'),
+    ('BCE', 'bce', 'INTEGER'),
+    ('Config Key', 'config_key', 'INTEGER'),  # config_key.py の構成キー
+    ('ROI', 'roi', 'TEXT'),  # ROI だけの実行は ROI モード (se.py --roi)、プログラム全体は ROI_NONE
+    ('Extrapolated', 'extrapolated', 'INTEGER'),  # 早期停止して外挿した結果は 1、実測は 0
+]
+DF_TO_SQL = {df_name: sql_name for df_name, sql_name, _ in COLUMNS}
+SQL_TO_DF = {sql_name: df_name for df_name, sql_name, _ in COLUMNS}
+
+# 1つの構成・ベンチマーク・ROI モードにつき1行（再実行時は上書き）
+KEY_COLUMNS = ['benchmark', 'core_num', 'l1_size_kb', 'l1_assoc', 'l2_size_kb', 'l2_assoc', 'l2_latency', 'roi']
+ROI_NONE = "none"  # プログラム全体をシミュレーションした結果の ROI 列の値（一意制約のため NULL にしない）
+
+# 単独の条件でもよく使う列にはインデックスを張る
+INDEXED_COLUMNS = ['core_num', 'l1_size_kb', 'l2_size_kb', 'l2_assoc', 'bce', 'config_key']
+
+
+def connect(db_path=DB_PATH):
+    if os.path.dirname(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    # 集計中の書き込みと別プロセスからの読み出しを同時に行えるようにする
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    _create_table(conn)
+    # 後から追加した列は既存のDBにも足す
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+    for _, sql_name, sql_type in COLUMNS:
+        if sql_name not in existing:
+            conn.execute(f"ALTER TABLE results ADD COLUMN {sql_name} {sql_type}")
+    conn.execute(f"UPDATE results SET roi = '{ROI_NONE}' WHERE roi IS NULL")
+    conn.execute("UPDATE results SET extrapolated = 0 WHERE extrapolated IS NULL")
+    # 一意制約は変えられないので、キーの列が違う古いDBは作り直す
+    if _unique_key(conn) != set(KEY_COLUMNS):
+        _rebuild_table(conn)
+    for col in INDEXED_COLUMNS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_results_{col} ON results ({col})")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_results_bench_ticks ON results (benchmark, sim_ticks)")
+    conn.commit()
+    return conn
+
+
+def _create_table(conn, name="results"):
+    column_defs = ", ".join(f"{sql_name} {sql_type}" for _, sql_name, sql_type in COLUMNS)
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {name} ({column_defs}, "
+        f"UNIQUE ({', '.join(KEY_COLUMNS)}) ON CONFLICT REPLACE)"
+    )
+
+
+def _unique_key(conn):
+    # results テーブルの一意制約の列（無ければ None）
+    for _, index_name, unique, *_ in conn.execute("PRAGMA index_list(results)"):
+        if unique:
+            return {row[2] for row in conn.execute(f"PRAGMA index_info('{index_name}')")}
+    return None
+
+
+def _rebuild_table(conn):
+    names = ", ".join(sql_name for _, sql_name, _ in COLUMNS)
+    conn.execute("DROP TABLE IF EXISTS results_rebuild")
+    _create_table(conn, "results_rebuild")
+    conn.execute(f"INSERT INTO results_rebuild ({names}) SELECT {names} FROM results ORDER BY rowid")
+    conn.execute("DROP TABLE results")
+    conn.execute("ALTER TABLE results_rebuild RENAME TO results")
+    conn.commit()
+
+
+def _to_sql_value(value):
+    # pandas / numpy の値を sqlite3 が扱える Python の値に変換する
+    if value is None:
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def insert_rows(conn, rows):
+    # rows: DataFrame の列名をキーとする dict のリスト
+    sql_names = [sql_name for _, sql_name, _ in COLUMNS]
+    placeholders = ", ".join("?" for _ in sql_names)
+    records = [
+        tuple(_to_sql_value(row.get(df_name)) for df_name, _, _ in COLUMNS)
+        for row in ({'ROI': ROI_NONE, **row, 'Extrapolated': int(bool(row.get('Extrapolated')))} for row in rows)
+    ]
+    conn.executemany(f"INSERT INTO results ({', '.join(sql_names)}) VALUES ({placeholders})", records)
+    conn.commit()
+    return len(records)
+
+
+def insert_frame(conn, df):
+    # DataFrame をまとめて登録する（行ごとの dict 変換を避ける）
+    sql_names = [sql_name for _, sql_name, _ in COLUMNS]
+    placeholders = ", ".join("?" for _ in sql_names)
+    if 'Config Key' not in df.columns:
+        # 構成キー列の無い古い集計CSV
+        df = add_config_key(df)
+    df = df.assign(ROI=df['ROI'].fillna(ROI_NONE) if 'ROI' in df.columns else ROI_NONE,
+                   Extrapolated=df['Extrapolated'].fillna(False).astype(bool).astype(int)
+                   if 'Extrapolated' in df.columns else 0)
+    frame = df.reindex(columns=[df_name for df_name, _, _ in COLUMNS]).astype(object)
+    frame = frame.where(frame.notna(), None)
+    conn.executemany(f"INSERT INTO results ({', '.join(sql_names)}) VALUES ({placeholders})",
+                     frame.itertuples(index=False, name=None))
+    conn.commit()
+    return len(frame)
+
+
+def load_csv(conn, csv_path, chunksize=100000):
+    total = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        total += insert_frame(conn, chunk)
+    return total
+
+
+def _sql_column(col):
+    # 列名は SQL に埋め込むので、DB の列に限る
+    sql_col = DF_TO_SQL.get(col, col)
+    if sql_col not in SQL_TO_DF:
+        raise ValueError(f"不明な列です: {col}")
+    return sql_col
+
+
+def query(conn, benchmark=None, filters=None, order_by='sim_ticks', limit=None, columns=None):
+    # filters: {列名: 値 または 値のリスト}。列名は DataFrame / SQLite のどちらの名前でもよい
+    conditions = []
+    params = []
+    if benchmark is not None:
+        conditions.append("benchmark = ?")
+        params.append(benchmark)
+    for col, value in (filters or {}).items():
+        sql_col = _sql_column(col)
+        if isinstance(value, (list, tuple, set)):
+            conditions.append(f"{sql_col} IN ({', '.join('?' for _ in value)})")
+            params.extend(value)
+        else:
+            conditions.append(f"{sql_col} = ?")
+            params.append(value)
+
+    select_cols = [_sql_column(c) for c in columns] if columns else [sql for _, sql, _ in COLUMNS]
+    sql = f"SELECT {', '.join(select_cols)} FROM results"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if order_by:
+        sql += f" ORDER BY {_sql_column(order_by)}"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+
+    df = pd.read_sql_query(sql, conn, params=params)
+    return df.rename(columns=SQL_TO_DF)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="シミュレーション結果DBへの読み込みと検索")
+    parser.add_argument("--db", default=DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    load_parser = sub.add_parser("load", help="集計CSVをDBに読み込む")
+    load_parser.add_argument("csv_path", nargs="?", default="./result/simulation_summary.csv")
+
+    query_parser = sub.add_parser("query", help="条件に合う結果を表示する")
+    query_parser.add_argument("--bench")
+    query_parser.add_argument("--core", type=int, nargs="+")
+    query_parser.add_argument("--l1-size", type=int, nargs="+")
+    query_parser.add_argument("--l1-assoc", type=int, nargs="+")
+    query_parser.add_argument("--l2-size", type=int, nargs="+")
+    query_parser.add_argument("--l2-assoc", type=int, nargs="+")
+    query_parser.add_argument("--latency", type=int, nargs="+")
+    query_parser.add_argument("--roi", nargs="+", help=f"ROI モード (プログラム全体は {ROI_NONE})")
+    query_parser.add_argument("--order", default="sim_ticks", choices=list(SQL_TO_DF))
+    query_parser.add_argument("--limit", type=int, default=20)
+    query_parser.add_argument("--output", help="結果をCSVに保存する")
+
+    args = parser.parse_args()
+    db = connect(args.db)
+
+    if args.command == "load":
+        n = load_csv(db, args.csv_path)
+        print(f"✅ {n} 件を {args.db} に読み込みました。")
+    else:
+        cli_filters = {
+            'core_num': args.core, 'l1_size_kb': args.l1_size, 'l1_assoc': args.l1_assoc,
+            'l2_size_kb': args.l2_size, 'l2_assoc': args.l2_assoc, 'l2_latency': args.latency,
+            'roi': args.roi,
+        }
+        result = query(db, benchmark=args.bench,
+                       filters={k: v for k, v in cli_filters.items() if v is not None},
+                       order_by=args.order, limit=args.limit)
+        if args.output:
+            result.to_csv(args.output, index=False)
+            print(f"✅ {len(result)} 件を {args.output} に保存しました。")
+        print(result.to_string(index=False))
@@ -0,0 +1,386 @@
+import io
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+import socketserver
+import collections
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+import result_db
+from ranking import rank_configs, BCE_LIMIT
+
+# ===============================================================
+# 結果の常駐検索サーバ (Local results query daemon)
+#
+# 結果DB (results.db) または simulation_summary.csv を一度だけ読み込み、
+# 型を付けた DataFrame としてメモリに保持して、絞り込み・集計・上位 k の
+# 問い合わせに localhost の HTTP（または Unix ソケット）で答える。
+# 同じ問い合わせの結果は LRU キャッシュから返す。
+#
+# 問い合わせのたびに（REFRESH_INTERVAL_SECONDS に1回まで）入力の更新を確かめ、
+#   DB : 前回より大きい rowid の行だけを読み、同じ構成・ベンチマークの行は置き換える
+#        （results テーブルは ON CONFLICT REPLACE なので、更新された行は新しい rowid になる。
+#        result_db.py がテーブルを作り直すと rowid が詰め直されるので、スキーマの版が変わるか
+#        rowid の最大値が前回より小さくなったら全体を読み直す）
+#   CSV: 前回読んだ位置までの内容（全体のハッシュ）が変わっていなければ、追記された行だけを読む
+#        （書き直されていれば全体を読み直す。サイズと更新時刻が同じなら読まない）
+# のどちらかで差分だけを取り込む。どちらも同じ構成・ベンチマーク・ROI の行は最後の1行だけを残す。
+#
+#   GET /status
+#   GET /query?bench=fmm&core_num=8,16&order=sim_ticks&limit=20&columns=...
+#   GET /group?by=benchmark,core_num&value=sim_ticks&agg=count,mean,min  (+ 絞り込み、agg は GROUP_AGGS のみ)
+#   GET /top?k=5&mean=arith&exclude=fft,lu&bce_limit=128                 (ranking.py の正規化スコア)
+# 絞り込みの列名は result_db.py の列名 (core_num, l2_size_kb など)。format=csv で CSV を返す。
+# ===============================================================
+HOST = "127.0.0.1"
+PORT = 8765
+SUMMARY_CSV = "./result/simulation_summary.csv"
+CACHE_SIZE = 256
+REFRESH_INTERVAL_SECONDS = 1.0
+HASH_CHUNK_BYTES = 1 << 20  # CSV の読んだ部分のハッシュを求めるときに一度に読むバイト数
+GROUP_AGGS = ('count', 'mean', 'min', 'max', 'median', 'std', 'sum')
+
+# 型の対応 (result_db.py の型 → pandas の型)
+DTYPES = {'INTEGER': 'Int64', 'REAL': 'float64', 'TEXT': 'category'}
+
+
+def to_typed(df):
+    df = df.rename(columns=result_db.SQL_TO_DF)
+    for df_name, _, sql_type in result_db.COLUMNS:
+        if df_name in df.columns:
+            df[df_name] = df[df_name].astype(DTYPES[sql_type]) if sql_type != 'INTEGER' \
+                else pd.to_numeric(df[df_name]).round().astype('Int64')
+    return df
+
+
+def _latest_rows(df):
+    # 同じ構成・ベンチマーク・ROI の行は最後（最新）の1行だけを残す（古い集計CSVに無いキー列は使わない）
+    keys = [result_db.SQL_TO_DF[c] for c in result_db.KEY_COLUMNS if result_db.SQL_TO_DF[c] in df.columns]
+    return df.drop_duplicates(subset=keys, keep='last').reset_index(drop=True)
+
+
+class ResultsStore:
+    def __init__(self, db_path=None, csv_path=None):
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self.df = pd.DataFrame()
+        self.version = 0
+        self.last_checked = 0.0
+        self.lock = threading.Lock()
+        self.last_rowid = 0
+        self.schema_version = None
+        self.csv_state = None  # (inode, 読んだバイト数, 読んだ部分のハッシュ, ヘッダ, サイズ, 更新時刻)
+        self.refresh(force=True)
+
+    @property
+    def source(self):
+        return self.db_path or self.csv_path
+
+    def refresh(self, force=False):
+        # 更新があれば差分を取り込み、取り込んだ行数を返す
+        with self.lock:
+            now = time.time()
+            if not force and now - self.last_checked < REFRESH_INTERVAL_SECONDS:
+                return 0
+            self.last_checked = now
+            new_rows = self._refresh_db() if self.db_path else self._refresh_csv()
+            if new_rows:
+                self.version += 1
+            return new_rows
+
+    def _refresh_db(self):
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+            max_rowid = conn.execute("SELECT max(rowid) FROM results").fetchone()[0] or 0
+            if schema_version != self.schema_version or max_rowid < self.last_rowid:
+                # テーブルが作り直された（rowid が詰め直された）ので全体を読み直す
+                self.df = pd.DataFrame()
+                self.last_rowid = 0
+                self.schema_version = schema_version
+            # 移行前の古いDBに無い列は読まない
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+            columns = ", ".join(sql_name for _, sql_name, _ in result_db.COLUMNS if sql_name in existing)
+            new = pd.read_sql_query(f"SELECT rowid AS _rowid, {columns} FROM results WHERE rowid > ? ORDER BY rowid",
+                                    conn, params=[self.last_rowid])
+        finally:
+            conn.close()
+        if new.empty:
+            return 0
+        self.last_rowid = int(new['_rowid'].max())
+        new = to_typed(new.drop(columns='_rowid'))
+        merged = pd.concat([self.df, new], ignore_index=True) if len(self.df) else new
+        self.df = to_typed(_latest_rows(merged))
+        return len(new)
+
+    def _read_csv_from(self, f, offset, header):
+        f.seek(offset)
+        data = f.read()
+        # 書きかけの最後の行は次回に回す
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return None, offset
+        text = data[:end].decode()
+        if header is not None:
+            text = header + text
+        return pd.read_csv(io.StringIO(text)), offset + end
+
+    @staticmethod
+    def _hash_range(f, start, end, digest=None):
+        digest = digest or hashlib.sha1()
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(remaining, HASH_CHUNK_BYTES))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+        return digest
+
+    def _refresh_csv(self):
+        try:
+            stat = os.stat(self.csv_path)
+        except FileNotFoundError:
+            return 0
+        state = self.csv_state
+        if state and (state[0], state[4], state[5]) == (stat.st_ino, stat.st_size, stat.st_mtime_ns):
+            return 0
+        with open(self.csv_path, 'rb') as f:
+            prefix = None
+            if state and state[0] == stat.st_ino and stat.st_size >= state[1]:
+                # 前回読んだ部分がすべて同じなら追記とみなす
+                prefix = self._hash_range(f, 0, state[1])
+                if prefix.hexdigest() != state[2]:
+                    prefix = None
+            if prefix is not None:
+                new, offset = self._read_csv_from(f, state[1], state[3])
+                if new is not None:
+                    self.df = to_typed(_latest_rows(pd.concat([self.df, to_typed(new)], ignore_index=True)))
+                digest = self._hash_range(f, state[1], offset, prefix)
+            else:
+                new, offset = self._read_csv_from(f, 0, None)
+                if new is not None:
+                    self.df = to_typed(_latest_rows(to_typed(new)))
+                digest = self._hash_range(f, 0, offset)
+            f.seek(0)
+            header = f.readline().decode()
+            self.csv_state = (stat.st_ino, offset, digest.hexdigest(), header, stat.st_size, stat.st_mtime_ns)
+        return 0 if new is None else len(new)
+
+
+# ===============================================================
+# 問い合わせ (Queries)
+# ===============================================================
+def _split(value):
+    return [v for v in value.split(",") if v] if value else []
+
+
+def _parse_value(text):
+    try:
+        return float(text) if "." in text else int(text)
+    except ValueError:
+        return text
+
+
+def apply_filters(df, params):
+    # bench と result_db.py の列名による絞り込み（カンマ区切りは IN）
+    mask = np.ones(len(df), dtype=bool)
+    for name, value in params.items():
+        if name == 'bench':
+            column = 'Benchmark'
+        elif name in result_db.SQL_TO_DF:
+            column = result_db.SQL_TO_DF[name]
+        else:
+            continue
+        if column not in df.columns:
+            continue
+        values = [_parse_value(v) for v in _split(value)]
+        if name == 'bench':
+            values = [str(v) for v in values]
+        mask &= df[column].isin(values).fillna(False).to_numpy(dtype=bool)
+    return df[mask]
+
+
+def _column(name):
+    return result_db.SQL_TO_DF.get(name, name)
+
+
+def run_query(df, params):
+    result = apply_filters(df, params)
+    order = _column(params.get('order', 'sim_ticks'))
+    if order in result.columns:
+        result = result.sort_values(order, ascending=params.get('desc') is None, kind='stable')
+    columns = [_column(c) for c in _split(params.get('columns'))]
+    if columns:
+        result = result[[c for c in columns if c in result.columns]]
+    return result.head(int(params.get('limit', 100)))
+
+
+def run_group(df, params):
+    result = apply_filters(df, params)
+    by = [_column(c) for c in _split(params.get('by', 'bench'))]
+    by = ['Benchmark' if c == 'bench' else c for c in by]
+    value = _column(params.get('value', 'sim_ticks'))
+    aggs = _split(params.get('agg', 'count,mean,min,max'))
+    unknown = [a for a in aggs if a not in GROUP_AGGS]
+    if unknown:
+        raise ValueError(f"未対応の集計です: {', '.join(unknown)} (使えるのは {', '.join(GROUP_AGGS)})")
+    grouped = result.groupby(by, observed=True)[value].agg(aggs)
+    return grouped.reset_index()
+
+
+def run_top(df, params):
+    exclude = _split(params.get('exclude', 'fft,lu'))
+    bce_limit = float(params['bce_limit']) if 'bce_limit' in params else BCE_LIMIT
+    frame = apply_filters(df, params).copy()
+    frame['Benchmark'] = frame['Benchmark'].astype(str)
+    frame['sim_ticks'] = frame['sim_ticks'].astype('float64')
+    ranked = rank_configs(frame, exclude=exclude, mean_type=params.get('mean', 'arith'),
+                          bce_limit=bce_limit, n_boot=0)
+    return ranked.head(int(params.get('k', 10)))
+
+
+QUERIES = {'/query': run_query, '/group': run_group, '/top': run_top}
+
+
+class QueryCache:
+    # (データの版, パス, 問い合わせ) -> 結果 の LRU キャッシュ
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+        value = compute()
+        with self.lock:
+            self.misses += 1
+            self.entries[key] = value
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return value
+
+
+# ===============================================================
+# HTTP サーバ (HTTP / Unix socket server)
+# ===============================================================
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is pd.NA:
+        return None
+    return str(value)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    store = None
+    cache = None
+
+    def address_string(self):
+        # Unix ソケットでは client_address が空
+        return self.client_address[0] if self.client_address else "unix"
+
+    def _send(self, status, body, content_type):
+        payload = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        fmt = params.pop('format', 'json')
+        try:
+            self.store.refresh()
+            if url.path == '/status':
+                self._send(200, json.dumps({
+                    'source': self.store.source, 'rows': len(self.store.df), 'version': self.store.version,
+                    'cache': {'entries': len(self.cache.entries), 'hits': self.cache.hits, 'misses': self.cache.misses},
+                }, ensure_ascii=False), "application/json")
+                return
+            if url.path not in QUERIES:
+                self._send(404, json.dumps({'error': f"不明なパスです: {url.path}"}, ensure_ascii=False),
+                           "application/json")
+                return
+            key = (self.store.version, url.path, tuple(sorted(params.items())), fmt)
+            df = self.store.df
+
+            def compute():
+                result = QUERIES[url.path](df, params)
+                if fmt == 'csv':
+                    return result.to_csv(index=False)
+                records = result.astype(object).where(result.notna(), None).to_dict('records')
+                return json.dumps(records, ensure_ascii=False, default=_json_default)
+
+            body = self.cache.get(key, compute)
+            self._send(200, body, "text/csv" if fmt == 'csv' else "application/json")
+        except (KeyError, ValueError, TypeError) as e:
+            self._send(400, json.dumps({'error': str(e)}, ensure_ascii=False), "application/json")
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(store, host=HOST, port=PORT, unix_socket=None, cache_size=CACHE_SIZE):
+    handler = type("Handler", (QueryHandler,), {'store': store, 'cache': QueryCache(cache_size)})
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = UnixHTTPServer(unix_socket, handler)
+        print(f"✅ {store.source} の {len(store.df)} 件を読み込み、{unix_socket} で待ち受けます。")
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        print(f"✅ {store.source} の {len(store.df)} 件を読み込み、http://{host}:{port}/ で待ち受けます。")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+
+
+def fetch(path, url=f"http://{HOST}:{PORT}", **params):
+    # ノートブックなどから使う: fetch("/query", bench="fmm", core_num="8,16") -> DataFrame
+    query = urllib.parse.urlencode({k: ",".join(map(str, v)) if isinstance(v, (list, tuple)) else v
+                                    for k, v in params.items()})
+    with urllib.request.urlopen(f"{url}{path}?{query}") as response:
+        return pd.DataFrame(json.load(response))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="結果をメモリに保持して問い合わせに答える常駐サーバ")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", help=f"結果DB（既定: {result_db.DB_PATH} があればそれを使う）")
+    source.add_argument("--csv", help=f"集計CSV（既定: {SUMMARY_CSV}）")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--unix", help="TCP の代わりにこの Unix ソケットで待ち受ける")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE)
+    args = parser.parse_args()
+
+    db_path, csv_path = args.db, args.csv
+    if not db_path and not csv_path:
+        if os.path.exists(result_db.DB_PATH):
+            db_path = result_db.DB_PATH
+        else:
+            csv_path = SUMMARY_CSV
+    serve(ResultsStore(db_path, csv_path), args.host, args.port, args.unix, args.cache_size)
@@ -1,8 +1,19 @@
 import pandas as pd
-import subprocess
 import os
-import math
+import time
 import re # stats.txtを解析するために正規表現モジュールをインポート
+import json
+import argparse
+import result_db
+import sweep_trace
+from sim_summary import collect_result_row, CONVERGENCE_FILE, ROI_INFO_FILE
+from parallel_runner import ParallelRunner, MemoryModel, CpuAllocator
+from dedup import dedup_jobs, fan_out
+from convergence import ConvergenceMonitor, DEFAULT_TOLERANCE, DEFAULT_WINDOW
+from cost_model import CostModel
+from online_rank import OnlineRanking, DEFAULT_EXCLUDE, ONLINE_RANKING_CSV
+from planner import plan
+from config_key import SimConfig, write_sidecar
 
 # ===============================================================
 # パラメータ設定 (Parameter Settings)
@@ -11,9 +22,38 @@ GEM5_PATH = "./build/ALPHA/gem5.opt"
 GEM5_CONFIG_SCRIPT = "./configs/example/se.py"
 INPUT_PARAMETERS_CSV = './filtered_data.csv' # または './data.csv'
 BASE_RESULTS_DIR = "./results_simulations" # 元のディレクトリ名に戻す
+RESULTS_DB_PATH = result_db.DB_PATH # 完了した実行を逐次登録する結果DB (None で無効)
+RUN_HISTORY_CSV = "./result/run_history.csv" # 各実行の所要時間・ピークメモリの履歴
+
+# 並列実行の設定
+MAX_PARALLEL_RUNS = os.cpu_count() # 同時に実行するgem5の数
+MEMORY_BUDGET_MB = None # 同時実行の予測メモリ合計の上限。None の場合は空きメモリの80%
+RUN_TIMEOUT_SECONDS = None # 1実行あたりの上限時間。None の場合は無制限
+PIN_CPUS = True # 各gem5を専用の物理コアに固定する
+AVOID_SMT_SIBLINGS = True # 同じ物理コアのSMTスレッドには2つ目のgem5を置かない
+NUMA_LOCAL_MEMORY = True # numactl があれば固定したコアのNUMAノードからメモリを確保する
+HOST_RATE_REPORT_CSV = "./result/host_rate_by_cpu.csv" # コアごとの host_inst_rate の集計
+DEDUP_EQUIVALENT_CONFIGS = True # gem5 に渡るパラメータが同じ実行は1回だけシミュレーションする
+
+# 周期的な統計ダンプと収束による早期停止
+STATS_PERIOD_SECONDS = None # se.py の --stats-period (シミュレーション時間の秒)。None でダンプしない
+EARLY_STOP_METRIC = None # "ipc" / "l2_miss_rate"。None で早期停止しない (STATS_PERIOD_SECONDS が必要)
+EARLY_STOP_TOLERANCE = DEFAULT_TOLERANCE
+EARLY_STOP_WINDOW = DEFAULT_WINDOW
+# 結果を取り込みながら順位付けし、上位 k に入り得ない構成の残りの実行を省く。None で無効
+ONLINE_RANK_TOP_K = None
+ONLINE_RANK_MEAN = "arith" # "arith" / "geo" (result.py の MEAN_TYPE と合わせる)
+# planner.py の計画 (plan.csv) の順に実行し、完了するたびに残りの予算で選び直す。None で計画を使わない
+PLAN_CSV = None
+# 関心領域 (ROI) だけを詳細CPUでシミュレーションする (se.py --roi)。None でプログラム全体
+#   "work":  m5 work_begin / work_end の位置で ROI を区切る (注釈を入れたバイナリが必要)
+#   "insts": BENCHMARKS の "ROI_INSTS" (cpu0 の命令数の開始, 終了) で区切る
+# ROI の前は AtomicSimpleCPU で早送りし、ROI の終わりで終了する。--stats-period とは併用できない
+ROI_MODE = None
 
 # SPLASH-2 ベンチマーク定義
 # 各ベンチマークに固有の skip_threshold_seconds を追加
+# ROI_MODE = "insts" で使う場合は "ROI_INSTS": (開始, 終了) (cpu0 の命令数) を追加する
 BENCHMARKS = {
     # "fmm": {
     #     "CMD": "./splash2/fmm/FMM",
@@ -79,33 +119,12 @@ BASE_L2_ASSOC = 8
 MIN_CPU_FREQ_TO_CONSIDER_GHZ = 0.7
 
 # ===============================================================
-# シミュレーション実行ロジック (Simulation Execution Logic)
+# 実行するシミュレーションの一覧作成 (Build the list of simulation jobs)
 # ===============================================================
-def run_simulation():
-    # gem5実行ファイルの存在チェック (Check for gem5 executable)
-    if not os.path.exists(GEM5_PATH):
-        print(f"エラー: gem5実行ファイルが見つかりません。パスを確認してください: {GEM5_PATH}")
-        print("gem5をビルドまたはパスを修正してください。")
-        return
-
-    # gem5設定スクリプトの存在チェック (Check for gem5 config script)
-    if not os.path.exists(GEM5_CONFIG_SCRIPT):
-        print(f"エラー: gem5設定スクリプトが見つかりません。パスを確認してください: {GEM5_CONFIG_SCRIPT}")
-        return
-
-    try:
-        df_params = pd.read_csv(INPUT_PARAMETERS_CSV)
-    except FileNotFoundError:
-        print(f"エラー: 入力パラメータCSVファイルが見つかりません: {INPUT_PARAMETERS_CSV}")
-        print("前のステップでこのファイルが正しく生成されたか確認してください。")
-        return
-    except Exception as e:
-        print(f"CSVファイルの読み込み中にエラーが発生しました: {e}")
-        return
-
-    # 結果ディレクトリの作成 (Create results directory)
-    os.makedirs(BASE_RESULTS_DIR, exist_ok=True)
-
+def build_jobs(df_params, stats_period=STATS_PERIOD_SECONDS, cost_model=None, roi=ROI_MODE):
+    if cost_model is None:
+        cost_model = CostModel(BASE_EXEC_TIMES, BASE_CPU_FREQ_GHZ, history_csv=None)
+    jobs = []
     total_simulations = len(df_params) * len(BENCHMARKS)
     current_sim_count = 0
 
@@ -141,24 +160,19 @@ def run_simulation():
                 current_skip_threshold_seconds = float('inf') # 基本的にスキップしない
 
             # 実行時間予測とスキップ判定
-            predicted_time_seconds = None
-            base_time_key = (bench_name, core_num)
-            if base_time_key in BASE_EXEC_TIMES:
-                base_time = BASE_EXEC_TIMES[base_time_key]
-                if cpu_clock_ghz > 0:
-                    predicted_time_seconds = base_time * (BASE_CPU_FREQ_GHZ / cpu_clock_ghz)
-                else:
-                    predicted_time_seconds = float('inf')
-
-                # 予測時間がベンチマーク固有のしきい値を超える場合はスキップ
-                if predicted_time_seconds is not None and predicted_time_seconds >= current_skip_threshold_seconds:
-                    print(f"\n({current_sim_count}/{total_simulations}) スキップ: {bench_name} (Core={core_num}, L1={l1_size_kb}KB, L2={l2_size_kb}KB, Clock={cpu_clock_ghz}GHz)")
-                    print(f"  予測される実行時間が長すぎます ({predicted_time_seconds:.2f}秒 >= {current_skip_threshold_seconds}秒)。")
-                    continue
-                elif predicted_time_seconds is not None and predicted_time_seconds == float('inf'):
-                    print(f"\n({current_sim_count}/{total_simulations}) スキップ: {bench_name} (Core={core_num}, L1={l1_size_kb}KB, L2={l2_size_kb}KB, Clock={cpu_clock_ghz}GHz)")
-                    print(f"  CPU周波数が0のため、実行時間は無限大と予測されます。")
-                    continue
+            # 実行履歴から当てはめたモデル（履歴が無ければ資料17ページの表）で予測する
+            config = {
+                'bench': bench_name, 'core': core_num, 'clock': cpu_clock_ghz,
+                'l1_size': l1_size_kb, 'l1_assoc': l1_assoc, 'l2_size': l2_size_kb,
+                'l2_assoc': l2_assoc, 'l2_latency': l2_latency_cycles,
+            }
+            predicted_time_seconds, prediction_source = cost_model.predict(config)
+
+            # 予測時間がベンチマーク固有のしきい値を超える場合はスキップ
+            if predicted_time_seconds is not None and predicted_time_seconds >= current_skip_threshold_seconds:
+                print(f"\n({current_sim_count}/{total_simulations}) スキップ: {bench_name} (Core={core_num}, L1={l1_size_kb}KB, L2={l2_size_kb}KB, Clock={cpu_clock_ghz}GHz)")
+                print(f"  予測される実行時間が長すぎます ({predicted_time_seconds:.2f}秒 >= {current_skip_threshold_seconds}秒, 予測: {prediction_source})。")
+                continue
 
             cmd_base = bench_info['CMD']
             # ベンチマーク実行ファイルの存在チェック (Check for benchmark executable)
@@ -167,99 +181,404 @@ def run_simulation():
                 print(f"このシミュレーションはスキップされます: {bench_name} (Core={core_num}, L1={l1_size_kb}KB, L2={l2_size_kb}KB)")
                 continue
 
+            if roi == "insts" and not bench_info.get("ROI_INSTS"):
+                print(f"エラー: ROI の命令数が定義されていません (BENCHMARKS['{bench_name}']['ROI_INSTS'])。")
+                print(f"このシミュレーションはスキップされます: {bench_name} (Core={core_num}, L1={l1_size_kb}KB, L2={l2_size_kb}KB)")
+                continue
+
             cmd_options = bench_info['OPTIONS_FORMAT'].format(CORE=core_num)
 
-            # 各シミュレーションの出力ディレクトリを生成
-            out_dir_name = (
-                f"core{core_num}_L1-{l1_size_kb}KB-A{l1_assoc}_"
-                f"L2-{l2_size_kb}KB-A{l2_assoc}_Lat{l2_latency_cycles}_Bench-{bench_name}"
-            )
+            # 各シミュレーションの出力ディレクトリ名と gem5 の引数は構成キーの型から作る
+            # (ROI だけの実行はプログラム全体の結果を上書きしないように別のディレクトリ)
+            sim_config = SimConfig(core_num, l1_size_kb, l1_assoc, l2_size_kb, l2_assoc, l2_latency_cycles,
+                                   clock=cpu_clock_ghz)
+            out_dir_name = sim_config.dir_name(bench_name, roi)
             full_out_dir = os.path.join(BASE_RESULTS_DIR, out_dir_name)
-            os.makedirs(full_out_dir, exist_ok=True)
 
             gem5_command_args = [
                 GEM5_PATH,
                 "-d", full_out_dir,
                 GEM5_CONFIG_SCRIPT,
-                "-n", str(core_num), # intに変換したcore_numを使用
                 "--cpu-type=detailed",
-                "--cpu-clock=" + str(cpu_clock_ghz) + "GHz",
                 "--mem-type=SimpleMemory",
                 "--caches",
                 "--l2cache",
-                "--l1d_size=" + str(l1_size_kb) + "kB", # intに変換したl1_size_kbを使用
-                "--l1d_assoc=" + str(l1_assoc),         # intに変換したl1_assocを使用
-                "--l2_size=" + str(l2_size_kb) + "kB",   # intに変換したl2_size_kbを使用
-                "--l2_assoc=" + str(l2_assoc),           # intに変換したl2_assocを使用
-                "--l2_latency=" + str(l2_latency_cycles), # intに変換したl2_latency_cyclesを使用
+                *sim_config.gem5_args(), # -n, --cpu-clock, --l1d_size ... --l2_latency
                 "-c", cmd_base
             ]
-            
-            print(f"\n--- シミュレーション開始 ({current_sim_count}/{total_simulations}) ---")
-            print(f"  設定: {out_dir_name}")
-            if predicted_time_seconds is not None:
-                print(f"  予測実行時間: {predicted_time_seconds:.2f}秒。")
-            print(f"  出力ディレクトリ: {full_out_dir}")
-
-            try:
-                # fmmベンチマークは入力リダイレクトが必要なため、shell=Trueで実行
-                if bench_name == "fmm":
-                    full_command_str = " ".join(gem5_command_args) + f" {cmd_options}"
-                    print(f"  コマンド: {full_command_str}")
-                    result = subprocess.run(
-                        full_command_str,
-                        shell=True,
-                        executable='/bin/bash', # 明示的にbashを使用
-                        capture_output=True,
-                        text=True,
-                        check=False
-                    )
-                else:
-                    # その他のベンチマークは -o オプションで引数を渡す
-                    gem5_command_args.extend(["-o", cmd_options])
-                    print(f"  コマンド: {' '.join(gem5_command_args)}")
-                    result = subprocess.run(
-                        gem5_command_args,
-                        capture_output=True,
-                        text=True,
-                        check=False
-                    )
-
-                if result.returncode != 0:
-                    print(f"エラー: gem5シミュレーションが非ゼロの終了コードで終了しました: {result.returncode}")
-                    if result.stdout: print(f"  gem5 STDOUT:\n{result.stdout}")
-                    if result.stderr: print(f"  gem5 STDERR:\n{result.stderr}")
-                    print("上記gem5の出力メッセージを確認してください。")
-                    continue # 次のシミュレーションへ
-
-                # stats.txtから実行時間を読み込む (Read execution time from stats.txt)
-                stats_file_path = os.path.join(full_out_dir, 'stats.txt')
-                sim_seconds = "N/A"
-                if os.path.exists(stats_file_path) and os.path.getsize(stats_file_path) > 0:
-                    with open(stats_file_path, 'r') as f:
-                        for line in f:
-                            # sim_secondsの行を正規表現で検索 (Search for sim_seconds line with regex)
-                            match = re.match(r'\s*sim_seconds\s+([0-9.]+)', line)
-                            if match:
-                                sim_seconds = float(match.group(1))
-                                break
-                    if sim_seconds == "N/A":
-                        print(f"警告: '{stats_file_path}' から 'sim_seconds' が見つかりませんでした。")
-                else:
-                    print(f"警告: '{stats_file_path}' が見つからないか、空です。")
-
-                print(f"  実行時間 (sim_seconds): {sim_seconds} 秒")
-
-            except FileNotFoundError:
-                print(f"エラー: コマンド '{gem5_command_args[0]}' が見つかりません。gem5へのパスが正しいか確認してください。")
-            except Exception as e:
-                print(f"予期せぬエラーが発生しました: {e}")
-
-            print(f"--- シミュレーション終了 ({current_sim_count}/{total_simulations}) ---\n")
+            if stats_period:
+                gem5_command_args[-2:-2] = ["--stats-period=" + str(stats_period)]
+            if roi:
+                roi_args = ["--roi=" + roi]
+                if roi == "insts":
+                    roi_start, roi_end = bench_info["ROI_INSTS"]
+                    roi_args += ["--roi-start-insts=" + str(roi_start), "--roi-end-insts=" + str(roi_end)]
+                gem5_command_args[-2:-2] = roi_args
+
+            # fmmベンチマークは入力リダイレクトが必要なため、shell=Trueで実行
+            if bench_name == "fmm":
+                command = " ".join(gem5_command_args) + f" {cmd_options}"
+                shell = True
+            else:
+                # その他のベンチマークは -o オプションで引数を渡す
+                command = gem5_command_args + ["-o", cmd_options]
+                shell = False
+
+            jobs.append({
+                'name': out_dir_name,
+                'label': f"{current_sim_count}/{total_simulations}",
+                'out_dir': full_out_dir,
+                'bench': bench_name,
+                'core': core_num,
+                'clock': cpu_clock_ghz,
+                'l1_size': l1_size_kb,
+                'l1_assoc': l1_assoc,
+                'l2_size': l2_size_kb,
+                'l2_assoc': l2_assoc,
+                'l2_latency': l2_latency_cycles,
+                'config_key': sim_config.key,
+                'roi': roi,
+                'command': command,
+                'shell': shell,
+                'predicted_time_seconds': predicted_time_seconds,
+                'prediction_source': prediction_source,
+                'skip_threshold_seconds': current_skip_threshold_seconds,
+            })
+
+    return jobs
+
+# ===============================================================
+# シミュレーション実行ロジック (Simulation Execution Logic)
+# ===============================================================
+def run_simulation(max_parallel=MAX_PARALLEL_RUNS, memory_budget_mb=MEMORY_BUDGET_MB,
+                   pin_cpus=PIN_CPUS, avoid_smt=AVOID_SMT_SIBLINGS, numa_local_memory=NUMA_LOCAL_MEMORY,
+                   dedup=DEDUP_EQUIVALENT_CONFIGS, stats_period=STATS_PERIOD_SECONDS,
+                   early_stop_metric=EARLY_STOP_METRIC, online_rank_top_k=ONLINE_RANK_TOP_K,
+                   plan_csv=PLAN_CSV, budget_core_hours=None, roi=ROI_MODE):
+    # gem5実行ファイルの存在チェック (Check for gem5 executable)
+    if not os.path.exists(GEM5_PATH):
+        print(f"エラー: gem5実行ファイルが見つかりません。パスを確認してください: {GEM5_PATH}")
+        print("gem5をビルドまたはパスを修正してください。")
+        return
+
+    # gem5設定スクリプトの存在チェック (Check for gem5 config script)
+    if not os.path.exists(GEM5_CONFIG_SCRIPT):
+        print(f"エラー: gem5設定スクリプトが見つかりません。パスを確認してください: {GEM5_CONFIG_SCRIPT}")
+        return
+
+    try:
+        df_params = pd.read_csv(INPUT_PARAMETERS_CSV)
+    except FileNotFoundError:
+        print(f"エラー: 入力パラメータCSVファイルが見つかりません: {INPUT_PARAMETERS_CSV}")
+        print("前のステップでこのファイルが正しく生成されたか確認してください。")
+        return
+    except Exception as e:
+        print(f"CSVファイルの読み込み中にエラーが発生しました: {e}")
+        return
+
+    # 結果ディレクトリの作成 (Create results directory)
+    os.makedirs(BASE_RESULTS_DIR, exist_ok=True)
+    db_conn = result_db.connect(RESULTS_DB_PATH) if RESULTS_DB_PATH else None
+
+    # 実行履歴から実行時間モデルを当てはめる（完了するたびに当てはめ直す）
+    cost_model = CostModel(BASE_EXEC_TIMES, BASE_CPU_FREQ_GHZ, RUN_HISTORY_CSV)
+    print(cost_model.report())
+
+    with sweep_trace.span("build_jobs"):
+        jobs = build_jobs(df_params, stats_period, cost_model, roi)
+    if roi:
+        print(f"ROI モード ({roi}): ROI の前は早送りし、ROI だけを詳細CPUでシミュレーションします。")
+    duplicates = {}
+    if dedup:
+        n_requested = len(jobs)
+        with sweep_trace.span("dedup_jobs"):
+            jobs, duplicates = dedup_jobs(jobs)
+        print(f"重複排除: {n_requested} 件中 {len(jobs)} 件を実行します "
+              f"(等価な構成の {n_requested - len(jobs)} 件は結果を複製)。")
+
+    online = None
+    if online_rank_top_k:
+        ranked_benchmarks = [b for b in BENCHMARKS if b.lower() not in DEFAULT_EXCLUDE]
+        online = OnlineRanking(ranked_benchmarks, online_rank_top_k, ONLINE_RANK_MEAN)
+        online.add_pending(jobs + [d for dups in duplicates.values() for d in dups])
+        print(f"実行中のランキング: 上位 {online_rank_top_k} 構成 ({', '.join(ranked_benchmarks)}) が"
+              f"確定したら残りの実行を省きます。")
+    n_pruned = 0
+
+    # 計画: 実行名 -> 順番。計画に無い実行は開始しない
+    plan_order = None
+    if plan_csv:
+        try:
+            plan_df = pd.read_csv(plan_csv)
+        except pd.errors.EmptyDataError:  # ヘッダも無い古い空の計画
+            plan_df = pd.DataFrame()
+        if plan_df.empty:
+            print(f"計画: {plan_csv} は空です（予算に収まる実行がありません）。実行するシミュレーションはありません。")
+            return
+        planned = dict(zip(plan_df['Run Name'], plan_df['Order']))
+        plan_order = {}
+        for job in jobs:
+            # 重複排除で代表になった実行は、等価な構成のどれかが計画にあれば実行する
+            orders = [planned[j['name']] for j in [job] + duplicates.get(job['name'], []) if j['name'] in planned]
+            if orders:
+                plan_order[job['name']] = min(orders)
+        budget_seconds = (budget_core_hours * 3600 if budget_core_hours
+                          else float(plan_df['Predicted Seconds'].sum()))
+        spent_seconds = 0.0
+        n_missing = len(planned) - sum(1 + len(duplicates.get(name, [])) for name in plan_order)
+        print(f"計画: {plan_csv} の {len(plan_order)} 件を順に実行します (予算 {budget_seconds / 3600:.2f} コア時間)。")
+        if n_missing > 0:
+            print(f"  警告: 計画の {n_missing} 件は {INPUT_PARAMETERS_CSV} の実行一覧にありません。")
+
+    def replan():
+        # 残りの予算 = 予算 - 完了した実行の実測 - 実行中の実行の残りの予測
+        now = time.time()
+        remaining = budget_seconds - spent_seconds
+        for name, start_time in started_at.items():
+            if name not in finished:
+                predicted, _ = cost_model.predict(jobs_by_name[name])
+                remaining -= max((predicted or 0.0) - (now - start_time), 0.0)
+        candidates = [j for j in jobs if j['name'] not in started_at and j['name'] not in finished]
+        selected = plan(candidates, cost_model, max(remaining, 0.0))
+        plan_order.clear()
+        plan_order.update({j['name']: order for order, (j, _, _) in enumerate(selected, start=1)})
+        print(f"  再計画: 残り予算 {max(remaining, 0.0) / 3600:.2f} コア時間で未開始の {len(candidates)} 件から "
+              f"{len(selected)} 件を選びました。")
+
+    jobs_by_name = {job['name']: job for job in jobs}
+
+    def on_start(job, predicted_mb):
+        # 前回の実行の統計が途中経過として読まれないように消しておく
+        for stale_name in ('stats.txt', CONVERGENCE_FILE, ROI_INFO_FILE):
+            stale_path = os.path.join(job['out_dir'], stale_name)
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+        # 集計時にディレクトリ名を読み直さなくて済むように、構成とキーを書いておく
+        write_sidecar(job['out_dir'], SimConfig.from_job(job), job['bench'])
+        print(f"\n--- シミュレーション開始 ({job['label']}) ---")
+        print(f"  設定: {job['name']}")
+        started_at[job['name']] = time.time()
+        if job['predicted_time_seconds'] is not None:
+            print(f"  予測実行時間: {job['predicted_time_seconds']:.2f}秒 ({job['prediction_source']})。")
+        print(f"  予測メモリ使用量: {predicted_mb:.0f}MB")
+        if 'cpu' in job:
+            print(f"  割り当てCPU: {job['cpu']}")
+        print(f"  出力ディレクトリ: {job['out_dir']}")
+        command = job['command'] if job['shell'] else ' '.join(job['command'])
+        print(f"  コマンド: {command}")
+
+    started_at = {}
+    finished = set()
+
+    def should_skip(job):
+        nonlocal n_pruned
+        # 当てはめ直したモデルで、開始直前にもう一度スキップ判定する
+        predicted, source = cost_model.predict(job)
+        job['predicted_time_seconds'], job['prediction_source'] = predicted, source
+        if predicted is not None and predicted >= job['skip_threshold_seconds']:
+            print(f"\n({job['label']}) スキップ: {job['name']}")
+            print(f"  予測される実行時間が長すぎます ({predicted:.2f}秒 >= {job['skip_threshold_seconds']}秒, 予測: {source})。")
+            finished.add(job['name'])
+            if online is not None:
+                for skipped_job in [job] + duplicates.get(job['name'], []):
+                    online.drop(skipped_job)
+            return True
+        # 上位 k に入り得ないことが示せた構成は実行しない
+        if online is not None and online.should_prune(job):
+            n_pruned += 1
+            print(f"\n({job['label']}) スキップ: {job['name']}")
+            print(f"  上位 {online_rank_top_k} 構成に入り得ないことが示せました (実行中のランキング)。")
+            finished.add(job['name'])
+            return True
+        # 計画（再計画）で選ばれていない実行は開始しない
+        if plan_order is not None and job['name'] not in plan_order:
+            print(f"\n({job['label']}) スキップ: {job['name']}")
+            print("  計画の予算内で選ばれていません。")
+            finished.add(job['name'])
+            return True
+        return False
+
+    def report_progress():
+        # 残りの実行の予測時間の合計を並列数で割って、終了までの目安を出す
+        now = time.time()
+        remaining_seconds = 0.0
+        n_unknown = 0
+        for pending_job in jobs:
+            if pending_job['name'] in finished:
+                continue
+            predicted, _ = cost_model.predict(pending_job)
+            if predicted is None:
+                n_unknown += 1
+                continue
+            elapsed = now - started_at.get(pending_job['name'], now)
+            remaining_seconds += max(predicted - elapsed, 0.0)
+        eta_seconds = remaining_seconds / max(runner.max_parallel, 1)
+        unknown_note = f", 予測なし {n_unknown} 件" if n_unknown else ""
+        print(f"  進捗: {len(finished)}/{len(jobs)} 件完了, 残り目安 {eta_seconds / 60:.1f} 分{unknown_note}")
+
+    def on_finish_with_progress(job, returncode, wall_seconds, peak_rss_mb):
+        nonlocal spent_seconds
+        finished.add(job['name'])
+        # 早期停止した実行・ROI だけの実行は全体の所要時間を表さないのでモデルには加えない
+        if returncode == 0 and not job.get('early_stopped') and not job.get('roi'):
+            cost_model.observe(job, wall_seconds)
+        on_finish(job, returncode, wall_seconds, peak_rss_mb)
+        if plan_order is not None:
+            spent_seconds += wall_seconds
+            replan()
+        report_progress()
+
+    def on_finish(job, returncode, wall_seconds, peak_rss_mb):
+        full_out_dir = job['out_dir']
+        print(f"\n--- シミュレーション終了 ({job['label']}) {job['name']} ---")
+        print(f"  所要時間: {wall_seconds:.1f}秒, ピークメモリ: {peak_rss_mb:.0f}MB")
+        if job['predicted_time_seconds']:
+            error = (wall_seconds - job['predicted_time_seconds']) / job['predicted_time_seconds']
+            print(f"  予測との差: {error * 100:+.1f}% ({job['prediction_source']})")
+
+        if returncode != 0:
+            print(f"エラー: gem5シミュレーションが非ゼロの終了コードで終了しました: {returncode}")
+            for stream_name in ("runner_stdout.txt", "runner_stderr.txt"):
+                stream_path = os.path.join(full_out_dir, stream_name)
+                if os.path.exists(stream_path) and os.path.getsize(stream_path) > 0:
+                    with open(stream_path, 'r') as f:
+                        print(f"  gem5 {stream_name}:\n{f.read()}")
+            print("上記gem5の出力メッセージを確認してください。")
+            if online is not None:
+                for failed_job in [job] + duplicates.get(job['name'], []):
+                    online.drop(failed_job)
+            return # 次のシミュレーションへ
+
+        # stats.txtから実行時間を読み込む (Read execution time from stats.txt)
+        stats_file_path = os.path.join(full_out_dir, 'stats.txt')
+        sim_seconds = "N/A"
+        if os.path.exists(stats_file_path) and os.path.getsize(stats_file_path) > 0:
+            with open(stats_file_path, 'r') as f:
+                for line in f:
+                    # sim_secondsの行を正規表現で検索 (Search for sim_seconds line with regex)
+                    # 周期的なダンプがある場合は最後の値を使う
+                    match = re.match(r'\s*sim_seconds\s+([0-9.]+)', line)
+                    if match:
+                        sim_seconds = float(match.group(1))
+            if sim_seconds == "N/A":
+                print(f"警告: '{stats_file_path}' から 'sim_seconds' が見つかりませんでした。")
+        else:
+            print(f"警告: '{stats_file_path}' が見つからないか、空です。")
+
+        print(f"  実行時間 (sim_seconds): {sim_seconds} 秒{' (ROI のみ)' if job.get('roi') else ''}")
+        if job.get('early_stopped'):
+            with open(os.path.join(full_out_dir, CONVERGENCE_FILE), 'r') as f:
+                extrapolated = json.load(f)['extrapolated']
+            print(f"  早期停止: 外挿した実行時間 (sim_seconds): {extrapolated['sim_seconds']:.6f} 秒")
+
+        # 等価な構成の出力ディレクトリにも同じ結果を複製する
+        for duplicate in duplicates.get(job['name'], []):
+            if fan_out(job, duplicate):
+                write_sidecar(duplicate['out_dir'], SimConfig.from_job(duplicate), duplicate['bench'])
+                print(f"  結果を複製: {duplicate['name']}")
+
+        # 完了した結果をすぐに結果DBへ登録する
+        if db_conn is not None or online is not None:
+            result_jobs = [job] + duplicates.get(job['name'], [])
+            result_rows = [collect_result_row(j['name'], j['out_dir']) for j in result_jobs]
+            if db_conn is not None and any(result_rows):
+                result_db.insert_rows(db_conn, [row for row in result_rows if row])
+            if online is not None:
+                update_online_ranking(result_jobs, result_rows)
+
+    def update_online_ranking(result_jobs, result_rows):
+        was_stable = online.is_stable()
+        for result_job, row in zip(result_jobs, result_rows):
+            if row and row.get('sim_ticks'):
+                online.observe(result_job, row['sim_ticks'])
+            else:
+                online.drop(result_job)
+        online.ranking().to_csv(ONLINE_RANKING_CSV, index=False)
+        if online.is_stable() and not was_stable:
+            print(f"\n🏁 上位 {online_rank_top_k} 構成が確定しました。残りの順位付けに関わる実行は省きます → {ONLINE_RANKING_CSV}")
+
+    def reference_insts(bench, core, roi):
+        # 同じベンチマーク・コア数・ROI モードの完了済み結果の命令数（外挿に使う）。外挿した結果は使わない
+        if db_conn is None:
+            return None
+        filters = {'core_num': core, 'roi': roi or result_db.ROI_NONE, 'extrapolated': 0}
+        done = result_db.query(db_conn, benchmark=bench, filters=filters,
+                               order_by='sim_insts', columns=['sim_insts']).dropna()
+        return float(done['sim_insts'].median()) if len(done) else None
+
+    def make_monitor(job):
+        reference = reference_insts(job['bench'], job['core'], job.get('roi'))
+        if reference is None:
+            print(f"  早期停止なし (同じベンチマーク・コア数の完了結果がありません): {job['name']}")
+            return None
+        return ConvergenceMonitor(job['out_dir'], reference, early_stop_metric,
+                                  EARLY_STOP_TOLERANCE, EARLY_STOP_WINDOW)
+
+    cpu_allocator = CpuAllocator(avoid_smt, numa_local_memory) if pin_cpus else None
+    if cpu_allocator is not None:
+        print(f"CPU固定: {cpu_allocator.capacity} コアを使用 "
+              f"(SMT回避: {'有効' if avoid_smt else '無効'}, "
+              f"numactl: {cpu_allocator.numactl or '未検出 (first-touch に任せる)'})")
+    runner = ParallelRunner(
+        MemoryModel(RUN_HISTORY_CSV),
+        max_parallel=max_parallel,
+        memory_budget_mb=memory_budget_mb,
+        timeout_seconds=RUN_TIMEOUT_SECONDS,
+        cpu_allocator=cpu_allocator,
+        monitor_factory=make_monitor if early_stop_metric and stats_period else None,
+    )
+    try:
+        runner.run(jobs, on_start=on_start, on_finish=on_finish_with_progress, should_skip=should_skip,
+                   priority=(lambda job: plan_order.get(job['name'], len(jobs) + 1)) if plan_order is not None else None)
+    except FileNotFoundError:
+        print(f"エラー: コマンド '{GEM5_PATH}' が見つかりません。gem5へのパスが正しいか確認してください。")
+        return
+    if cpu_allocator is not None:
+        runner.write_host_rate_report(HOST_RATE_REPORT_CSV)
 
+    print("\n" + cost_model.report())
+    if plan_order is not None:
+        print(f"\n📋 計画: 実測 {spent_seconds / 3600:.2f} / 予算 {budget_seconds / 3600:.2f} コア時間を使いました。")
+    if n_pruned:
+        print(f"\n🏁 実行中のランキングにより {n_pruned} 件のシミュレーションを省きました → {ONLINE_RANKING_CSV}")
+    n_saved = sum(len(d) for d in duplicates.values())
+    if n_saved:
+        print(f"\n♻️ 等価な構成の重複排除で {n_saved} 件のシミュレーションを省略しました。")
     print("\nすべてのシミュレーション実行が完了しました。")
     print(f"結果は '{BASE_RESULTS_DIR}' ディレクトリ以下に保存されています。")
     print("次に、結果集計スクリプトを実行してください。")
 
 if __name__ == "__main__":
-    run_simulation()
+    parser = argparse.ArgumentParser(description="gem5シミュレーションの一括実行")
+    parser.add_argument("-j", "--jobs", type=int, default=MAX_PARALLEL_RUNS, help="同時に実行するシミュレーション数")
+    parser.add_argument("--memory-budget-mb", type=float, default=MEMORY_BUDGET_MB,
+                        help="同時実行の予測メモリ合計の上限 (MB)。省略時は空きメモリの80%%")
+    parser.add_argument("--no-pin", action="store_true", help="gem5をCPUに固定しない")
+    parser.add_argument("--allow-smt", action="store_true", help="SMTの兄弟スレッドにもgem5を割り当てる")
+    parser.add_argument("--no-numa", action="store_true", help="numactl によるNUMAノードへのメモリ割り当てを行わない")
+    parser.add_argument("--no-dedup", action="store_true", help="等価な構成もそれぞれシミュレーションする")
+    parser.add_argument("--stats-period", type=float, default=STATS_PERIOD_SECONDS,
+                        help="統計を周期的にダンプする間隔 (シミュレーション時間の秒)")
+    parser.add_argument("--early-stop", choices=["ipc", "l2_miss_rate"], default=EARLY_STOP_METRIC,
+                        help="この指標が収束したら実行を止めて結果を外挿する (--stats-period が必要)")
+    parser.add_argument("--online-rank", type=int, metavar="K", default=ONLINE_RANK_TOP_K,
+                        help="結果を取り込みながら順位付けし、上位 K 構成に入り得ない構成の実行を省く")
+    parser.add_argument("--plan", default=PLAN_CSV, help="planner.py の計画 (plan.csv) の順に、予算内で実行する")
+    parser.add_argument("--budget-core-hours", type=float, default=None,
+                        help="--plan の予算 (コア時間)。省略時は計画の予測の合計")
+    parser.add_argument("--roi", choices=["work", "insts"], default=ROI_MODE,
+                        help="ROI だけを詳細CPUでシミュレーションする (work: m5 work_begin/work_end, "
+                             "insts: BENCHMARKS の ROI_INSTS)")
+    args = parser.parse_args()
+    if args.roi and (args.stats_period or args.early_stop):
+        parser.error("--roi は --stats-period / --early-stop と併用できません")
+    with sweep_trace.stage("run_all"):
+        run_simulation(max_parallel=args.jobs, memory_budget_mb=args.memory_budget_mb,
+                       pin_cpus=PIN_CPUS and not args.no_pin,
+                       avoid_smt=AVOID_SMT_SIBLINGS and not args.allow_smt,
+                       numa_local_memory=NUMA_LOCAL_MEMORY and not args.no_numa,
+                       dedup=DEDUP_EQUIVALENT_CONFIGS and not args.no_dedup,
+                       stats_period=args.stats_period, early_stop_metric=args.early_stop,
+                       online_rank_top_k=args.online_rank,
+                       plan_csv=args.plan, budget_core_hours=args.budget_core_hours,
+                       roi=args.roi)
@@ -0,0 +1,261 @@
+import json
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+import sweep_trace
+
+# ===============================================================
+# コア数に対するスケーリングの当てはめと外挿 (Core-count scaling model)
+#
+# simulation_summary.csv の少ないコア数の結果から、ベンチマーク・キャッシュ構成ごとに
+# sim_ticks のコア数依存を当てはめ、まだ実行していないコア数の sim_ticks を予測する。
+#   amdahl          : T(n) = s + p / n                （Amdahl: 逐次部分 + 並列部分）
+#   amdahl_overhead : T(n) = s + p / n + c * log2(n)  （同期・通信のオーバーヘッド付き）
+#   power           : log T(n) = a + b * log(n)       （経験的なべき乗則）
+# SPLASH の入力サイズはコア数によらず固定なので、Gustafson 型（問題サイズが
+# コア数に比例する弱スケーリング）のモデルは使わない。
+#
+# 誤差の見積もりはバックテストで行う。ベンチマークごとに観測された最大のコア数を
+# 隠し、それより少ないコア数だけで当てはめて予測した相対誤差の分布（全構成分）から
+# 予測の幅（既定は 5% 点〜95% 点）を決める。
+#
+# さらに、学習に使うコア数の部分集合のうち、バックテストの誤差が許容値に収まる
+# 最も安い組（資料17ページの実行時間の表で見積もる）を探し、make_data.py --filter
+# の条件式として出力する。
+# ===============================================================
+SUMMARY_CSV = "./result/simulation_summary.csv"
+PREDICTIONS_CSV = "./result/scaling_predictions.csv"
+BACKTEST_CSV = "./result/scaling_backtest.csv"
+CORE_PLAN_JSON = "./result/scaling_core_plan.json"
+
+CACHE_CONFIG_COLUMNS = [
+    'CPU clock (GHz)', 'L1 Cache Size (KB)', 'L1 Associativity',
+    'L2 Cache Size (KB)', 'L2 Associativity', 'L2 latency (cycles)'
+]
+TARGET_CORES = (32,)
+ERROR_QUANTILES = (0.05, 0.95)  # 予測の幅に使うバックテスト誤差の分位点
+TOLERANCE = 0.05                # コア数の組を「十分」とみなすバックテスト誤差 (|相対誤差| の 90% 点)
+TOLERANCE_QUANTILE = 0.9
+
+
+def _features(model, cores):
+    n = np.asarray(cores, dtype=float)
+    if model == "amdahl":
+        return np.column_stack([np.ones_like(n), 1 / n])
+    if model == "amdahl_overhead":
+        return np.column_stack([np.ones_like(n), 1 / n, np.log2(n)])
+    if model == "power":
+        return np.column_stack([np.ones_like(n), np.log(n)])
+    raise ValueError(f"未対応のモデルです: {model}")
+
+
+SCALING_MODELS = {name: _features(name, [1]).shape[1] for name in ("amdahl", "amdahl_overhead", "power")}
+
+
+def fit(model, cores, ticks):
+    # 点数がパラメータ数に満たなければ None
+    if len(cores) < SCALING_MODELS[model]:
+        return None
+    X = _features(model, cores)
+    y = np.asarray(ticks, dtype=float)
+    if model == "power":
+        coef, *_ = np.linalg.lstsq(X, np.log(y), rcond=None)
+    else:
+        # 各行を実測値で割り、相対誤差の二乗和を最小にする
+        coef, *_ = np.linalg.lstsq(X / y[:, None], np.ones_like(y), rcond=None)
+    return coef
+
+
+def predict(model, coef, cores):
+    value = _features(model, cores) @ coef
+    return np.exp(value) if model == "power" else value
+
+
+def scaling_table(summary, config_cols=CACHE_CONFIG_COLUMNS):
+    # (ベンチマーク, キャッシュ構成) x コア数 の sim_ticks（同じ組が複数あれば平均）
+    config_cols = [c for c in config_cols if c in summary.columns]
+    table = summary.pivot_table(index=['Benchmark'] + config_cols, columns='Core Number',
+                                values='sim_ticks', aggfunc='mean')
+    table.columns = [int(c) for c in table.columns]
+    return table
+
+
+def _observed(row, cores):
+    values = row[list(cores)]
+    values = values[values.notna() & (values > 0)]
+    return list(values.index), values.to_numpy(dtype=float)
+
+
+def backtest(table, model, train_cores, holdout):
+    # train_cores で当てはめて holdout を予測した相対誤差 (予測 / 実測 - 1) を構成ごとに返す
+    errors = []
+    for _, row in table.iterrows():
+        if holdout not in row.index or not row[holdout] > 0:
+            continue
+        cores, ticks = _observed(row, train_cores)
+        if len(cores) != len(train_cores):
+            continue
+        coef = fit(model, cores, ticks)
+        if coef is None:
+            continue
+        errors.append(float(predict(model, coef, [holdout])[0]) / row[holdout] - 1)
+    return np.array(errors)
+
+
+def _error_summary(errors):
+    return {
+        'Configs': len(errors),
+        'Median |Error|': float(np.median(np.abs(errors))),
+        f'P{int(TOLERANCE_QUANTILE * 100)} |Error|': float(np.quantile(np.abs(errors), TOLERANCE_QUANTILE)),
+        'Error Low': float(np.quantile(errors, ERROR_QUANTILES[0])),
+        'Error High': float(np.quantile(errors, ERROR_QUANTILES[1])),
+    }
+
+
+def evaluate_benchmark(bench_table, core_cost):
+    # 観測された最大のコア数を隠し、学習に使うコア数の部分集合ごとにバックテストする
+    observed = sorted(c for c in bench_table.columns if bench_table[c].notna().any())
+    if len(observed) < 3:
+        return observed, []
+    holdout = observed[-1]
+    candidates = observed[:-1]
+    rows = []
+    for model, n_params in SCALING_MODELS.items():
+        for size in range(n_params, len(candidates) + 1):
+            for subset in itertools.combinations(candidates, size):
+                errors = backtest(bench_table, model, subset, holdout)
+                if len(errors) == 0:
+                    continue
+                row = {'Model': model, 'Train Cores': subset, 'Holdout Cores': holdout,
+                       'Cost': sum(core_cost.get(c, np.nan) for c in subset)}
+                row.update(_error_summary(errors))
+                rows.append(row)
+    return observed, rows
+
+
+def choose(evaluations, tolerance=TOLERANCE):
+    # 全コア数を使ったときに最も誤差の小さいモデルを予測に使い、
+    # 許容誤差に収まる最も安いコア数の組を計画に使う
+    tolerance_col = f'P{int(TOLERANCE_QUANTILE * 100)} |Error|'
+    full_size = max(len(e['Train Cores']) for e in evaluations)
+    full = [e for e in evaluations if len(e['Train Cores']) == full_size]
+    best = min(full, key=lambda e: e['Median |Error|'])
+    sufficient = [e for e in evaluations if e[tolerance_col] <= tolerance]
+    cheapest = min(sufficient, key=lambda e: (e['Cost'], e[tolerance_col])) if sufficient else None
+    return best, cheapest
+
+
+def predict_configs(bench_table, model, error_low, error_high, target_cores):
+    rows = []
+    for key, row in bench_table.iterrows():
+        cores, ticks = _observed(row, bench_table.columns)
+        train = [c for c in cores if c not in target_cores]
+        coef = fit(model, train, [ticks[cores.index(c)] for c in train])
+        if coef is None:
+            continue
+        for target in target_cores:
+            predicted = float(predict(model, coef, [target])[0])
+            # バックテストの誤差 e = 予測 / 実測 - 1 から、実測値の範囲は 予測 / (1 + e)
+            rows.append(dict(zip(bench_table.index.names, key), **{
+                'Core Number': target,
+                'Model': model,
+                'Fitted Cores': " ".join(str(c) for c in train),
+                'Predicted sim_ticks': predicted,
+                'Lower sim_ticks': predicted / (1 + error_high),
+                'Upper sim_ticks': predicted / (1 + error_low),
+                'Observed sim_ticks': row[target] if target in row.index else np.nan,
+            }))
+    return rows
+
+
+def analyze(summary, core_cost, target_cores=TARGET_CORES, tolerance=TOLERANCE):
+    table = scaling_table(summary)
+    predictions, backtests, plan = [], [], {}
+    for bench, bench_table in table.groupby(level='Benchmark'):
+        bench_table = bench_table.dropna(axis=1, how='all')
+        observed, evaluations = evaluate_benchmark(bench_table, core_cost)
+        if not evaluations:
+            print(f"⚠️ {bench}: コア数が {len(observed)} 種類しかないため当てはめられません（3種類以上必要）")
+            continue
+        for e in evaluations:
+            backtests.append(dict(e, Benchmark=bench, **{'Train Cores': " ".join(map(str, e['Train Cores']))}))
+        best, cheapest = choose(evaluations, tolerance)
+        predictions.extend(predict_configs(bench_table, best['Model'], best['Error Low'],
+                                           best['Error High'], target_cores))
+        plan[bench] = {
+            'observed_cores': observed,
+            'prediction_model': best['Model'],
+            'prediction_error_range': [best['Error Low'], best['Error High']],
+            'cheapest_sufficient': None if cheapest is None else {
+                'model': cheapest['Model'],
+                'cores': list(cheapest['Train Cores']),
+                'cost': cheapest['Cost'],
+                'p90_abs_error': cheapest[f'P{int(TOLERANCE_QUANTILE * 100)} |Error|'],
+            },
+        }
+    return pd.DataFrame(predictions), pd.DataFrame(backtests), plan
+
+
+def core_plan(plan, tolerance=TOLERANCE):
+    # 全ベンチマークで十分なコア数の和集合を make_data.py --filter の条件式にする
+    cores = set()
+    for entry in plan.values():
+        chosen = entry['cheapest_sufficient']
+        cores.update(chosen['cores'] if chosen else entry['observed_cores'])
+    cores = sorted(cores)
+    return {
+        'tolerance': tolerance,
+        'cores': cores,
+        'filter': f"core in ({', '.join(str(c) for c in cores)})",
+        'benchmarks': plan,
+    }
+
+
+def table_core_cost(base_exec_times):
+    # 資料17ページの表から、コア数ごとの1構成あたりの実行時間（全ベンチマークの合計）を求める
+    cost = {}
+    for (_, core), seconds in base_exec_times.items():
+        cost[core] = cost.get(core, 0.0) + seconds
+    return cost
+
+
+if __name__ == "__main__":
+    from run_all import BASE_EXEC_TIMES
+
+    parser = argparse.ArgumentParser(description="コア数に対するスケーリングの当てはめと、必要なコア数の組の選択")
+    parser.add_argument("summary_csv", nargs="?", default=SUMMARY_CSV)
+    parser.add_argument("--target-cores", type=int, nargs="+", default=list(TARGET_CORES))
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help=f"バックテストの |相対誤差| の {int(TOLERANCE_QUANTILE * 100)}%% 点の上限")
+    parser.add_argument("--predictions", default=PREDICTIONS_CSV)
+    parser.add_argument("--backtest", default=BACKTEST_CSV)
+    parser.add_argument("--plan", default=CORE_PLAN_JSON)
+    args = parser.parse_args()
+
+    with sweep_trace.stage("scaling"):
+        summary_df = pd.read_csv(args.summary_csv)
+        predictions_df, backtest_df, bench_plan = analyze(
+            summary_df, table_core_cost(BASE_EXEC_TIMES), tuple(args.target_cores), args.tolerance)
+        if not bench_plan:
+            print("❌ 当てはめられるベンチマークがありません。")
+            raise SystemExit(1)
+
+        predictions_df.to_csv(args.predictions, index=False)
+        backtest_df.to_csv(args.backtest, index=False)
+        plan_result = core_plan(bench_plan, args.tolerance)
+        with open(args.plan, "w") as f:
+            json.dump(plan_result, f, indent=2)
+
+        print("📈 ベンチマークごとのモデルと予測の幅（バックテスト）:")
+        for bench, entry in bench_plan.items():
+            low, high = entry['prediction_error_range']
+            chosen = entry['cheapest_sufficient']
+            sufficient = (f"コア数 {chosen['cores']} ({chosen['model']}, 誤差 {chosen['p90_abs_error'] * 100:.1f}%)"
+                          if chosen else "許容誤差に収まる組なし（全コア数を実行）")
+            print(f"  {bench:<10}: {entry['prediction_model']:<16} 誤差 {low * 100:+.1f}% 〜 {high * 100:+.1f}%, "
+                  f"十分な組: {sufficient}")
+        print(f"\n✅ 予測を出力しました → {args.predictions} ({len(predictions_df)} 件)")
+        print(f"✅ バックテストを出力しました → {args.backtest}")
+        print(f"✅ コア数の計画を出力しました → {args.plan}")
+        print(f"   python make_data.py --filter \"{plan_result['filter']}\"")
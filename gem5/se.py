@@ -45,6 +45,7 @@
 import optparse
 import sys
 import os
+import json
 
 import m5
 from m5.defines import buildEnv
@@ -128,12 +129,40 @@ Options.addSEOptions(parser)
 if '--ruby' in sys.argv:
     Ruby.define_options(parser)
 
+# 統計を一定のシミュレーション時間ごとにダンプする (run_all.py の早期停止で使用)
+parser.add_option("--stats-period", type="float", default=None,
+                  help="Dump stats every N simulated seconds")
+
+# 関心領域 (ROI) だけを詳細CPUでシミュレーションする (run_all.py --roi で使用)
+# ROI の前は AtomicSimpleCPU で早送りし、ROI の開始で --cpu-type の CPU に切り替える
+parser.add_option("--roi", type="choice", choices=["work", "insts"], default=None,
+                  help="Simulate only the region of interest in detail: "
+                  "'work' = m5 work_begin/work_end, "
+                  "'insts' = --roi-start-insts/--roi-end-insts of cpu0")
+parser.add_option("--roi-start-insts", type="int", default=None,
+                  help="Instruction count of cpu0 where the ROI begins")
+parser.add_option("--roi-end-insts", type="int", default=None,
+                  help="Instruction count of cpu0 where the ROI ends")
+
 (options, args) = parser.parse_args()
 
 if args:
     print "Error: script doesn't take any positional arguments"
     sys.exit(1)
 
+if options.roi:
+    if options.stats_period:
+        fatal("--roi cannot be combined with --stats-period")
+    if options.fast_forward or options.checkpoint_restore != None:
+        fatal("--roi cannot be combined with --fast-forward or checkpoints")
+    if options.ruby:
+        fatal("--roi fast-forwards with the atomic cpu, which Ruby does not support")
+    if options.roi == "insts" and (options.roi_start_insts is None or
+                                   options.roi_end_insts is None or
+                                   options.roi_start_insts <= 0 or
+                                   options.roi_end_insts <= options.roi_start_insts):
+        fatal("--roi=insts needs 0 < --roi-start-insts < --roi-end-insts")
+
 multiprocesses = []
 numThreads = 1
 
@@ -166,7 +195,11 @@ else:
     sys.exit(1)
 
 
-(CPUClass, test_mem_mode, FutureClass) = Simulation.setCPUClass(options)
+if options.roi:
+    (FutureClass, _) = Simulation.getCPUClass(options.cpu_type)
+    (CPUClass, test_mem_mode) = (AtomicSimpleCPU, 'atomic')
+else:
+    (CPUClass, test_mem_mode, FutureClass) = Simulation.setCPUClass(options)
 CPUClass.numThreads = numThreads
 
 # Check -- do not allow SMT with multiple CPUs
@@ -284,4 +317,94 @@ else:
     MemConfig.config_mem(options, system)
 
 root = Root(full_system = False, system = system)
-Simulation.run(options, root, system, FutureClass)
+
+# periodicStatDump はインスタンス化の後でしか設定できないため、
+# Simulation.run の中で呼ばれる m5.instantiate を包んで設定する
+if options.stats_period:
+    _instantiate = m5.instantiate
+    def instantiate_with_periodic_dump(*args, **kwargs):
+        _instantiate(*args, **kwargs)
+        m5.stats.periodicStatDump(m5.ticks.fromSeconds(options.stats_period))
+    m5.instantiate = instantiate_with_periodic_dump
+
+# ===============================================================
+# ROI モード
+#
+# stats.txt には ROI の前 (早送り) と ROI の2つのブロックが並ぶ。
+# ROI の開始で前の区間をダンプしてリセットし、ROI の終わりで終了する
+# （ROI の統計は終了時にダンプされる）。ROI の位置は roi_info.json に書く。
+# ===============================================================
+ROI_INFO_FILE = "roi_info.json"
+ROI_BEGIN_CAUSE = "roi begin instruction count reached"
+ROI_END_CAUSE = "roi end instruction count reached"
+# m5 work_begin / work_end による終了の理由 (sim/pseudo_inst.cc)
+ROI_BEGIN_CAUSES = ("work started count reach", ROI_BEGIN_CAUSE)
+ROI_END_CAUSES = ("work items exit count reached", ROI_END_CAUSE)
+ROI_STATS_DUMP = 1
+
+def write_roi_info(info):
+    with open(os.path.join(m5.options.outdir, ROI_INFO_FILE), "w") as f:
+        json.dump(info, f)
+
+def simulate_until(causes):
+    # ROI の中の2回目以降の work_begin など、もう一方の境界で止まった場合は続ける
+    while True:
+        exit_event = m5.simulate()
+        cause = exit_event.getCause()
+        if cause in causes or cause not in ROI_BEGIN_CAUSES + ROI_END_CAUSES:
+            return exit_event
+
+def run_roi(options, root, system, FutureClass):
+    switch_cpus = [FutureClass(switched_out=True, cpu_id=i) for i in xrange(np)]
+    for i in xrange(np):
+        switch_cpus[i].system = system
+        switch_cpus[i].workload = system.cpu[i].workload
+        switch_cpus[i].clk_domain = system.cpu[i].clk_domain
+        switch_cpus[i].progress_interval = system.cpu[i].progress_interval
+        switch_cpus[i].createThreads()
+    system.switch_cpus = switch_cpus
+    switch_cpu_list = [(system.cpu[i], switch_cpus[i]) for i in xrange(np)]
+
+    if options.roi == "work":
+        system.work_begin_exit_count = 1
+        system.work_end_exit_count = 1
+
+    m5.instantiate()
+
+    info = {'mode': options.roi, 'stats_dump': ROI_STATS_DUMP,
+            'roi_begin_tick': None, 'roi_end_tick': None, 'complete': False}
+    if options.roi == "insts":
+        info['roi_start_insts'] = options.roi_start_insts
+        info['roi_end_insts'] = options.roi_end_insts
+        system.cpu[0].scheduleInstStop(0, options.roi_start_insts, ROI_BEGIN_CAUSE)
+
+    print "**** FAST-FORWARD TO ROI (%s) ****" % options.roi
+    exit_event = simulate_until(ROI_BEGIN_CAUSES)
+    if exit_event.getCause() not in ROI_BEGIN_CAUSES:
+        info['end_cause'] = exit_event.getCause()
+        write_roi_info(info)
+        fatal("ROI was not reached @ tick %i because %s" %
+              (m5.curTick(), exit_event.getCause()))
+
+    info['roi_begin_tick'] = m5.curTick()
+    print "ROI begins @ tick %i because %s" % (m5.curTick(), exit_event.getCause())
+    m5.stats.dump()
+    m5.switchCpus(system, switch_cpu_list)
+    m5.stats.reset()
+    write_roi_info(info)
+    if options.roi == "insts":
+        switch_cpus[0].scheduleInstStop(
+            0, options.roi_end_insts - options.roi_start_insts, ROI_END_CAUSE)
+
+    print "**** REAL SIMULATION (ROI) ****"
+    exit_event = simulate_until(ROI_END_CAUSES)
+    info['roi_end_tick'] = m5.curTick()
+    info['complete'] = exit_event.getCause() in ROI_END_CAUSES
+    info['end_cause'] = exit_event.getCause()
+    write_roi_info(info)
+    print 'Exiting @ tick %i because %s' % (m5.curTick(), exit_event.getCause())
+
+if options.roi:
+    run_roi(options, root, system, FutureClass)
+else:
+    Simulation.run(options, root, system, FutureClass)
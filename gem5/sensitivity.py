@@ -0,0 +1,242 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+import sweep_trace
+from make_data import FILTER_VARIABLES, compile_filter, passes
+
+# ===============================================================
+# パラメータの感度分析と掃引の縮小 (Parameter sensitivity analysis)
+#
+# simulation_summary.csv の log(sim_ticks) の分散を、ベンチマークごとに各次元へ割り振る。
+#   一次 (ANOVA の eta^2 = Sobol の一次指数):
+#       S_i  = Var(E[Y | X_i]) / Var(Y)       その次元の水準ごとの平均のばらつき
+#   全効果 (Sobol の総合指数):
+#       S_Ti = E[Var(Y | X_~i)] / Var(Y)      他の次元をすべて固定したときに残るばらつき
+# BCE で絞った掃引は水準の組がそろっていないので、他の次元の組が1行しかないセル（ばらつきが
+# 必ず 0）は S_Ti の分子・分母の両方から除く。使った行数は 'Total Order Rows' に出力する。
+# 離散的な水準の結果そのものから求める（代理モデルは使わない）。S_Ti は交互作用を含む。
+# 全ベンチマークの groupby を一度に行うので、結果の行数に比例する時間で済む。
+#
+# CPU クロックは L1 の構成から、L2 レイテンシは L2 の構成とクロックから CACTI で決まるので
+# 掃引の次元ではない。S_Ti の条件（他の次元の固定）には掃引する次元だけを使い
+# （派生する列で条件付けると、L2 の構成の効果がレイテンシに吸われて小さく見える）、
+# 派生する列は一次の指数だけを別に表示する。縮小はしない。
+#
+# 掃引する次元のうち、全ベンチマークで S_Ti が DROP_THRESHOLD 未満のものは1水準（平均的に
+# 最も速い水準。BCE に入る次元は最小の水準）に固定し、COARSEN_THRESHOLD 未満のものは
+# 1つおきの水準（最小・最大・固定候補は残す）に粗くする。
+# 結果を make_data.py --filter の条件式と JSON で出力する。
+# ===============================================================
+SUMMARY_CSV = "./result/simulation_summary.csv"
+PARAMETERS_CSV = "./data.csv"
+SENSITIVITY_CSV = "./result/sensitivity_indices.csv"
+SENSITIVITY_PLAN_JSON = "./result/sensitivity_plan.json"
+
+# (make_data.py の変数名, 列名, 掃引する次元か)
+DIMENSIONS = [
+    ('core', 'Core Number', True),
+    ('clock', 'CPU clock (GHz)', False),
+    ('l1_size', 'L1 Cache Size (KB)', True),
+    ('l1_assoc', 'L1 Associativity', True),
+    ('l2_size', 'L2 Cache Size (KB)', True),
+    ('l2_assoc', 'L2 Associativity', True),
+    ('l2_latency', 'L2 latency (cycles)', False),
+]
+DROP_THRESHOLD = 0.01
+COARSEN_THRESHOLD = 0.05
+# BCE に入る次元。最速の水準（大きい方）に固定すると BCE < 128 を満たす構成が無くなる
+# コア数・L1 の組があるので、最小の水準に固定する
+BCE_DIMENSIONS = ('core', 'l1_size', 'l2_size')
+
+
+def available_dimensions(df):
+    # 集計CSVの 'CPU clock (GHz)' は gem5 のシステムクロックで、構成ごとに変わらないことがある
+    return [(name, column, swept) for name, column, swept in DIMENSIONS
+            if column in df.columns and df[column].nunique() > 1]
+
+
+def sensitivity_indices(summary, dimensions=None):
+    df = summary[summary['sim_ticks'] > 0].copy()
+    dimensions = dimensions or available_dimensions(df)
+    df['log_ticks'] = np.log(df['sim_ticks'].to_numpy(dtype=float))
+    y = df['log_ticks']
+    bench = df['Benchmark']
+    centered = y - y.groupby(bench).transform('mean')
+    total_ss = (centered ** 2).groupby(bench).sum()
+
+    swept_columns = [column for _, column, swept in dimensions if swept]
+    rows_per_bench = bench.value_counts()
+    rows = []
+    for name, column, swept in dimensions:
+        level_mean = y.groupby([bench, df[column]]).transform('mean')
+        between = ((level_mean - y.groupby(bench).transform('mean')) ** 2).groupby(bench).sum()
+        if swept:
+            # 他の次元の組で1行しかないセルはばらつきが 0 になり S_Ti を小さく見せるので、
+            # 2行以上のセルの行だけで分子・分母を求める
+            others = [bench] + [df[c] for c in swept_columns if c != column]
+            used = y.groupby(others).transform('size') >= 2
+            y_used, bench_used = y[used], bench[used]
+            within = ((y_used - y_used.groupby([g[used] for g in others]).transform('mean')) ** 2).groupby(bench_used).sum()
+            within_total = ((y_used - y_used.groupby(bench_used).transform('mean')) ** 2).groupby(bench_used).sum()
+            total_order = (within / within_total.where(within_total > 0)).reindex(total_ss.index)
+            used_rows = used.groupby(bench).sum()
+        else:
+            total_order = pd.Series(np.nan, index=total_ss.index)
+            used_rows = pd.Series(0, index=total_ss.index)
+        levels = df.groupby('Benchmark')[column].nunique()
+        for b in total_ss.index:
+            rows.append({
+                'Benchmark': b,
+                'Dimension': name,
+                'Column': column,
+                'Swept': swept,
+                'Levels': int(levels[b]),
+                'First Order (eta^2)': between[b] / total_ss[b] if total_ss[b] > 0 else np.nan,
+                'Total Order': total_order[b],
+                'Total Order Rows': int(used_rows[b]),
+                'Rows': int(rows_per_bench[b]),
+            })
+    indices = pd.DataFrame(rows)
+    if len(indices):
+        # 順位は掃引する次元の中で付ける（派生する列は NaN で最後）
+        indices['Rank'] = indices.groupby('Benchmark')['Total Order'].rank(ascending=False, method='min').astype('Int64')
+        indices = indices.sort_values(['Benchmark', 'Swept', 'Rank'], ascending=[True, False, True]).reset_index(drop=True)
+    return indices
+
+
+def best_level(summary, column):
+    # ベンチマークごとの最小値で正規化した log(sim_ticks) の平均が最も小さい水準
+    df = summary[summary['sim_ticks'] > 0]
+    log_ticks = np.log(df['sim_ticks'].to_numpy(dtype=float))
+    normalized = pd.Series(log_ticks, index=df.index) - df.groupby('Benchmark')['sim_ticks'].transform(
+        lambda s: np.log(s.min()))
+    level = normalized.groupby(df[column]).mean().idxmin()
+    return level.item() if hasattr(level, 'item') else level
+
+
+def fixed_level(summary, name, column, levels):
+    return levels[0] if name in BCE_DIMENSIONS else best_level(summary, column)
+
+
+def coarsen_levels(levels, keep):
+    # 1つおきの水準に、最小・最大と keep を加える
+    levels = sorted(levels)
+    kept = set(levels[::2]) | {levels[0], levels[-1], keep}
+    return sorted(kept)
+
+
+def _format_level(value):
+    return str(int(value)) if float(value) == int(value) else str(value)
+
+
+def reduced_grid(summary, indices, drop_threshold=DROP_THRESHOLD, coarsen_threshold=COARSEN_THRESHOLD):
+    # 全ベンチマークでの S_Ti の最大値で判断する（どれか1つでも効く次元は残す）
+    impact = indices.groupby('Dimension', sort=False).agg(
+        column=('Column', 'first'), swept=('Swept', 'first'),
+        max_total=('Total Order', 'max'), mean_total=('Total Order', 'mean'),
+        max_first=('First Order (eta^2)', 'max'))
+    dimensions = {}
+    clauses = []
+    for name, row in impact.iterrows():
+        levels = sorted(v.item() if hasattr(v, 'item') else v for v in summary[row['column']].dropna().unique())
+        entry = {
+            'column': row['column'],
+            'max_total_order': None if pd.isna(row['max_total']) else float(row['max_total']),
+            'mean_total_order': None if pd.isna(row['mean_total']) else float(row['mean_total']),
+            'max_first_order': float(row['max_first']),
+            'levels': levels,
+        }
+        if not row['swept']:
+            entry['action'] = 'derived'
+        elif row['max_total'] < drop_threshold:
+            entry['action'] = 'drop'
+            entry['kept_levels'] = [fixed_level(summary, name, row['column'], levels)]
+        elif row['max_total'] < coarsen_threshold and len(levels) > 2:
+            entry['action'] = 'coarsen'
+            entry['kept_levels'] = coarsen_levels(levels, fixed_level(summary, name, row['column'], levels))
+        else:
+            entry['action'] = 'keep'
+        # 観測していない水準は判断できないので残す（除く水準を not in で書く）
+        removed = [v for v in levels if v not in entry.get('kept_levels', levels)]
+        if removed:
+            entry['removed_levels'] = removed
+            clauses.append(f"{name} not in ({', '.join(_format_level(v) for v in removed)},)")
+        dimensions[name] = entry
+    return {
+        'drop_threshold': drop_threshold,
+        'coarsen_threshold': coarsen_threshold,
+        'filter': " and ".join(clauses) or None,
+        'dimensions': dimensions,
+    }
+
+
+def count_remaining(params, filter_expr):
+    # data.csv の行のうち条件式を満たす数（make_data.py --from-csv と同じ判定）
+    filters = compile_filter(filter_expr)
+    codes = [code for level_codes in filters.values() for code in level_codes]
+    columns = {var: params[col].to_numpy() for var, col in FILTER_VARIABLES.items() if col in params.columns}
+    return sum(passes(codes, {var: values[i] for var, values in columns.items()}) for i in range(len(params)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="各パラメータの sim_ticks への寄与を求め、縮小した掃引の条件を出力する")
+    parser.add_argument("summary_csv", nargs="?", default=SUMMARY_CSV)
+    parser.add_argument("--params", default=PARAMETERS_CSV, help="削減量の見積もりに使う実行条件のCSV")
+    parser.add_argument("--drop-threshold", type=float, default=DROP_THRESHOLD)
+    parser.add_argument("--coarsen-threshold", type=float, default=COARSEN_THRESHOLD)
+    parser.add_argument("--output", default=SENSITIVITY_CSV)
+    parser.add_argument("--plan", default=SENSITIVITY_PLAN_JSON)
+    args = parser.parse_args()
+
+    with sweep_trace.stage("sensitivity"):
+        summary_df = pd.read_csv(args.summary_csv)
+        indices_df = sensitivity_indices(summary_df)
+        if indices_df.empty:
+            print("❌ 分析できる結果がありません。")
+            raise SystemExit(1)
+        indices_df.to_csv(args.output, index=False)
+        plan_result = reduced_grid(summary_df, indices_df, args.drop_threshold, args.coarsen_threshold)
+        if plan_result['filter'] and os.path.exists(args.params):
+            params_df = pd.read_csv(args.params)
+            plan_result['runs_before'] = len(params_df)
+            plan_result['runs_after'] = int(count_remaining(params_df, plan_result['filter']))
+        with open(args.plan, "w") as f:
+            json.dump(plan_result, f, indent=2, default=float)
+
+        print("📊 log(sim_ticks) の分散に占める割合（全効果 S_Ti、ベンチマーク x 掃引する次元）:")
+        swept_df = indices_df[indices_df['Swept']]
+        table = swept_df.pivot(index='Dimension', columns='Benchmark', values='Total Order')
+        table = table.loc[table.max(axis=1).sort_values(ascending=False).index]
+        print(table.to_string(float_format=lambda v: f"{v:.3f}"))
+        print("\n📊 S_Ti に使った行数（他の次元の組が2行以上あるセルの行 / 全行）:")
+        used_table = swept_df.assign(Used=swept_df['Total Order Rows'].astype(str) + "/" + swept_df['Rows'].astype(str))
+        print(used_table.pivot(index='Dimension', columns='Benchmark', values='Used').loc[table.index].to_string())
+        derived_df = indices_df[~indices_df['Swept']]
+        if len(derived_df):
+            print("\n📊 派生する列（CACTI から決まる値）の一次の指数 eta^2:")
+            print(derived_df.pivot(index='Dimension', columns='Benchmark', values='First Order (eta^2)')
+                  .to_string(float_format=lambda v: f"{v:.3f}"))
+        print("\n推奨:")
+        for name, entry in plan_result['dimensions'].items():
+            if entry['action'] == 'derived':
+                print(f"  {name:<10}: 最大 eta^2 {entry['max_first_order']:.3f}  CACTI から決まる値（縮小しない）")
+                continue
+            detail = {
+                'keep': "全水準を残す",
+                'coarsen': f"粗くする → {entry.get('kept_levels')}",
+                'drop': f"固定する → {entry.get('kept_levels')}",
+            }[entry['action']]
+            if entry['max_total_order'] is None:
+                print(f"  {name:<10}: S_Ti を求められる行がありません  {detail}")
+                continue
+            print(f"  {name:<10}: 最大 S_Ti {entry['max_total_order']:.3f}  {detail}")
+        print(f"\n✅ 感度指数を出力しました → {args.output}")
+        print(f"✅ 縮小した掃引の条件を出力しました → {args.plan}")
+        if plan_result['filter']:
+            if 'runs_after' in plan_result:
+                print(f"   {args.params}: {plan_result['runs_before']} 構成 → {plan_result['runs_after']} 構成")
+            print(f"   python make_data.py --filter \"{plan_result['filter']}\"")
+        else:
+            print("   縮小できる次元はありませんでした。")
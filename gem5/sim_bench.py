@@ -1,5 +1,12 @@
 import pandas as pd
 import os
+import csv
+import heapq
+import shutil
+import argparse
+import tempfile
+import sweep_trace
+from ranking import select_benchmarks, filter_bce
 
 # ===============================================================
 # パラメータ設定 (Parameter Settings)
@@ -7,24 +14,66 @@ import os
 INPUT_CSV_PATH = "./result/simulation_summary.csv"  # 既に集計されたCSVファイルのパス
 OUTPUT_SUMMARY_BASE_DIR = "./result/simulation_summaries_by_benchmark"  # 出力先ディレクトリ
 BENCHMARK_STATS_PATH = "./result/benchmark_stats_summary.csv"  # 統計出力ファイル
+STATS_EXCLUDE_BENCHMARKS = ("fft",)  # 統計サマリから除外するベンチマーク
+
+# 入力は CHUNK_ROWS 行ずつ読み、1回の走査で分割と統計を同時に求める。
+# 分割ファイルはチャンクごとに sim_ticks で並べた一時ファイル（ラン）を作り、
+# 最後にベンチマークごとにマージする（メモリに載るのは1チャンク分だけ）。
+CHUNK_ROWS = 1_000_000
+MAX_OPEN_RUNS = 64  # 一度にマージするランの数（開くファイル数の上限）
+
+# 出力列の順序（BCEは残す、Benchmarkは出力から除く。Config Key は入力にあれば残す）
+ORDERED_COLUMNS = [
+    'Core Number', 'L1 Cache Size (KB)', 'L1 Associativity',
+    'L2 Cache Size (KB)', 'L2 Associativity', 'L2 latency (cycles)', 'Config Key',
+    'sim_ticks', 'BCE'
+]
+
+# ===============================================================
+# オンライン統計 (Streaming count / mean / std / min)
+# ===============================================================
+class RunningStats:
+    # Welford の方法をチャンク単位に拡張したもの（Chan らの並列版の合成式）
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float('inf')
+
+    def update(self, values):
+        # pandas の agg と同じく欠損値は数えない。最小値は元の型のまま保持する
+        values = values.dropna()
+        n = len(values)
+        if n == 0:
+            return
+        self.min = min(self.min, values.min())
+        values = values.astype(float)
+        chunk_mean = values.mean()
+        chunk_m2 = ((values - chunk_mean) ** 2).sum()
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += chunk_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+    def std(self):
+        # pandas の std と同じ不偏標準偏差
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else float('nan')
 
 # ===============================================================
 # ベンチマーク統計出力 (Benchmark Statistics Summary)
 # ===============================================================
-def summarize_benchmark_stats(df):
+def summarize_benchmark_stats(running_stats):
     # FFT を除外（大小文字無視）
-    df = df[~df['Benchmark'].str.lower().str.contains('fft')]
+    names = pd.DataFrame({'Benchmark': sorted(running_stats)})
+    names = select_benchmarks(names, exclude=STATS_EXCLUDE_BENCHMARKS)['Benchmark']
 
     # 統計量の計算
-    stats = (
-        df.groupby('Benchmark')['sim_ticks']
-        .agg(['count', 'mean', 'std', 'min'])
-        .rename(columns={
-            'count': '試行数',
-            'mean': '平均(sim_ticks)',
-            'std': '標準偏差(sim_ticks)',
-            'min': '最小(sim_ticks)'
-        })
+    stats = pd.DataFrame(
+        [[running_stats[b].count, running_stats[b].mean, running_stats[b].std(), running_stats[b].min]
+         for b in names],
+        index=pd.Index(names, name='Benchmark'),
+        columns=['試行数', '平均(sim_ticks)', '標準偏差(sim_ticks)', '最小(sim_ticks)']
     )
     stats['変動係数(CV)'] = stats['標準偏差(sim_ticks)'] / stats['平均(sim_ticks)']
 
@@ -36,10 +85,41 @@ def summarize_benchmark_stats(df):
     stats.to_csv(BENCHMARK_STATS_PATH)
     print(f"\n📄 統計サマリを出力しました → {BENCHMARK_STATS_PATH}")
 
+# ===============================================================
+# ランのマージ (External merge of sorted runs)
+# ===============================================================
+def _read_run(path, key_index):
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            # sim_ticks の無い行は pandas の sort_values と同じく最後に置く
+            yield float(row[key_index]) if row[key_index] else float('inf'), row
+
+def merge_runs(run_paths, output_path, header, key_index, work_dir):
+    # sim_ticks 順に並んだランを heapq.merge でまとめる。
+    # 同じ sim_ticks の行は入力の順序を保つ（ランは入力順に並べてある）
+    level = 0
+    while len(run_paths) > MAX_OPEN_RUNS:
+        merged = []
+        for i in range(0, len(run_paths), MAX_OPEN_RUNS):
+            path = os.path.join(work_dir, f"merge{level}_{i}.csv")
+            _write_merged(run_paths[i:i + MAX_OPEN_RUNS], path, None, key_index)
+            merged.append(path)
+        run_paths = merged
+        level += 1
+    _write_merged(run_paths, output_path, header, key_index)
+
+def _write_merged(run_paths, output_path, header, key_index):
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        if header:
+            writer.writerow(header)
+        for _, row in heapq.merge(*[_read_run(p, key_index) for p in run_paths], key=lambda item: item[0]):
+            writer.writerow(row)
+
 # ===============================================================
 # メインの処理 (Main Processing Logic)
 # ===============================================================
-def split_summary_by_benchmark():
+def split_summary_by_benchmark(chunk_rows=CHUNK_ROWS):
     if not os.path.exists(INPUT_CSV_PATH):
         print(f"❌ 入力ファイルが見つかりません: {INPUT_CSV_PATH}")
         return
@@ -48,44 +128,58 @@ def split_summary_by_benchmark():
     print(f"出力ディレクトリ: {OUTPUT_SUMMARY_BASE_DIR}")
 
     try:
-        df = pd.read_csv(INPUT_CSV_PATH)
+        header = pd.read_csv(INPUT_CSV_PATH, nrows=0).columns
     except Exception as e:
         print(f"❌ CSVの読み込み中にエラーが発生しました: {e}")
         return
 
-    if 'BCE' not in df.columns:
+    if 'BCE' not in header:
         print("❌ 'BCE' 列が存在しません。フィルタ処理を実行できません。")
         return
-    df = df[df['BCE'] < 128]
 
-    if 'Benchmark' not in df.columns:
+    if 'Benchmark' not in header:
         print("❌ 'Benchmark' 列が存在しません。分割できません。")
         return
 
-    for bench_name, group_df in df.groupby('Benchmark'):
-        output_csv_path = os.path.join(OUTPUT_SUMMARY_BASE_DIR, f"{bench_name}_summary.csv")
-
-        # 出力列の順序（BCEは残す、Benchmarkは出力から除く）
-        ordered_columns = [
-            'Core Number', 'L1 Cache Size (KB)', 'L1 Associativity',
-            'L2 Cache Size (KB)', 'L2 Associativity', 'L2 latency (cycles)',
-            'sim_ticks', 'BCE'
-        ]
-        final_columns = [col for col in ordered_columns if col in group_df.columns]
-
-        # 列の並び替え + sim_ticksでソート
-        group_df = group_df[final_columns]
-        group_df = group_df.sort_values(by='sim_ticks', ascending=True).reset_index(drop=True)
-
-        # CSV出力
-        group_df.to_csv(output_csv_path, index=False)
-        print(f"✅ {bench_name}: {len(group_df)} 件 → {output_csv_path}")
+    final_columns = [col for col in ORDERED_COLUMNS if col in header]
+    key_index = final_columns.index('sim_ticks')
+    running_stats = {}
+    runs = {}
+    run_count = 0
+    work_dir = tempfile.mkdtemp(prefix="sim_bench_", dir=OUTPUT_SUMMARY_BASE_DIR)
+    try:
+        with sweep_trace.span("split", rows=0) as span_args:
+            for chunk in pd.read_csv(INPUT_CSV_PATH, chunksize=chunk_rows):
+                chunk = filter_bce(chunk)
+                span_args['rows'] += len(chunk)
+                for bench_name, group_df in chunk.groupby('Benchmark'):
+                    running_stats.setdefault(bench_name, RunningStats()).update(group_df['sim_ticks'])
+
+                    # 列の並び替え + sim_ticksでソートしたランを書き出す
+                    group_df = group_df[final_columns].sort_values(by='sim_ticks', kind='stable')
+                    run_path = os.path.join(work_dir, f"run{run_count}.csv")
+                    run_count += 1
+                    group_df.to_csv(run_path, index=False, header=False)
+                    runs.setdefault(bench_name, []).append(run_path)
+
+        with sweep_trace.span("merge", benchmarks=len(runs)):
+            for bench_name in sorted(runs):
+                output_csv_path = os.path.join(OUTPUT_SUMMARY_BASE_DIR, f"{bench_name}_summary.csv")
+                merge_runs(runs[bench_name], output_csv_path, final_columns, key_index, work_dir)
+                print(f"✅ {bench_name}: {running_stats[bench_name].count} 件 → {output_csv_path}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
     # FFTを除いた統計サマリの出力
-    summarize_benchmark_stats(df)
+    summarize_benchmark_stats(running_stats)
 
     print("\n🎉 全処理が完了しました。")
 
 # スクリプト実行
 if __name__ == "__main__":
-    split_summary_by_benchmark()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="集計結果をベンチマークごとに分割し、統計サマリを出力する")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="一度に読み込む行数")
+    args = parser.parse_args()
+
+    with sweep_trace.stage("sim_bench"):
+        split_summary_by_benchmark(args.chunk_rows)
@@ -1,35 +1,208 @@
 import pandas as pd
 import os
 import re
+import json
+import result_db
+import sweep_trace
+from config_key import load_run_config
+from dedup import DEDUP_SOURCE_FILE  # 等価な構成から複製した結果の目印
 
 # ===============================================================
 # パラメータ設定
 # ===============================================================
 BASE_RESULTS_DIR = "./results_simulations"
-OUTPUT_SUMMARY_CSV = "./simulation_summary.csv"
+OUTPUT_SUMMARY_CSV = "./result/simulation_summary.csv"  # sim_bench.py / result.py の入力
+RESULTS_DB_PATH = result_db.DB_PATH  # None の場合はDBに登録しない
+CONVERGENCE_FILE = "convergence.json"  # 収束による早期停止で外挿した結果 (convergence.py が出力)
+ROI_INFO_FILE = "roi_info.json"  # ROI だけをシミュレーションした実行 (se.py --roi が出力)
+RUN_HISTORY_CSV = "./result/run_history.csv"  # 各実行のホスト名 (parallel_runner.py が記録)
+
+# シミュレータ自身の速さ (host_perf.py が集計する)
+HOST_STATS = [
+    ('host_seconds', 'host_seconds'),
+    ('host_inst_rate', 'host_inst_rate'),
+    ('host_mem_usage', 'host_mem_usage'),
+]
 
 # ===============================================================
 # stats.txt から情報を抽出する関数
+#
+# 周期的なダンプ (--stats-period) を有効にすると stats.txt には
+# "Begin/End Simulation Statistics" のブロックが複数並ぶ。
+# extract_stats() は従来どおり最後の値を返し、区間ごとの値は
+# extract_stats_dumps() / extract_stats_intervals() で取り出す。
+#
+# ROI モード (se.py --roi) の stats.txt には ROI の前（早送り）と ROI の
+# ブロックが並ぶ。集計には roi_info.json が示す ROI のブロックだけを使い、
+# ROI 列に ROI モードを入れる（プログラム全体の実行は result_db.ROI_NONE）。
 # ===============================================================
-def extract_stats(stats_file_path):
-    stats = {}
+STATS_BEGIN_MARKER = "Begin Simulation Statistics"
+STATS_END_MARKER = "End Simulation Statistics"
+
+
+def parse_stats_line(line):
+    match = re.match(r'\s*(\S+)\s+(\S+)\s+#\s*(.*)', line)
+    if not match:
+        return None, None
+    key = match.group(1).strip()
+    value = match.group(2).strip()
+    try:
+        return key, float(value) if '.' in value else int(value)
+    except ValueError:
+        return key, value
+
+
+def parse_stats_blocks(lines):
+    # ダンプごとの dict のリスト（最後のブロックが閉じていなくても含める）
+    dumps = []
+    current = None
+    for line in lines:
+        if STATS_BEGIN_MARKER in line:
+            current = {}
+            dumps.append(current)
+            continue
+        if STATS_END_MARKER in line:
+            current = None
+            continue
+        key, value = parse_stats_line(line)
+        if key is None:
+            continue
+        if current is None:
+            # マーカーのない古い形式
+            current = {}
+            dumps.append(current)
+        current[key] = value
+    return dumps
+
+
+def extract_stats_dumps(stats_file_path):
     try:
         with open(stats_file_path, 'r') as f:
-            for line in f:
-                match = re.match(r'\s*(\S+)\s+(\S+)\s+#\s*(.*)', line)
-                if match:
-                    key = match.group(1).strip()
-                    value = match.group(2).strip()
-                    try:
-                        stats[key] = float(value) if '.' in value else int(value)
-                    except ValueError:
-                        stats[key] = value
+            return parse_stats_blocks(f)
     except FileNotFoundError:
         print(f"警告: stats.txt が見つかりません: {stats_file_path}")
     except Exception as e:
         print(f"stats.txt の読み込み中にエラーが発生しました ({stats_file_path}): {e}")
+    return []
+
+
+def extract_stats(stats_file_path):
+    stats = {}
+    for dump in extract_stats_dumps(stats_file_path):
+        stats.update(dump)
     return stats
 
+
+def load_roi_info(full_dir_path):
+    path = os.path.join(full_dir_path, ROI_INFO_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def extract_roi_stats(stats_file_path, roi_info):
+    # ROI のブロックの値（ROI の開始でリセットされているので ROI だけの値）
+    dumps = extract_stats_dumps(stats_file_path)
+    index = roi_info.get('stats_dump', 1)
+    return dumps[index] if len(dumps) > index else {}
+
+
+def extract_stats_intervals(stats_file_path, keys=None):
+    # {統計名: [ダンプごとの値]}。そのダンプに無い統計は None
+    dumps = extract_stats_dumps(stats_file_path)
+    if keys is None:
+        keys = sorted({key for dump in dumps for key in dump})
+    return {key: [dump.get(key) for dump in dumps] for key in keys}
+
+# ===============================================================
+# 1つの結果ディレクトリから集計行を作る関数
+# ===============================================================
+def collect_result_row(dir_name, full_dir_path):
+    # run_all.py が書いた config.json を読む（無い古い実行はディレクトリ名から）
+    try:
+        run_config = load_run_config(dir_name, full_dir_path)
+    except (ValueError, KeyError) as e:
+        print(f"パラメータ変換時にエラー: {dir_name}, {e}")
+        return None
+    if run_config is None:
+        print(f"警告: 不明なディレクトリ形式をスキップします: {dir_name}")
+        return None
+    config, bench = run_config
+    params = config.to_row()
+    params['L2 latency (cycles)'] = float(params['L2 latency (cycles)'])  # 既存の集計CSVと同じ型
+    params['Benchmark'] = bench
+
+    stats_file_path = os.path.join(full_dir_path, "stats.txt")
+    roi_info = load_roi_info(full_dir_path)
+    if roi_info is not None:
+        if roi_info.get('roi_begin_tick') is None:
+            print(f"警告: ROI に到達しなかった実行をスキップします: {dir_name}")
+            return None
+        extracted_stats = extract_roi_stats(stats_file_path, roi_info)
+    else:
+        extracted_stats = extract_stats(stats_file_path)
+
+    if not extracted_stats:
+        return None
+
+    # 早期停止した実行は、途中までの統計ではなく外挿した値を使う
+    convergence_path = os.path.join(full_dir_path, CONVERGENCE_FILE)
+    extrapolated = False
+    if os.path.exists(convergence_path):
+        with open(convergence_path, 'r') as f:
+            extrapolated_stats = json.load(f).get('extrapolated')
+        if extrapolated_stats:
+            extracted_stats.update(extrapolated_stats)
+            extrapolated = True
+
+    row = {
+        'Core Number': params['Core Number'],
+        'L1 Cache Size (KB)': params['L1 Cache Size (KB)'],
+        'L1 Associativity': params['L1 Associativity'],
+        'L2 Cache Size (KB)': params['L2 Cache Size (KB)'],
+        'L2 Associativity': params['L2 Associativity'],
+        'L2 latency (cycles)': params['L2 latency (cycles)'],
+        'Benchmark': params['Benchmark'],
+        'Config Key': config.key,
+        'sim_ticks': extracted_stats.get('sim_ticks'),
+        'sim_seconds (s)': extracted_stats.get('sim_seconds'),
+        'sim_insts': extracted_stats.get('sim_insts'),
+        'L2_overall_accesses': extracted_stats.get('system.l2.overall_accesses::total'),
+        'L2_overall_misses': extracted_stats.get('system.l2.overall_misses::total'),
+        'L2_demand_miss_rate': extracted_stats.get('system.l2.demand_miss_rate::total'),
+        # 総BCEコスト (make_data.py と同じ式: コア数 + L1_BCE + L2_BCE)
+        'BCE': int(
+            params['Core Number']
+            + params['Core Number'] * params['L1 Cache Size (KB)'] / 2
+            + params['L2 Cache Size (KB)'] / 32
+        ),
+        'CPU clock (GHz)': (
+            (extracted_stats.get('sim_freq') / extracted_stats.get('system.clk_domain.clock', 1)) / 1e9
+            if extracted_stats.get('sim_freq') and extracted_stats.get('system.clk_domain.clock') else None
+        )
+    }
+    if extrapolated:
+        row['Extrapolated'] = True
+    # ROI モード。プログラム全体の結果と区別して結果DBの別の行にする
+    row['ROI'] = roi_info.get('mode', 'work') if roi_info is not None else result_db.ROI_NONE
+    # 複製された結果のホスト統計は代表の実行と同じものなので数えない
+    if not os.path.exists(os.path.join(full_dir_path, DEDUP_SOURCE_FILE)):
+        for column, stat_name in HOST_STATS:
+            row[column] = extracted_stats.get(stat_name)
+    return row
+
+
+def load_run_hosts(history_csv=RUN_HISTORY_CSV):
+    # {結果ディレクトリ名: ホスト名}（同じディレクトリを再実行した場合は最後の記録）
+    if not os.path.exists(history_csv):
+        return {}
+    history = pd.read_csv(history_csv, usecols=lambda c: c in ('host', 'out_dir'))
+    if 'host' not in history.columns or 'out_dir' not in history.columns:
+        return {}
+    history = history.dropna(subset=['out_dir'])
+    return dict(zip(history['out_dir'].map(lambda p: os.path.basename(os.path.normpath(p))), history['host']))
+
 # ===============================================================
 # メインの集計ロジック
 # ===============================================================
@@ -41,76 +214,54 @@ def collect_simulation_results():
         print("まずシミュレーションを実行して結果を生成してください。")
         return
 
-    for dir_name in os.listdir(BASE_RESULTS_DIR):
-        full_dir_path = os.path.join(BASE_RESULTS_DIR, dir_name)
-
-        if os.path.isdir(full_dir_path):
-            # 修正済みの正規表現（小数もOK）
-            match = re.match(
-                r'core([\d.]+)_L1-([\d.]+)KB-A([\d.]+)_L2-([\d.]+)KB-A([\d.]+)_Lat([\d.]+)_Bench-(\w+)',
-                dir_name
-            )
-            if match:
-                try:
-                    params = {
-                        'Core Number': int(float(match.group(1))),
-                        'L1 Cache Size (KB)': int(float(match.group(2))),
-                        'L1 Associativity': int(float(match.group(3))),
-                        'L2 Cache Size (KB)': int(float(match.group(4))),
-                        'L2 Associativity': int(float(match.group(5))),
-                        'L2 latency (cycles)': float(match.group(6)),
-                        'Benchmark': match.group(7)
-                    }
-                except Exception as e:
-                    print(f"パラメータ変換時にエラー: {dir_name}, {e}")
-                    continue
-            else:
-                print(f"警告: 不明なディレクトリ形式をスキップします: {dir_name}")
-                continue
-
-            stats_file_path = os.path.join(full_dir_path, "stats.txt")
-            extracted_stats = extract_stats(stats_file_path)
-
-            if extracted_stats:
-                result_row = {
-                    'Core Number': params['Core Number'],
-                    'L1 Cache Size (KB)': params['L1 Cache Size (KB)'],
-                    'L1 Associativity': params['L1 Associativity'],
-                    'L2 Cache Size (KB)': params['L2 Cache Size (KB)'],
-                    'L2 Associativity': params['L2 Associativity'],
-                    'L2 latency (cycles)': params['L2 latency (cycles)'],
-                    'Benchmark': params['Benchmark'],
-                    'sim_ticks': extracted_stats.get('sim_ticks'),
-                    'sim_seconds (s)': extracted_stats.get('sim_seconds'),
-                    'sim_insts': extracted_stats.get('sim_insts'),
-                    'L2_overall_accesses': extracted_stats.get('system.l2.overall_accesses::total'),
-                    'L2_overall_misses': extracted_stats.get('system.l2.overall_misses::total'),
-                    'L2_demand_miss_rate': extracted_stats.get('system.l2.demand_miss_rate::total'),
-                    'CPU clock (GHz)': (
-                        (extracted_stats.get('sim_freq') / extracted_stats.get('system.clk_domain.clock', 1)) / 1e9
-                        if extracted_stats.get('sim_freq') and extracted_stats.get('system.clk_domain.clock') else None
-                    )
-                }
-                all_results.append(result_row)
+    run_hosts = load_run_hosts()
+    with sweep_trace.span("parse stats.txt") as span_args:
+        for dir_name in os.listdir(BASE_RESULTS_DIR):
+            full_dir_path = os.path.join(BASE_RESULTS_DIR, dir_name)
+
+            if os.path.isdir(full_dir_path):
+                result_row = collect_result_row(dir_name, full_dir_path)
+                if result_row:
+                    if 'host_inst_rate' in result_row:
+                        result_row['Host'] = run_hosts.get(dir_name)
+                    all_results.append(result_row)
+        span_args['rows'] = len(all_results)
 
     if all_results:
         df_summary = pd.DataFrame(all_results)
+        if 'Extrapolated' in df_summary.columns:
+            df_summary['Extrapolated'] = df_summary['Extrapolated'].fillna(False).astype(bool)
 
         ordered_columns = [
             'Core Number', 'CPU clock (GHz)', 'L1 Cache Size (KB)', 'L1 Associativity',
-            'L2 Cache Size (KB)', 'L2 Associativity', 'L2 latency (cycles)', 'Benchmark',
+            'L2 Cache Size (KB)', 'L2 Associativity', 'L2 latency (cycles)', 'Benchmark', 'Config Key',
             'sim_ticks', 'sim_seconds (s)', 'sim_insts',
-            'L2_overall_accesses', 'L2_overall_misses', 'L2_demand_miss_rate'
+            'L2_overall_accesses', 'L2_overall_misses', 'L2_demand_miss_rate', 'BCE', 'Extrapolated', 'ROI',
+            'host_seconds', 'host_inst_rate', 'host_mem_usage', 'Host'
         ]
         final_columns = [col for col in ordered_columns if col in df_summary.columns]
         df_summary = df_summary[final_columns]
         df_summary = df_summary.sort_values(by=['Benchmark', 'sim_seconds (s)']).reset_index(drop=True)
-        df_summary.to_csv(OUTPUT_SUMMARY_CSV, index=False)
+        os.makedirs(os.path.dirname(OUTPUT_SUMMARY_CSV), exist_ok=True)
+        with sweep_trace.span("write summary csv"):
+            df_summary.to_csv(OUTPUT_SUMMARY_CSV, index=False)
         print(f"\n✅ 集計結果を '{OUTPUT_SUMMARY_CSV}' に保存しました。")
         print(f"✅ 集計されたシミュレーション数: {len(df_summary)}")
+        n_roi = int((df_summary['ROI'] != result_db.ROI_NONE).sum())
+        if n_roi:
+            print(f"   うち ROI だけをシミュレーションした実行: {n_roi}")
+
+        # 検索用のSQLiteデータベースにも登録する
+        if RESULTS_DB_PATH:
+            with sweep_trace.span("insert results db"):
+                conn = result_db.connect(RESULTS_DB_PATH)
+                result_db.insert_rows(conn, all_results)
+                conn.close()
+            print(f"✅ 結果データベースを更新しました → {RESULTS_DB_PATH}")
     else:
         print("⚠️ 集計対象のシミュレーション結果が見つかりませんでした。")
 
 # スクリプト実行
 if __name__ == "__main__":
-    collect_simulation_results()
+    with sweep_trace.stage("sim_summary"):
+        collect_simulation_results()
@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import socket
+import cProfile
+import contextlib
+
+# ===============================================================
+# 掃引全体のタイムライン (Chrome trace / Perfetto)
+#
+# 環境変数 SWEEP_TRACE_FILE にファイル名を指定すると、pipeline.py の各ステージ、
+# run_all.py の各シミュレーション、集計スクリプトの各処理が区間 (span) を
+# Chrome trace 形式の JSON 配列として追記する。複数のプロセスが同じファイルに
+# O_APPEND で1イベント1回の write で書き込むので、掃引全体が1つのファイルに
+# まとまる。chrome://tracing や https://ui.perfetto.dev でそのまま開ける
+# （配列の閉じ括弧は無くてもよい形式）。
+#
+#   pid = プロセス（ホスト名付きで名前を付ける）
+#   tid = 0 はメインの処理、1 以降は run_all.py のワーカースロット
+#
+# SWEEP_PROFILE_DIR を指定すると、stage() の区間で cProfile を取り、
+# <ステージ名>-<pid>.prof として保存する。
+# ===============================================================
+TRACE_FILE_ENV = "SWEEP_TRACE_FILE"
+PROFILE_DIR_ENV = "SWEEP_PROFILE_DIR"
+
+MAIN_TID = 0
+
+_named_processes = set()
+
+
+def trace_file():
+    return os.environ.get(TRACE_FILE_ENV) or None
+
+
+def _now_us():
+    return time.time() * 1e6
+
+
+def _write(event):
+    path = trace_file()
+    if not path:
+        return
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 最初に作ったプロセスだけが配列の開き括弧を書く
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o644)
+        os.write(fd, b"[\n")
+        os.close(fd)
+    except FileExistsError:
+        pass
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+    try:
+        os.write(fd, (json.dumps(event, ensure_ascii=False, default=str) + ",\n").encode())
+    finally:
+        os.close(fd)
+
+
+def name_process(label):
+    pid = os.getpid()
+    if not trace_file() or pid in _named_processes:
+        return
+    _named_processes.add(pid)
+    _write({'ph': 'M', 'name': 'process_name', 'pid': pid, 'tid': MAIN_TID,
+            'args': {'name': f"{label} @ {socket.gethostname()}"}})
+
+
+def name_thread(tid, label):
+    if trace_file():
+        _write({'ph': 'M', 'name': 'thread_name', 'pid': os.getpid(), 'tid': tid, 'args': {'name': label}})
+
+
+def complete_event(name, category, start_seconds, end_seconds, tid=MAIN_TID, args=None):
+    # start / end は time.time() の値
+    if not trace_file():
+        return
+    event_args = {'host': socket.gethostname()}
+    event_args.update(args or {})
+    _write({
+        'name': name, 'cat': category, 'ph': 'X',
+        'ts': start_seconds * 1e6, 'dur': max(end_seconds - start_seconds, 0) * 1e6,
+        'pid': os.getpid(), 'tid': tid, 'args': event_args,
+    })
+
+
+def instant_event(name, category, tid=MAIN_TID, args=None):
+    if trace_file():
+        _write({'name': name, 'cat': category, 'ph': 'i', 's': 't', 'ts': _now_us(),
+                'pid': os.getpid(), 'tid': tid, 'args': args or {}})
+
+
+@contextlib.contextmanager
+def span(name, category="step", tid=MAIN_TID, **args):
+    start = time.time()
+    try:
+        yield args
+    finally:
+        complete_event(name, category, start, time.time(), tid, args)
+
+
+@contextlib.contextmanager
+def stage(name, **args):
+    # スクリプト全体などの大きな区間。SWEEP_PROFILE_DIR があれば cProfile も取る
+    name_process(name)
+    profile_dir = os.environ.get(PROFILE_DIR_ENV)
+    profiler = cProfile.Profile() if profile_dir else None
+    if profiler:
+        profiler.enable()
+    try:
+        with span(name, "stage", **args) as span_args:
+            yield span_args
+    finally:
+        if profiler:
+            profiler.disable()
+            os.makedirs(profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(profile_dir, f"{name}-{os.getpid()}.prof"))
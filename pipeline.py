@@ -0,0 +1,322 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# ===============================================================
+# パイプライン実行 (Dependency-tracked pipeline runner)
+#
+# CACTI → to_csv.py → make_data.py → filter_csv.py → run_all.py
+#   → sim_summary.py → sim_bench.py / result.py
+# の各ステージの入力・出力を定義し、入力のフィンガープリントが前回と
+# 変わったステージ（と出力が無いステージ）だけを再実行する。
+# 依存関係は「あるステージの出力を別のステージが入力に持つ」ことから求め、
+# 互いに独立なステージ（L1/L2 の CACTI 掃引など）は並列に実行する。
+#
+# --trace FILE を指定すると、各ステージと（子プロセスが書く）各シミュレーション・
+# 集計処理の区間を1つの Chrome trace ファイルにまとめる (gem5/sweep_trace.py)。
+# ===============================================================
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT_DIR, "gem5"))
+import sweep_trace  # gem5/sweep_trace.py
+
+STATE_PATH = os.path.join(ROOT_DIR, ".pipeline_state.json")
+LOG_DIR = os.path.join(ROOT_DIR, ".pipeline_logs")
+
+# パスはすべてリポジトリのルートからの相対パス。cwd はスクリプトの実行ディレクトリ
+STAGES = [
+    {
+        "name": "cacti_L1",
+        "cwd": "cacti_time/L1",
+        "cmd": ["cacti_run_all.py"],
+        "inputs": ["cacti_time/L1/cacti_run_all.py", "cacti_time/L1/base.cfg"],
+        "outputs": ["cacti_time/L1/generated_cfgs"],
+    },
+    {
+        "name": "cacti_L2",
+        "cwd": "cacti_time/L2",
+        "cmd": ["cacti_run_all.py"],
+        "inputs": ["cacti_time/L2/cacti_run_all.py", "cacti_time/L2/base.cfg"],
+        "outputs": ["cacti_time/L2/generated_cfgs"],
+    },
+    {
+        "name": "to_csv_L1",
+        "cwd": "cacti_time/L1",
+        "cmd": ["to_csv.py"],
+        "inputs": ["cacti_time/L1/to_csv.py", "cacti_time/L1/generated_cfgs"],
+        "outputs": ["cacti_time/L1/L1_cacti_result.csv", "cacti_time/L1/L1_sorted_result.csv"],
+    },
+    {
+        "name": "to_csv_L2",
+        "cwd": "cacti_time/L2",
+        "cmd": ["to_csv.py"],
+        "inputs": ["cacti_time/L2/to_csv.py", "cacti_time/L2/generated_cfgs"],
+        "outputs": ["cacti_time/L2/L2_cacti_result.csv", "cacti_time/L2/L2_sorted_result.csv"],
+    },
+    {
+        "name": "make_data",
+        "cwd": "gem5",
+        "cmd": ["make_data.py"],
+        "inputs": [
+            "gem5/make_data.py",
+            "cacti_time/L1/L1_sorted_result.csv",
+            "cacti_time/L2/L2_sorted_result.csv",
+        ],
+        "outputs": ["gem5/data.csv"],
+    },
+    {
+        "name": "filter_csv",
+        "cwd": "gem5",
+        "cmd": ["filter_csv.py"],
+        "inputs": ["gem5/filter_csv.py", "gem5/make_data.py", "gem5/data.csv"],
+        "outputs": ["gem5/filtered_data.csv"],
+    },
+    {
+        "name": "run_all",
+        "cwd": "gem5",
+        "cmd": ["run_all.py"],
+        "inputs": ["gem5/run_all.py", "gem5/parallel_runner.py", "gem5/dedup.py",
+                   "gem5/convergence.py", "gem5/cost_model.py", "gem5/filtered_data.csv"],
+        "outputs": ["gem5/results_simulations"],
+    },
+    {
+        "name": "sim_summary",
+        "cwd": "gem5",
+        "cmd": ["sim_summary.py"],
+        "inputs": ["gem5/sim_summary.py", "gem5/results_simulations"],
+        "outputs": ["gem5/result/simulation_summary.csv"],
+    },
+    {
+        "name": "sim_bench",
+        "cwd": "gem5",
+        "cmd": ["sim_bench.py"],
+        "inputs": ["gem5/sim_bench.py", "gem5/ranking.py", "gem5/result/simulation_summary.csv"],
+        "outputs": [
+            "gem5/result/simulation_summaries_by_benchmark",
+            "gem5/result/benchmark_stats_summary.csv",
+        ],
+    },
+    {
+        "name": "result",
+        "cwd": "gem5",
+        "cmd": ["result.py"],
+        "inputs": ["gem5/result.py", "gem5/ranking.py", "gem5/result/simulation_summary.csv"],
+        "outputs": ["gem5/result/best_general_config_normalized3_filtered_no_count.csv"],
+    },
+]
+
+
+# ===============================================================
+# フィンガープリント (Fingerprints)
+# ===============================================================
+def fingerprint_path(rel_path):
+    # ファイルは内容のハッシュ、ディレクトリは配下のファイルの (相対パス, サイズ, 更新時刻)
+    full_path = os.path.join(ROOT_DIR, rel_path)
+    h = hashlib.sha256()
+    if os.path.isfile(full_path):
+        with open(full_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    elif os.path.isdir(full_path):
+        for dir_path, dir_names, file_names in os.walk(full_path):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                file_path = os.path.join(dir_path, file_name)
+                st = os.stat(file_path)
+                h.update(f"{os.path.relpath(file_path, full_path)}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+    else:
+        return None
+    return h.hexdigest()
+
+
+def fingerprint_stage(stage, paths_key):
+    h = hashlib.sha256(json.dumps(stage["cmd"]).encode())
+    for rel_path in stage[paths_key]:
+        h.update(f"{rel_path}={fingerprint_path(rel_path)}\n".encode())
+    return h.hexdigest()
+
+
+def load_state():
+    if not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH, "r") as f:
+        return json.load(f)
+
+
+def save_state(state):
+    tmp_path = STATE_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def stale_reason(stage, state):
+    record = state.get(stage["name"])
+    missing = [p for p in stage["outputs"] if not os.path.exists(os.path.join(ROOT_DIR, p))]
+    if missing:
+        return f"出力がありません: {', '.join(missing)}"
+    if record is None:
+        return "実行記録がありません"
+    if record.get("inputs") != fingerprint_stage(stage, "inputs"):
+        return "入力が変更されました"
+    if record.get("outputs") != fingerprint_stage(stage, "outputs"):
+        return "出力が実行後に変更されました"
+    return None
+
+
+# ===============================================================
+# 依存関係 (Dependency graph)
+# ===============================================================
+def build_dependencies(stages):
+    producers = {}
+    for stage in stages:
+        for rel_path in stage["outputs"]:
+            producers[os.path.normpath(rel_path)] = stage["name"]
+    deps = {}
+    for stage in stages:
+        deps[stage["name"]] = {
+            producers[os.path.normpath(p)] for p in stage["inputs"]
+            if os.path.normpath(p) in producers and producers[os.path.normpath(p)] != stage["name"]
+        }
+    return deps
+
+
+def select_stages(stages, deps, targets):
+    # 指定されたステージとその上流だけを対象にする
+    if not targets:
+        return [s["name"] for s in stages]
+    unknown = [t for t in targets if t not in deps]
+    if unknown:
+        raise SystemExit(f"❌ 不明なステージです: {', '.join(unknown)}")
+    selected = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(deps[name])
+    return [s["name"] for s in stages if s["name"] in selected]
+
+
+# ===============================================================
+# 実行 (Execution)
+# ===============================================================
+def run_stage(stage, slot=1):
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, f"{stage['name']}.log")
+    cmd = [sys.executable] + stage["cmd"]
+    start = time.time()
+    with open(log_path, "w") as log_file:
+        result = subprocess.run(cmd, cwd=os.path.join(ROOT_DIR, stage["cwd"]),
+                                stdout=log_file, stderr=subprocess.STDOUT)
+    end = time.time()
+    sweep_trace.complete_event(stage["name"], "pipeline", start, end, tid=slot,
+                               args={'returncode': result.returncode, 'cwd': stage["cwd"]})
+    return result.returncode, end - start, log_path
+
+
+def run_pipeline(targets=None, force=False, dry_run=False, jobs=2):
+    stage_map = {s["name"]: s for s in STAGES}
+    deps = build_dependencies(STAGES)
+    selected = select_stages(STAGES, deps, targets)
+    state = load_state()
+
+    done, failed, skipped, rerun = set(), set(), set(), set()
+    running = {}
+    remaining = list(selected)
+    free_slots = set(range(1, jobs + 1))
+    sweep_trace.name_process("pipeline")
+    for slot in sorted(free_slots):
+        sweep_trace.name_thread(slot, f"stage slot {slot}")
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while remaining or running:
+            # 上流がすべて終わったステージを実行（または最新なら省略）する
+            for name in list(remaining):
+                upstream = deps[name] & set(selected)
+                if upstream & (failed | skipped):
+                    print(f"⏭️  {name}: 上流のステージが失敗したため実行しません")
+                    remaining.remove(name)
+                    skipped.add(name)
+                    continue
+                if not upstream <= done:
+                    continue
+                remaining.remove(name)
+                if force:
+                    reason = "--force が指定されました"
+                elif dry_run and upstream & rerun:
+                    reason = "上流のステージが再実行されます"
+                else:
+                    reason = stale_reason(stage_map[name], state)
+                if reason is None:
+                    print(f"✅ {name}: 最新です")
+                    done.add(name)
+                    continue
+                if dry_run:
+                    print(f"🔁 {name}: 再実行が必要です ({reason})")
+                    rerun.add(name)
+                    done.add(name)
+                    continue
+                print(f"▶️  {name}: 実行します ({reason})")
+                slot = min(free_slots)
+                free_slots.remove(slot)
+                running[executor.submit(run_stage, stage_map[name], slot)] = (name, slot)
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, slot = running.pop(future)
+                free_slots.add(slot)
+                returncode, elapsed, log_path = future.result()
+                if returncode != 0:
+                    print(f"❌ {name}: 終了コード {returncode} ({elapsed:.1f}秒) ログ: {log_path}")
+                    failed.add(name)
+                    continue
+                stage = stage_map[name]
+                state[name] = {
+                    "inputs": fingerprint_stage(stage, "inputs"),
+                    "outputs": fingerprint_stage(stage, "outputs"),
+                    "finished_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "elapsed_seconds": round(elapsed, 3),
+                }
+                save_state(state)
+                print(f"✅ {name}: 完了 ({elapsed:.1f}秒)")
+                done.add(name)
+
+    if failed:
+        print(f"\n❌ 失敗したステージ: {', '.join(sorted(failed))}")
+        return 1
+    print("\n🎉 パイプラインが完了しました。")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CACTI→gem5→集計パイプラインの差分実行")
+    parser.add_argument("targets", nargs="*", help="実行するステージ（上流も含む）。省略時は全ステージ")
+    parser.add_argument("--force", action="store_true", help="最新かどうかに関係なく再実行する")
+    parser.add_argument("--dry-run", action="store_true", help="再実行が必要なステージを表示するだけ")
+    parser.add_argument("-j", "--jobs", type=int, default=2, help="同時に実行するステージ数")
+    parser.add_argument("--list", action="store_true", help="ステージと依存関係を表示する")
+    parser.add_argument("--trace", help="各ステージ・シミュレーションの区間を Chrome trace 形式で書き出すファイル")
+    parser.add_argument("--profile-dir", help="Python のステージを cProfile で計測し .prof を保存するディレクトリ")
+    args = parser.parse_args()
+
+    # 子プロセス（各ステージのスクリプト）にも環境変数で引き継ぐ
+    if args.trace:
+        os.environ[sweep_trace.TRACE_FILE_ENV] = os.path.abspath(args.trace)
+    if args.profile_dir:
+        os.environ[sweep_trace.PROFILE_DIR_ENV] = os.path.abspath(args.profile_dir)
+
+    if args.list:
+        dependencies = build_dependencies(STAGES)
+        for s in STAGES:
+            print(f"{s['name']:<12} ← {', '.join(sorted(dependencies[s['name']])) or '-'}")
+        sys.exit(0)
+    with sweep_trace.span("pipeline", "pipeline", targets=args.targets or "all"):
+        exit_code = run_pipeline(args.targets, args.force, args.dry_run, args.jobs)
+    sys.exit(exit_code)